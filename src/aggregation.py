@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+"""
+Agregación por ventanas de las lecturas de cada dispositivo
+
+En lugar de escribir aguas abajo cada lectura, ``WindowedAggregator`` guarda
+las de cada dispositivo en un anillo NumPy de tamaño fijo (una fila por
+lectura y una columna por métrica) y cada ``interval`` segundos emite un
+resumen por dispositivo con, para cada métrica, número de lecturas, mínimo,
+máximo, media y percentiles:
+
+- ventana fija (``tumbling``): las lecturas recibidas desde el resumen anterior;
+- ventana deslizante (``sliding``): las lecturas de los últimos
+  ``sliding_window`` segundos, que se solapan entre resúmenes.
+
+Las estadísticas se calculan a la vez para todas las métricas con las
+funciones ``nan*`` de NumPy; una métrica ausente en una lectura queda como NaN.
+Si llegan más de ``capacity`` lecturas de un dispositivo dentro de la ventana
+deslizante, las más antiguas se sobrescriben. Los dispositivos sin lecturas
+dentro de la ventana deslizante se olvidan al emitir los resúmenes.
+"""
+import logging
+import threading
+import time
+import warnings
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence
+
+from config import lazy_import
+from telemetry import TelemetryFrame
+
+# Dependencia opcional, cargada al crear el primer agregador
+numpy = lazy_import('numpy')
+
+logger = logging.getLogger(__name__)
+
+Summary = Dict[str, Any]
+SummaryHook = Callable[[Summary], None]
+
+
+def numeric_fields(content: Any) -> Dict[str, float]:
+    """Campos numéricos de un contenido; acepta cadenas como ``'45%'`` o ``'3.5'``"""
+    if not isinstance(content, dict):
+        return {}
+    fields = {}
+    for name, value in content.items():
+        if isinstance(value, bool):
+            continue
+        if isinstance(value, (int, float)):
+            fields[name] = float(value)
+        elif isinstance(value, str):
+            try:
+                fields[name] = float(value.rstrip('%'))
+            except ValueError:
+                continue
+    return fields
+
+
+def device_of(message: Dict[str, Any]) -> str:
+    """Dispositivo que originó un mensaje con sobre JSON"""
+    content = message.get('content')
+    if isinstance(content, dict) and content.get('device_id'):
+        return str(content['device_id'])
+    for source in (message, message.get('test_info') or {}):
+        for field in ('device_id', 'producer_id'):
+            if source.get(field):
+                return str(source[field])
+    return 'unknown'
+
+
+def log_summary(summary: Summary) -> None:
+    """Hook por defecto: registrar una línea por dispositivo"""
+    metrics = ' '.join(f"{name}={stats['mean']:.3g}[{stats['min']:.3g},{stats['max']:.3g}]"
+                       for name, stats in summary['tumbling'].items())
+    logger.info(f"Resumen {summary['device_id']}: {summary['count']} lecturas {metrics}")
+
+
+class DeviceWindow:
+    """Anillo de lecturas de un dispositivo: una fila por lectura, una columna por métrica"""
+
+    __slots__ = ('metrics', 'values', 'times', 'head', 'total')
+
+    def __init__(self, capacity: int):
+        self.metrics: Dict[str, int] = {}
+        self.values = numpy.full((capacity, 0), numpy.nan)
+        self.times = numpy.full(capacity, -numpy.inf)
+        self.head = 0
+        self.total = 0
+
+    def columns(self, names: Sequence[str]) -> List[int]:
+        """Columnas de las métricas, añadiendo las nuevas"""
+        new = [name for name in names if name not in self.metrics]
+        if new:
+            for name in new:
+                self.metrics[name] = len(self.metrics)
+            padding = numpy.full((self.values.shape[0], len(new)), numpy.nan)
+            self.values = numpy.hstack((self.values, padding))
+        return [self.metrics[name] for name in names]
+
+    def append(self, columns: Sequence[int], row: Any, timestamp: float) -> None:
+        slot = self.head
+        self.values[slot] = numpy.nan
+        self.values[slot, columns] = row
+        self.times[slot] = timestamp
+        self.head = (slot + 1) % len(self.times)
+        self.total += 1
+
+    def since(self, start: float) -> Any:
+        """Filas con timestamp posterior a ``start`` (en cualquier orden)"""
+        return self.values[self.times > start]
+
+    def newest(self) -> float:
+        """Timestamp de la lectura más reciente"""
+        return float(self.times.max())
+
+
+def window_stats(values: Any, metrics: Dict[str, int],
+                 percentiles: Sequence[float]) -> Dict[str, Dict[str, float]]:
+    """Estadísticas por métrica de un bloque de lecturas, vectorizadas por columnas"""
+    counts = numpy.count_nonzero(~numpy.isnan(values), axis=0)
+    if not len(values) or not counts.any():
+        return {}
+    with warnings.catch_warnings():
+        # Columnas sin ninguna lectura en la ventana: se descartan después
+        warnings.simplefilter('ignore', RuntimeWarning)
+        minimum = numpy.nanmin(values, axis=0)
+        maximum = numpy.nanmax(values, axis=0)
+        mean = numpy.nanmean(values, axis=0)
+        quantiles = numpy.nanpercentile(values, percentiles, axis=0)
+
+    stats = {}
+    for name, column in metrics.items():
+        if not counts[column]:
+            continue
+        metric = {'count': int(counts[column]), 'min': float(minimum[column]),
+                  'max': float(maximum[column]), 'mean': float(mean[column])}
+        for q, row in zip(percentiles, quantiles):
+            metric[f"p{q:g}"] = float(row[column])
+        stats[name] = metric
+    return stats
+
+
+class WindowedAggregator:
+    def __init__(self, interval: float = 10.0, sliding_window: float = 60.0,
+                 capacity: int = 1024, percentiles: Sequence[float] = (50, 95, 99),
+                 on_summary: Optional[SummaryHook] = None):
+        """
+        Inicializar el agregador
+
+        Args:
+            interval: Segundos entre resúmenes (duración de la ventana fija)
+            sliding_window: Duración en segundos de la ventana deslizante
+            capacity: Lecturas que se guardan por dispositivo
+            percentiles: Percentiles a calcular, entre 0 y 100
+            on_summary: Hook que recibe cada resumen; por defecto se registra
+        """
+        if numpy is None:
+            raise ImportError("La agregación por ventanas requiere numpy")
+        if capacity < 1 or interval <= 0 or sliding_window <= 0:
+            raise ValueError("capacity, interval y sliding_window deben ser positivos")
+
+        self.interval = interval
+        self.sliding_window = sliding_window
+        self.capacity = capacity
+        self.percentiles = tuple(percentiles)
+        self.on_summary = on_summary or log_summary
+        self._windows: Dict[str, DeviceWindow] = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _window(self, device_id: str) -> DeviceWindow:
+        window = self._windows.get(device_id)
+        if window is None:
+            window = self._windows[device_id] = DeviceWindow(self.capacity)
+        return window
+
+    def add(self, device_id: str, values: Mapping[str, float],
+            timestamp: Optional[float] = None) -> None:
+        """Añadir una lectura con varias métricas por nombre"""
+        if not values:
+            return
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        with self._lock:
+            window = self._window(device_id)
+            window.append(window.columns(list(values)), list(values.values()), timestamp)
+
+    def add_frame(self, frame: TelemetryFrame, timestamp: Optional[float] = None) -> None:
+        """Añadir una trama de telemetría; el canal i es la métrica ``ch<i>``"""
+        readings = numpy.asarray(frame.readings, dtype=numpy.float64)
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        with self._lock:
+            window = self._window(frame.device_id)
+            columns = window.columns([f"ch{i}" for i in range(len(readings))])
+            window.append(columns, readings, timestamp)
+
+    def add_message(self, message: Dict[str, Any]) -> bool:
+        """Añadir los campos numéricos del contenido de un mensaje; False si no tiene"""
+        values = numeric_fields(message.get('content'))
+        if values:
+            self.add(device_of(message), values)
+        return bool(values)
+
+    def due(self) -> bool:
+        return time.monotonic() - self._last_flush >= self.interval
+
+    def flush(self, now: Optional[float] = None) -> List[Summary]:
+        """
+        Calcular y emitir los resúmenes de los dispositivos con lecturas nuevas
+
+        Los dispositivos cuya última lectura ya salió de la ventana deslizante
+        se eliminan para que no se acumulen los que dejaron de enviar.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            window_start, self._last_flush = self._last_flush, now
+            summaries = []
+            stale = []
+            for device_id, window in self._windows.items():
+                if window.newest() <= now - self.sliding_window:
+                    stale.append(device_id)
+                tumbling = window.since(window_start)
+                if not len(tumbling):
+                    continue
+                summaries.append({
+                    'device_id': device_id,
+                    'window_seconds': round(now - window_start, 3),
+                    'count': len(tumbling),
+                    'tumbling': window_stats(tumbling, window.metrics, self.percentiles),
+                    'sliding': window_stats(window.since(now - self.sliding_window),
+                                            window.metrics, self.percentiles),
+                })
+            for device_id in stale:
+                del self._windows[device_id]
+
+        for summary in summaries:
+            try:
+                self.on_summary(summary)
+            except Exception as e:
+                logger.error(f"Error en el hook de resúmenes: {str(e)}")
+        return summaries
+
+    def __len__(self) -> int:
+        return len(self._windows)
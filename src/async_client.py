@@ -0,0 +1,453 @@
+#!/usr/bin/env python
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from itertools import cycle
+from typing import Any, Callable, Dict, List, Optional
+
+from config import configure_logging, get_settings, lazy_import
+from envelope import MessageEnvelope, PropertyTemplates, stamp_properties
+from compression import DEFAULT_THRESHOLD, compress_body, resolve_encoding
+from serialization import MessageDecodeError, decode_body, get_codec
+import telemetry  # noqa: F401  registra el codec de tramas binarias
+from topology import MAIN_TOPOLOGY, Topology, is_declared, mark_declared
+
+# pika se carga al abrir la primera conexión, no al importar
+pika = lazy_import('pika')
+logger = logging.getLogger(__name__)
+
+
+def _rpc(method: Callable, *args, **kwargs) -> asyncio.Future:
+    """
+    Convertir una llamada de pika basada en callbacks en un futuro awaitable
+
+    Args:
+        method: Método del canal que acepta el argumento ``callback``
+
+    Returns:
+        asyncio.Future: Se resuelve con el frame de respuesta del broker
+    """
+    future = asyncio.get_running_loop().create_future()
+
+    def on_done(frame):
+        if not future.done():
+            future.set_result(frame)
+
+    method(*args, callback=on_done, **kwargs)
+    return future
+
+
+async def open_connection(amqp_url: str) -> pika.adapters.asyncio_connection.AsyncioConnection:
+    """Abrir una conexión AMQP sobre el event loop en ejecución"""
+    # El adaptador asyncio solo se importa si se abre una conexión
+    from pika.adapters.asyncio_connection import AsyncioConnection
+
+    loop = asyncio.get_running_loop()
+    opened = loop.create_future()
+
+    def on_open(connection):
+        if not opened.done():
+            opened.set_result(connection)
+
+    def on_open_error(connection, error):
+        if not opened.done():
+            opened.set_exception(error if isinstance(error, BaseException)
+                                 else pika.exceptions.AMQPConnectionError(error))
+
+    AsyncioConnection(
+        pika.URLParameters(amqp_url),
+        on_open_callback=on_open,
+        on_open_error_callback=on_open_error,
+        custom_ioloop=loop
+    )
+    return await opened
+
+
+async def open_channel(
+        connection: pika.adapters.asyncio_connection.AsyncioConnection) -> pika.channel.Channel:
+    """Abrir un canal nuevo sobre la conexión"""
+    future = asyncio.get_running_loop().create_future()
+    connection.channel(on_open_callback=future.set_result)
+    return await future
+
+
+async def ensure_topology_async(channel: pika.channel.Channel, topology: Topology,
+                                amqp_url: str) -> None:
+    """Declarar la topología si aún no se declaró en este proceso para el broker"""
+    if is_declared(amqp_url, topology):
+        return
+
+    for exchange in topology.exchanges:
+        await _rpc(channel.exchange_declare,
+                   exchange=exchange.name,
+                   exchange_type=exchange.type,
+                   durable=exchange.durable,
+                   arguments=exchange.arguments or None)
+    for queue in topology.queues:
+        await _rpc(channel.queue_declare,
+                   queue=queue.name,
+                   durable=queue.durable,
+                   arguments=queue.arguments or None)
+    for binding in topology.bindings:
+        await _rpc(channel.queue_bind,
+                   exchange=binding.exchange,
+                   queue=binding.queue,
+                   routing_key=binding.routing_key)
+    mark_declared(amqp_url, topology)
+
+
+class AsyncMessageProducer:
+    def __init__(self, channels: int = 1, codec: str = 'json',
+                 compression: Optional[str] = None,
+                 compression_threshold: int = DEFAULT_THRESHOLD):
+        """
+        Inicializar el productor asíncrono
+
+        Args:
+            channels: Número de canales en modo confirm multiplexados sobre
+                la misma conexión
+            codec: Codec de serialización registrado ('json', 'msgpack', 'cbor')
+            compression: Algoritmo de compresión ('zlib', 'lz4', 'zstd') o None
+            compression_threshold: Tamaño mínimo en bytes para comprimir un cuerpo
+        """
+        self.connection = None
+        self.channels: List[pika.channel.Channel] = []
+        self.exchange_name = 'mi_exchange'
+        self.queue_name = 'mi_cola'
+        self.routing_key = 'mi_routing_key'
+        self.topology = MAIN_TOPOLOGY
+        self.message_count = 0
+        self.channel_count = channels
+        self.codec = get_codec(codec)
+        self.compression = resolve_encoding(compression)
+        self.compression_threshold = compression_threshold
+        self.amqp_url = get_settings().rabbitmq_url
+        self.producer_id = os.getenv('PRODUCER_ID', 'default_producer')
+        self.property_templates = PropertyTemplates()
+
+        # Confirmaciones pendientes por canal: delivery_tag -> futuro
+        self._pending: Dict[int, Dict[int, asyncio.Future]] = {}
+        self._next_tag: Dict[int, int] = {}
+        self._channel_cycle = None
+
+    async def connect(self) -> None:
+        """Establecer conexión con RabbitMQ y abrir los canales"""
+        self.connection = await open_connection(self.amqp_url)
+        logger.info("Conexión asíncrona establecida con RabbitMQ")
+
+        for _ in range(self.channel_count):
+            channel = await open_channel(self.connection)
+            await self.setup_confirms(channel)
+            self.channels.append(channel)
+
+        await ensure_topology_async(self.channels[0], self.topology, self.amqp_url)
+        self._channel_cycle = cycle(self.channels)
+
+    async def setup_confirms(self, channel: pika.channel.Channel) -> None:
+        """Activar publisher confirms en el canal"""
+        number = channel.channel_number
+        self._pending[number] = {}
+        self._next_tag[number] = 1
+
+        def on_confirmation(method_frame):
+            self._on_delivery_confirmation(number, method_frame)
+
+        def on_close(channel, reason):
+            pending = self._pending.get(number, {})
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(pika.exceptions.ChannelClosed(0, str(reason)))
+            pending.clear()
+
+        channel.add_on_close_callback(on_close)
+        await _rpc(channel.confirm_delivery, on_confirmation)
+
+    def _on_delivery_confirmation(self, number: int, method_frame: pika.frame.Method) -> None:
+        """Resolver los futuros de las entregas confirmadas por el broker"""
+        pending = self._pending[number]
+        acked = isinstance(method_frame.method, pika.spec.Basic.Ack)
+        delivery_tag = method_frame.method.delivery_tag
+
+        if method_frame.method.multiple:
+            tags = [tag for tag in pending if tag <= delivery_tag]
+        else:
+            tags = [delivery_tag] if delivery_tag in pending else []
+
+        for tag in tags:
+            future = pending.pop(tag)
+            if not future.done():
+                future.set_result(acked)
+
+    async def publish_message(self, content: Any, priority: Optional[int] = None) -> bool:
+        """
+        Publicar un mensaje y esperar la confirmación del broker
+
+        Returns:
+            bool: True si el broker confirmó el mensaje
+        """
+        try:
+            if not self.connection or self.connection.is_closed:
+                logger.debug("Conexión cerrada, reconectando...")
+                self.channels.clear()
+                await self.connect()
+
+            # Un id y una lectura del reloj por mensaje, compartidos con las propiedades
+            message = MessageEnvelope(content, self.producer_id)
+            body, content_encoding = compress_body(
+                self.codec.encode(message.to_dict()), self.compression, self.compression_threshold
+            )
+            template = self.property_templates.get(
+                self.codec.content_type, content_encoding,
+                priority if priority is not None else 0
+            )
+            properties = stamp_properties(template, message.id, message.timestamp_ns)
+
+            channel = next(self._channel_cycle)
+            number = channel.channel_number
+            confirmed = asyncio.get_running_loop().create_future()
+            self._pending[number][self._next_tag[number]] = confirmed
+            self._next_tag[number] += 1
+            self.message_count += 1
+
+            channel.basic_publish(
+                exchange=self.exchange_name,
+                routing_key=self.routing_key,
+                body=body,
+                properties=properties
+            )
+
+            return await confirmed
+
+        except Exception as e:
+            logger.error(f"Error al publicar mensaje: {str(e)}", exc_info=True)
+            return False
+
+    async def close(self) -> None:
+        """Cerrar la conexión"""
+        if self.connection and not self.connection.is_closing and not self.connection.is_closed:
+            closed = asyncio.get_running_loop().create_future()
+            self.connection.add_on_close_callback(
+                lambda connection, reason: closed.done() or closed.set_result(reason)
+            )
+            self.connection.close()
+            await closed
+            logger.info("Conexión asíncrona cerrada correctamente")
+
+
+class AsyncDelivery:
+    """Mensaje recibido junto con las operaciones de confirmación de su canal"""
+
+    def __init__(self, channel: pika.channel.Channel,
+                 method: pika.spec.Basic.Deliver,
+                 properties: pika.spec.BasicProperties,
+                 body: bytes):
+        self.channel = channel
+        self.method = method
+        self.properties = properties
+        self.body = body
+
+    def decode(self) -> Any:
+        """Descomprimir y decodificar el cuerpo según sus propiedades"""
+        return decode_body(self.properties.content_type, self.body,
+                           self.properties.content_encoding)
+
+    def ack(self) -> None:
+        self.channel.basic_ack(delivery_tag=self.method.delivery_tag)
+
+    def nack(self, requeue: bool = True) -> None:
+        self.channel.basic_nack(delivery_tag=self.method.delivery_tag, requeue=requeue)
+
+    def reject(self, requeue: bool = False) -> None:
+        self.channel.basic_reject(delivery_tag=self.method.delivery_tag, requeue=requeue)
+
+
+class AsyncMessageStream:
+    """Iterador asíncrono sobre las entregas de un consumidor en su propio canal"""
+
+    def __init__(self, channel: pika.channel.Channel, queue_name: str):
+        self.channel = channel
+        self.queue_name = queue_name
+        self.consumer_tag = None
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._closed = False
+
+    async def start(self, prefetch_count: int) -> None:
+        """Configurar QoS y registrar el consumidor en el broker"""
+        await _rpc(self.channel.basic_qos, prefetch_count=prefetch_count)
+        self.channel.add_on_close_callback(self._on_channel_closed)
+
+        consume_ok = _rpc(self.channel.basic_consume,
+                          queue=self.queue_name,
+                          on_message_callback=self._on_message)
+        await consume_ok
+        self.consumer_tag = consume_ok.result().method.consumer_tag
+
+    def _on_message(self, channel, method, properties, body) -> None:
+        self._queue.put_nowait(AsyncDelivery(channel, method, properties, body))
+
+    def _on_channel_closed(self, channel, reason) -> None:
+        self._closed = True
+        self._queue.put_nowait(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> AsyncDelivery:
+        if self._closed and self._queue.empty():
+            raise StopAsyncIteration
+        delivery = await self._queue.get()
+        if delivery is None:
+            raise StopAsyncIteration
+        return delivery
+
+    async def cancel(self) -> None:
+        """Cancelar el consumidor y terminar la iteración"""
+        if self.consumer_tag and self.channel.is_open:
+            await _rpc(self.channel.basic_cancel, self.consumer_tag)
+        self._closed = True
+        self._queue.put_nowait(None)
+
+
+class AsyncMessageConsumer:
+    def __init__(self, prefetch_count: int = 1):
+        """
+        Inicializar el consumidor asíncrono
+
+        Args:
+            prefetch_count: Mensajes sin confirmar permitidos por canal
+        """
+        self.connection = None
+        self.exchange_name = 'mi_exchange'
+        self.queue_name = 'mi_cola'
+        self.routing_key = 'mi_routing_key'
+        self.topology = MAIN_TOPOLOGY
+        self.message_count = 0
+        self.prefetch_count = prefetch_count
+        self.amqp_url = get_settings().rabbitmq_url
+        self.streams: List[AsyncMessageStream] = []
+
+    async def connect(self) -> None:
+        """Establecer conexión con RabbitMQ y configurar la topología"""
+        self.connection = await open_connection(self.amqp_url)
+        logger.info("Conexión asíncrona establecida con RabbitMQ")
+
+        if not is_declared(self.amqp_url, self.topology):
+            channel = await open_channel(self.connection)
+            await ensure_topology_async(channel, self.topology, self.amqp_url)
+            channel.close()
+
+    async def open_stream(self, queue_name: Optional[str] = None) -> AsyncMessageStream:
+        """
+        Abrir un flujo de mensajes en un canal propio
+
+        Varios flujos pueden consumir en paralelo sobre la misma conexión y
+        el mismo event loop.
+
+        Args:
+            queue_name: Cola a consumir (por defecto la cola principal)
+        """
+        if not self.connection or self.connection.is_closed:
+            await self.connect()
+
+        channel = await open_channel(self.connection)
+        stream = AsyncMessageStream(channel, queue_name or self.queue_name)
+        await stream.start(self.prefetch_count)
+        self.streams.append(stream)
+        return stream
+
+    async def process_message(self, message: Dict[str, Any]) -> bool:
+        """
+        Procesar el mensaje recibido
+
+        Args:
+            message: Mensaje a procesar
+
+        Returns:
+            bool: True si el procesamiento fue exitoso
+        """
+        self.message_count += 1
+        logger.info(f"Mensaje #{self.message_count} procesado: {message.get('id', 'N/A')}")
+        return True
+
+    async def handle_delivery(self, delivery: AsyncDelivery) -> None:
+        """Decodificar, procesar y confirmar una entrega"""
+        try:
+            message = delivery.decode()
+        except MessageDecodeError as e:
+            logger.error(f"Error decodificando mensaje: {str(e)}")
+            delivery.reject(requeue=False)
+            return
+
+        try:
+            if await self.process_message(message):
+                delivery.ack()
+            else:
+                delivery.nack(requeue=True)
+                logger.warning("Error en procesamiento, mensaje reencolado")
+        except Exception as e:
+            logger.error(f"Error en callback: {str(e)}")
+            delivery.nack(requeue=True)
+
+    async def consume(self, streams: int = 1) -> None:
+        """
+        Consumir la cola principal con ``streams`` canales concurrentes
+
+        Args:
+            streams: Número de canales que consumen en paralelo
+        """
+        async def run(stream: AsyncMessageStream) -> None:
+            async for delivery in stream:
+                await self.handle_delivery(delivery)
+
+        opened = [await self.open_stream() for _ in range(streams)]
+        logger.info(f"Consumiendo {self.queue_name} con {streams} canal(es)")
+        await asyncio.gather(*(run(stream) for stream in opened))
+
+    async def close(self) -> None:
+        """Cancelar los flujos y cerrar la conexión"""
+        for stream in self.streams:
+            await stream.cancel()
+        self.streams.clear()
+
+        if self.connection and not self.connection.is_closing and not self.connection.is_closed:
+            closed = asyncio.get_running_loop().create_future()
+            self.connection.add_on_close_callback(
+                lambda connection, reason: closed.done() or closed.set_result(reason)
+            )
+            self.connection.close()
+            await closed
+            logger.info("Consumidor asíncrono detenido correctamente")
+
+
+async def main():
+    """Función principal: publica y consume sobre un único event loop"""
+    configure_logging()
+
+    producer = AsyncMessageProducer(channels=4)
+    consumer = AsyncMessageConsumer(prefetch_count=50)
+
+    try:
+        await producer.connect()
+        results = await asyncio.gather(*(
+            producer.publish_message({"dispositivo": f"sensor_{i}", "valor": i})
+            for i in range(20)
+        ))
+        logger.info(f"{sum(results)}/{len(results)} mensajes confirmados")
+
+        await asyncio.wait_for(consumer.consume(streams=4), timeout=5)
+
+    except asyncio.TimeoutError:
+        logger.info("Fin de la demostración")
+
+    finally:
+        await consumer.close()
+        await producer.close()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        logger.info("Operación interrumpida por el usuario")
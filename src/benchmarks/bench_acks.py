@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""
+Benchmark de confirmaciones: ack por mensaje frente a acks por lotes
+
+Publica N mensajes en una cola dedicada y mide cuántos mensajes por segundo
+consume ``MessageConsumer`` con ``basic_ack`` individual y con acks agrupados
+(``multiple=True``) y una ventana de prefetch amplia. Requiere un broker real
+accesible en ``RABBITMQ_URL``.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from consumer import MessageConsumer  # noqa: E402
+from producer import MessageProducer  # noqa: E402
+from topology import MAIN_QUEUE_ARGUMENTS, Topology  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+BENCH_QUEUE = 'bench_acks'
+BENCH_TOPOLOGY = Topology.direct('mi_exchange', BENCH_QUEUE, BENCH_QUEUE, MAIN_QUEUE_ARGUMENTS)
+
+
+def fill_queue(count: int) -> None:
+    """Publicar ``count`` mensajes en la cola del benchmark"""
+    producer = MessageProducer()
+    producer.queue_name = BENCH_QUEUE
+    producer.routing_key = BENCH_QUEUE
+    producer.topology = BENCH_TOPOLOGY
+    producer.connect()
+    producer.channel.queue_purge(BENCH_QUEUE)
+    producer.publish_batch(({"lectura": i} for i in range(count)), max_in_flight=1000)
+    producer.close()
+
+
+def consume(count: int, prefetch_count: int, ack_batch_size: int) -> float:
+    """
+    Consumir ``count`` mensajes y devolver el throughput en mensajes/segundo
+    """
+    consumer = MessageConsumer(prefetch_count=prefetch_count,
+                               ack_batch_size=ack_batch_size)
+    consumer.queue_name = BENCH_QUEUE
+    consumer.routing_key = BENCH_QUEUE
+    consumer.topology = BENCH_TOPOLOGY
+
+    process_message = consumer.process_message
+
+    def counting_process_message(message):
+        result = process_message(message)
+        if consumer.message_count >= count:
+            consumer.flush_acks()
+            consumer.channel.stop_consuming()
+        return result
+
+    consumer.process_message = counting_process_message
+    consumer.connect()
+    consumer.channel.basic_qos(prefetch_count=consumer.prefetch_count)
+    consumer.channel.basic_consume(queue=BENCH_QUEUE,
+                                   on_message_callback=consumer.handle_message)
+
+    start = time.perf_counter()
+    consumer.channel.start_consuming()
+    elapsed = time.perf_counter() - start
+
+    consumer.connection.close()
+    return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--prefetch', type=int, default=500)
+    parser.add_argument('--batch-size', type=int, default=100)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    fill_queue(args.messages)
+    baseline = consume(args.messages, prefetch_count=1, ack_batch_size=1)
+
+    fill_queue(args.messages)
+    batched = consume(args.messages, prefetch_count=args.prefetch,
+                      ack_batch_size=args.batch_size)
+
+    print(f"Ack por mensaje (prefetch=1):       {baseline:10.0f} msg/s")
+    print(f"Ack por lotes (prefetch={args.prefetch}, lote={args.batch_size}): "
+          f"{batched:10.0f} msg/s")
+    print(f"Mejora: x{batched / baseline:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+"""
+Microbenchmark del sobre y las propiedades de cada mensaje publicado
+
+Compara, sin broker, la preparación de un mensaje en ``publish_message``
+antes y después de ``envelope.py``: sobre, serialización JSON y
+``BasicProperties``. El camino anterior se reproduce tal cual (dos
+``uuid4``, dos ``datetime.now()``, ``os.getenv`` y ``BasicProperties``
+nuevas por mensaje). Mide el tiempo por mensaje, la memoria que retiene cada
+mensaje preparado y la memoria transitoria de pico con ``tracemalloc``, y
+el coste de generar solo el identificador. Guarda los resultados en JSON.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+import tracemalloc
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pika  # noqa: E402
+
+from envelope import next_id  # noqa: E402
+from metrics import publish_timestamp_headers  # noqa: E402
+from producer import MessageProducer  # noqa: E402
+
+CONTENT = {'device_id': 'sensor-042', 'temperatura': 21.5, 'humedad': 48.2}
+
+
+def legacy_prepare(producer: MessageProducer, content: Any):
+    """Preparación de un mensaje antes del sobre con ``__slots__``"""
+    message = {
+        "id": str(uuid.uuid4()),
+        "timestamp": int(datetime.now().timestamp()),
+        "content": content,
+        "producer_id": os.getenv('PRODUCER_ID', 'default_producer')
+    }
+    body, content_encoding = producer.encode_body(message)
+    properties = pika.BasicProperties(
+        delivery_mode=2,
+        content_type=producer.codec.content_type,
+        content_encoding=content_encoding,
+        message_id=str(uuid.uuid4()),
+        timestamp=int(datetime.now().timestamp()),
+        priority=0,
+        type=None,
+        headers=publish_timestamp_headers()
+    )
+    return message["id"], body, properties
+
+
+def envelope_prepare(producer: MessageProducer, content: Any):
+    """Preparación de un mensaje con el sobre y las plantillas de propiedades"""
+    message = producer.build_message(content)
+    body, content_encoding = producer.encode_body(message)
+    return message.id, body, producer.build_properties(content_encoding=content_encoding,
+                                                       message=message)
+
+
+def measure(prepare: Callable, producer: MessageProducer, messages: int,
+            repeat: int) -> Dict[str, Any]:
+    prepare(producer, CONTENT)
+    seconds = min(timeit.repeat(lambda: prepare(producer, CONTENT), number=messages,
+                                repeat=repeat))
+
+    # Memoria retenida: los mensajes preparados se conservan hasta medir
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    prepared = [prepare(producer, CONTENT) for _ in range(messages)]
+    after = tracemalloc.take_snapshot()
+    stats = after.compare_to(before, 'filename')
+    retained_bytes = sum(stat.size_diff for stat in stats)
+    retained_blocks = sum(stat.count_diff for stat in stats)
+    del prepared
+
+    # Memoria transitoria: pico de preparar un mensaje y descartarlo
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    prepare(producer, CONTENT)
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+
+    return {
+        'us_per_message': round(seconds / messages * 1e6, 3),
+        'retained_bytes_per_message': round(retained_bytes / messages, 1),
+        'retained_blocks_per_message': round(retained_blocks / messages, 2),
+        'peak_bytes_per_message': peak,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', default='bench_envelope_results.json')
+    args = parser.parse_args()
+
+    # El transporte AMQP serializa los mensajes; no hace falta conectar
+    producer = MessageProducer(transport='amqp')
+    results = {}
+    for name, prepare in (('legacy', legacy_prepare), ('envelope', envelope_prepare)):
+        results[name] = result = measure(prepare, producer, args.messages, args.repeat)
+        print(f"{name:>9}: {result['us_per_message']:>7.2f} us/msg  "
+              f"retenido {result['retained_bytes_per_message']:>7.1f} B/msg "
+              f"({result['retained_blocks_per_message']:.1f} bloques)  "
+              f"pico {result['peak_bytes_per_message']} B")
+
+    ids = {
+        'uuid4_us': round(min(timeit.repeat(lambda: str(uuid.uuid4()), number=args.messages,
+                                            repeat=args.repeat)) / args.messages * 1e6, 3),
+        'next_id_us': round(min(timeit.repeat(next_id, number=args.messages,
+                                              repeat=args.repeat)) / args.messages * 1e6, 3),
+    }
+    print(f"      ids: uuid4 {ids['uuid4_us']:.2f} us, next_id {ids['next_id_us']:.2f} us")
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'messages': args.messages,
+        'results': results,
+        'ids': ids,
+        'property_templates': len(producer.property_templates),
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Resultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
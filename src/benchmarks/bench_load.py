@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+"""
+Benchmark de carga del productor y los consumidores
+
+Publica con ``MessageProducer`` a una tasa objetivo (o sin límite) mensajes de
+distintos tamaños y codecs, los consume con N instancias de ``MessageConsumer``
+y mide throughput, percentiles de latencia de publicación y de extremo a
+extremo, CPU y memoria del proceso. Funciona contra un broker real
+(``--broker rabbitmq``) o contra el transporte loopback en memoria
+(``--broker memory``, con serialización para medir los codecs), y guarda los
+resultados en JSON para comparar versiones.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import threading
+import time
+from datetime import datetime
+from itertools import count
+from typing import Any, Callable, Dict, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from consumer import MessageConsumer  # noqa: E402
+from metrics import ConsumerMetrics, LagMonitor, MetricsRegistry, ProducerMetrics  # noqa: E402
+from producer import MessageProducer  # noqa: E402
+from topology import MAIN_QUEUE_ARGUMENTS, Topology  # noqa: E402
+from transport import LoopbackBroker, LoopbackTransport, Transport, get_transport  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - no disponible en Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+BENCH_QUEUE = 'bench_load'
+BENCH_TOPOLOGY = Topology.direct('mi_exchange', BENCH_QUEUE, BENCH_QUEUE, MAIN_QUEUE_ARGUMENTS)
+PERCENTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+def percentiles(histogram) -> Dict[str, float]:
+    """Percentiles de un ``LatencyHistogram`` en milisegundos"""
+    result = {f"p{str(q * 100).rstrip('0').rstrip('.')}": round(histogram.quantile(q) * 1000, 3)
+              for q in PERCENTILES}
+    result['max'] = round(histogram.max * 1000, 3)
+    return result
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Memoria residente máxima del proceso en MB (None si no se puede medir)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa en KB y macOS en bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def make_producer(transport: Transport, codec: str, registry: MetricsRegistry) -> MessageProducer:
+    producer = MessageProducer(codec=codec, transport=transport)
+    producer.queue_name = BENCH_QUEUE
+    producer.routing_key = BENCH_QUEUE
+    producer.topology = BENCH_TOPOLOGY
+    producer.metrics = ProducerMetrics(producer.exchange_name, registry)
+    producer.connect()
+    producer.channel.queue_purge(BENCH_QUEUE)
+    return producer
+
+
+def make_consumer(args: argparse.Namespace, transport: Transport, registry: MetricsRegistry,
+                  on_message: Callable[[], None]) -> MessageConsumer:
+    consumer = MessageConsumer(prefetch_count=args.prefetch, ack_batch_size=args.batch_size,
+                               transport=transport)
+    consumer.queue_name = BENCH_QUEUE
+    consumer.routing_key = BENCH_QUEUE
+    consumer.topology = BENCH_TOPOLOGY
+    consumer.metrics = ConsumerMetrics(BENCH_QUEUE, registry)
+    consumer.lag_monitor = LagMonitor(BENCH_QUEUE, registry=registry)
+
+    process_message = consumer.process_message
+
+    def counting_process_message(message):
+        result = process_message(message)
+        on_message()
+        return result
+
+    consumer.process_message = counting_process_message
+    return consumer
+
+
+def run_consumer(consumer: MessageConsumer, ready: threading.Event) -> None:
+    """Consumir hasta que otro hilo detenga el consumo"""
+    consumer.connect()
+    consumer.channel.basic_qos(prefetch_count=consumer.prefetch_count)
+    if consumer.ack_batch_size > 1:
+        consumer.connection.call_later(consumer.ack_interval, consumer._schedule_ack_flush)
+    consumer.channel.basic_consume(queue=BENCH_QUEUE, on_message_callback=consumer.handle_message)
+    ready.set()
+    consumer.channel.start_consuming()
+    consumer.flush_acks()
+    consumer.connection.close()
+
+
+def publish(producer: MessageProducer, payload: Any, messages: int, rate: float) -> float:
+    """Publicar ``messages`` mensajes a ``rate`` msg/s (0 = sin límite) y devolver la duración"""
+    interval = 1.0 / rate if rate > 0 else 0.0
+    start = time.perf_counter()
+    for i in range(messages):
+        if interval:
+            delay = start + i * interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        if not producer.publish_message(payload):
+            raise RuntimeError("Error al publicar durante el benchmark")
+    return time.perf_counter() - start
+
+
+def run_scenario(args: argparse.Namespace, codec: str, payload_size: int) -> Dict[str, Any]:
+    """Ejecutar un escenario (codec, tamaño de payload) y devolver sus resultados"""
+    registry = MetricsRegistry()
+    if args.broker == 'memory':
+        transport = LoopbackTransport(LoopbackBroker(), by_reference=False)
+    else:
+        transport = get_transport('amqp')
+    producer = make_producer(transport, codec, registry)
+
+    consumed = count(1)
+    done = threading.Event()
+
+    def on_message():
+        if next(consumed) >= args.messages:
+            done.set()
+
+    consumers = [make_consumer(args, transport, registry, on_message)
+                 for _ in range(args.consumers)]
+    threads = []
+    for consumer in consumers:
+        ready = threading.Event()
+        thread = threading.Thread(target=run_consumer, args=(consumer, ready), daemon=True)
+        thread.start()
+        ready.wait(timeout=10)
+        threads.append(thread)
+
+    payload = {"payload": 'x' * payload_size}
+    cpu_start = os.times()
+    start = time.perf_counter()
+
+    publish_elapsed = publish(producer, payload, args.messages, args.rate)
+    completed = done.wait(timeout=args.timeout)
+    elapsed = time.perf_counter() - start
+    cpu_end = os.times()
+
+    for consumer in consumers:
+        consumer.connection.add_callback_threadsafe(consumer.channel.stop_consuming)
+    for thread in threads:
+        thread.join(timeout=10)
+    producer.close()
+
+    cpu_seconds = (cpu_end.user - cpu_start.user) + (cpu_end.system - cpu_start.system)
+    consumed_count = sum(consumer.message_count for consumer in consumers)
+    lag = registry.histogram('amqp_consumer_lag_seconds', queue=BENCH_QUEUE, stage='dequeue',
+                             type='default', routing_key=BENCH_QUEUE)
+
+    return {
+        'codec': producer.codec.name,
+        'payload_bytes': payload_size,
+        'messages': args.messages,
+        'consumed': consumed_count,
+        'completed': completed,
+        'publish_rate_target': args.rate or None,
+        'publish_throughput': round(args.messages / publish_elapsed, 1),
+        'end_to_end_throughput': round(consumed_count / elapsed, 1),
+        'publish_latency_ms': percentiles(producer.metrics.publish),
+        'end_to_end_latency_ms': percentiles(lag),
+        'cpu_seconds': round(cpu_seconds, 3),
+        'cpu_percent': round(100 * cpu_seconds / elapsed, 1),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--broker', choices=('memory', 'rabbitmq'), default='memory',
+                        help='Transporte loopback en memoria o RabbitMQ en RABBITMQ_URL')
+    parser.add_argument('--messages', type=int, default=10000)
+    parser.add_argument('--rate', type=float, default=0,
+                        help='Mensajes por segundo a publicar (0 = sin límite)')
+    parser.add_argument('--payload-sizes', default='64,1024,16384',
+                        help='Tamaños de payload en bytes separados por comas')
+    parser.add_argument('--codecs', default='json', help='Codecs separados por comas')
+    parser.add_argument('--consumers', type=int, default=1)
+    parser.add_argument('--prefetch', type=int, default=500)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--timeout', type=float, default=120.0,
+                        help='Segundos máximos de espera por escenario')
+    parser.add_argument('--output', default='bench_load_results.json')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = []
+    for codec in args.codecs.split(','):
+        for payload_size in (int(size) for size in args.payload_sizes.split(',')):
+            result = run_scenario(args, codec.strip(), payload_size)
+            results.append(result)
+            print(f"{result['codec']:>8} {payload_size:>7} B: "
+                  f"{result['end_to_end_throughput']:>10.0f} msg/s  "
+                  f"p50={result['end_to_end_latency_ms']['p50']:.2f} ms  "
+                  f"p99={result['end_to_end_latency_ms']['p99']:.2f} ms  "
+                  f"CPU={result['cpu_percent']:.0f}%")
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'broker': args.broker,
+        'consumers': args.consumers,
+        'prefetch': args.prefetch,
+        'ack_batch_size': args.batch_size,
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Resultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
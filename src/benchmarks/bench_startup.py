@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+"""
+Benchmark de arranque de los puntos de entrada
+
+Lanza cada escenario en un intérprete nuevo varias veces y mide el tiempo de
+pared hasta que termina: importar ``producer`` o ``consumer``, y crear un
+productor y publicar un mensaje por el transporte loopback (el camino de un
+productor de vida corta lanzado desde cron). También registra qué
+dependencias pesadas quedaron cargadas y, con ``-X importtime``, los módulos
+de primer nivel que más tardaron en importarse. Guarda los resultados en JSON
+para comparar versiones.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos pesados que un arranque no debería cargar si no los usa
+HEAVY_MODULES = ('pika', 'numpy', 'pydantic', 'orjson', 'msgpack', 'cbor2',
+                 'lz4', 'zstandard', 'http.server', 'dotenv')
+
+PUBLISH_ONE = """
+from producer import MessageProducer
+producer = MessageProducer(transport='loopback')
+producer.connect()
+producer.publish_message({'temperatura': 21.5})
+producer.close()
+"""
+
+SCENARIOS = {
+    'import_producer': 'import producer',
+    'import_consumer': 'import consumer',
+    'import_async_client': 'import async_client',
+    'publish_one_loopback': PUBLISH_ONE,
+}
+
+# Al terminar, informar de los módulos pesados realmente cargados (no solo registrados)
+REPORT_LOADED = """
+import json, sys
+# Sin tocar sus atributos: en un módulo diferido eso lo cargaría
+loaded = [name for name in {modules!r}
+          if name in sys.modules and type(sys.modules[name]).__name__ != '_LazyModule']
+print('LOADED ' + json.dumps(loaded))
+"""
+
+
+def run(code: str, extra_args: List[str] = ()) -> subprocess.CompletedProcess:
+    """Ejecutar ``code`` en un intérprete nuevo con ``src/`` como directorio de trabajo"""
+    return subprocess.run([sys.executable, *extra_args, '-c', code], cwd=SRC_DIR,
+                          capture_output=True, text=True, check=True)
+
+
+def slowest_imports(code: str, top: int) -> List[Dict[str, Any]]:
+    """Módulos de primer nivel con mayor tiempo acumulado según ``-X importtime``"""
+    stderr = run(code, ['-X', 'importtime']).stderr
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Sin sangría: importado directamente por el escenario
+        if not name.startswith('  '):
+            imports.append({'module': name.strip(), 'ms': round(int(cumulative) / 1000, 2)})
+    return sorted(imports, key=lambda entry: entry['ms'], reverse=True)[:top]
+
+
+def run_scenario(name: str, code: str, runs: int, top: int) -> Dict[str, Any]:
+    # Una ejecución previa para que los .pyc estén compilados
+    run(code)
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        run(code)
+        times.append((time.perf_counter() - start) * 1000)
+
+    output = run(code + REPORT_LOADED.format(modules=HEAVY_MODULES)).stdout
+    loaded = json.loads(output.rsplit('LOADED ', 1)[1])
+    return {
+        'scenario': name,
+        'runs': runs,
+        'median_ms': round(statistics.median(times), 2),
+        'min_ms': round(min(times), 2),
+        'max_ms': round(max(times), 2),
+        'heavy_modules_loaded': loaded,
+        'slowest_imports': slowest_imports(code, top),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help='Escenarios separados por comas')
+    parser.add_argument('--top', type=int, default=5,
+                        help='Importaciones más lentas a registrar por escenario')
+    parser.add_argument('--output', default='bench_startup_results.json')
+    args = parser.parse_args()
+
+    # El intérprete vacío es la referencia de cada medida
+    baseline = run_scenario('python_empty', 'pass', args.runs, 0)
+    print(f"{'python_empty':>22}: {baseline['median_ms']:>8.1f} ms")
+
+    results = [baseline]
+    for name in args.scenarios.split(','):
+        result = run_scenario(name, SCENARIOS[name.strip()], args.runs, args.top)
+        result['over_baseline_ms'] = round(result['median_ms'] - baseline['median_ms'], 2)
+        results.append(result)
+        print(f"{name:>22}: {result['median_ms']:>8.1f} ms "
+              f"(+{result['over_baseline_ms']:.1f} ms)  "
+              f"cargados: {', '.join(result['heavy_modules_loaded']) or '-'}")
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Resultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
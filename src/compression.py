@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""
+Compresión de cuerpos de mensaje registrada en ``content_encoding``
+
+Los cuerpos se comprimen solo a partir de un umbral de bytes y solo si el
+resultado es más pequeño. zlib siempre está disponible; lz4 y zstd se usan si
+sus librerías están instaladas.
+"""
+import logging
+import zlib
+from typing import Callable, Dict, Optional, Tuple
+
+from config import lazy_import
+
+# Dependencias opcionales, cargadas en el primer uso de su compresión
+lz4_frame = lazy_import('lz4.frame')
+zstandard = lazy_import('zstandard')
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 1024
+IDENTITY_ENCODINGS = (None, '', 'identity')
+
+_compressors: Dict[str, Callable[[bytes], bytes]] = {}
+_decompressors: Dict[str, Callable[[bytes], bytes]] = {}
+
+
+class DecompressionError(ValueError):
+    """El cuerpo no se puede descomprimir con su content_encoding"""
+
+
+def register_compression(encoding: str, compress: Callable[[bytes], bytes],
+                         decompress: Callable[[bytes], bytes]) -> None:
+    """Registrar un algoritmo de compresión por su nombre de content_encoding"""
+    _compressors[encoding] = compress
+    _decompressors[encoding] = decompress
+
+
+def available_encodings() -> Tuple[str, ...]:
+    """Algoritmos de compresión disponibles en este entorno"""
+    return tuple(_compressors)
+
+
+def resolve_encoding(encoding: Optional[str]) -> Optional[str]:
+    """
+    Validar el algoritmo elegido por un productor
+
+    Si no está disponible se usa zlib como respaldo.
+    """
+    if encoding in IDENTITY_ENCODINGS:
+        return None
+    if encoding not in _compressors:
+        logger.warning(f"Compresión '{encoding}' no disponible, usando zlib")
+        return 'zlib'
+    return encoding
+
+
+def compress_body(body: bytes, encoding: Optional[str],
+                  threshold: int = DEFAULT_THRESHOLD) -> Tuple[bytes, Optional[str]]:
+    """
+    Comprimir el cuerpo si supera el umbral
+
+    Returns:
+        Tuple[bytes, Optional[str]]: Cuerpo resultante y el content_encoding a
+        publicar (None si se envía sin comprimir)
+    """
+    if encoding is None or len(body) < threshold:
+        return body, None
+    compressed = _compressors[encoding](body)
+    if len(compressed) >= len(body):
+        return body, None
+    return compressed, encoding
+
+
+def decompress_body(encoding: Optional[str], body: bytes) -> bytes:
+    """
+    Descomprimir el cuerpo según su content_encoding
+
+    Raises:
+        DecompressionError: Si el algoritmo no está disponible o los datos
+            están corruptos
+    """
+    if encoding in IDENTITY_ENCODINGS:
+        return body
+    decompress = _decompressors.get(encoding)
+    if decompress is None:
+        raise DecompressionError(f"content_encoding no soportado: {encoding}")
+    try:
+        return decompress(body)
+    except Exception as e:
+        raise DecompressionError(f"Error descomprimiendo {encoding}: {str(e)}") from e
+
+
+register_compression('zlib', lambda data: zlib.compress(data, 6), zlib.decompress)
+if lz4_frame is not None:
+    register_compression('lz4', lambda data: lz4_frame.compress(data),
+                         lambda data: lz4_frame.decompress(data))
+if zstandard is not None:
+    register_compression('zstd',
+                         lambda data: zstandard.ZstdCompressor(level=3).compress(data),
+                         lambda data: zstandard.ZstdDecompressor().decompress(data))
@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+"""
+Supresión de duplicados en los consumidores
+
+Tras un ``basic_nack(requeue=True)``, una reconexión o el reenvío al menos una
+vez del spool, el broker puede entregar de nuevo mensajes que ya se
+procesaron. ``DedupCache`` recuerda los identificadores procesados con éxito
+para que el consumidor los confirme sin volver a procesarlos:
+
+- Un LRU acotado con TTL guarda los identificadores recientes de forma exacta.
+- Un filtro de Bloom opcional, con memoria fija, recuerda los expulsados del
+  LRU; rota dos generaciones cada TTL o cuando la actual alcanza
+  ``bloom_capacity`` identificadores, así que un falso positivo (probabilidad
+  ``bloom_error_rate``) descarta un mensaje nuevo como duplicado.
+- Un fichero SQLite opcional conserva los identificadores entre reinicios; se
+  escribe por lotes, por lo que una caída puede olvidar el último lote.
+
+El identificador es el ``id``/``message_id`` del sobre o, si no lo hay (o el
+mensaje aún no se ha decodificado), ``properties.message_id``.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, List, Optional, Tuple
+
+from config import lazy_import
+
+pika = lazy_import('pika')
+logger = logging.getLogger(__name__)
+
+ENVELOPE_ID_FIELDS = ('id', 'message_id')
+
+
+def message_id_of(properties: Optional[pika.spec.BasicProperties],
+                  message: Any = None) -> Optional[str]:
+    """Identificador de idempotencia de un mensaje (None si no tiene)"""
+    if isinstance(message, dict):
+        for field in ENVELOPE_ID_FIELDS:
+            value = message.get(field)
+            if value is not None:
+                return str(value)
+    return getattr(properties, 'message_id', None)
+
+
+class BloomFilter:
+    """Filtro de Bloom sobre un ``bytearray`` con doble hashing"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        if capacity <= 0 or not 0 < error_rate < 1:
+            raise ValueError("capacity debe ser positiva y error_rate estar entre 0 y 1")
+        bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.size = max(bits, 8)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(key))
+
+
+class DedupCache:
+    def __init__(self, max_entries: int = 100000, ttl: float = 3600.0,
+                 bloom_capacity: Optional[int] = None, bloom_error_rate: float = 0.001,
+                 path: Optional[str] = None, flush_batch: int = 256):
+        """
+        Inicializar la caché de identificadores procesados
+
+        Args:
+            max_entries: Identificadores que se guardan de forma exacta en el LRU
+            ttl: Segundos que se recuerda un identificador
+            bloom_capacity: Identificadores por generación del filtro de Bloom;
+                None lo desactiva
+            bloom_error_rate: Probabilidad de falso positivo del filtro
+            path: Fichero SQLite para conservar los identificadores entre reinicios
+            flush_batch: Identificadores nuevos que se acumulan antes de escribir
+                en SQLite
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.flush_batch = flush_batch
+        self._entries: 'OrderedDict[str, float]' = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._bloom_capacity = bloom_capacity
+        self._bloom_error_rate = bloom_error_rate
+        self._bloom: Optional[BloomFilter] = None
+        self._previous_bloom: Optional[BloomFilter] = None
+        self._bloom_rotated_at = time.monotonic()
+        self._bloom_count = 0
+        if bloom_capacity:
+            self._bloom = BloomFilter(bloom_capacity, bloom_error_rate)
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._pending: List[Tuple[str, float]] = []
+        if path is not None:
+            self._open(path)
+
+    def _open(self, path: str) -> None:
+        """Abrir la base de datos y cargar los identificadores no expirados"""
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS processed '
+                         '(message_id TEXT PRIMARY KEY, expires_at REAL NOT NULL)')
+        now = time.time()
+        self._db.execute('DELETE FROM processed WHERE expires_at <= ?', (now,))
+        self._db.commit()
+
+        rows = self._db.execute(
+            'SELECT message_id, expires_at FROM processed ORDER BY expires_at DESC LIMIT ?',
+            (self.max_entries,)
+        ).fetchall()
+        for message_id, expires_at in reversed(rows):
+            self._entries[message_id] = expires_at
+            if self._bloom is not None:
+                self._bloom_add(message_id)
+        if rows:
+            logger.info(f"Deduplicación: {len(rows)} identificadores recuperados de {path}")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _rotate_bloom(self) -> None:
+        if self._bloom is not None and time.monotonic() - self._bloom_rotated_at >= self.ttl:
+            self._new_bloom_generation()
+
+    def _new_bloom_generation(self) -> None:
+        self._previous_bloom = self._bloom
+        self._bloom = BloomFilter(self._bloom_capacity, self._bloom_error_rate)
+        self._bloom_rotated_at = time.monotonic()
+        self._bloom_count = 0
+
+    def _bloom_add(self, message_id: str) -> None:
+        """
+        Añadir al filtro, rotando al expirar el TTL o al llenarse la generación
+
+        Por encima de su capacidad la tasa de falsos positivos crece sin
+        límite y los mensajes nuevos se confirmarían como duplicados sin
+        procesarse; la generación anterior se sigue consultando.
+        """
+        if self._bloom_count >= self._bloom_capacity:
+            self._new_bloom_generation()
+        else:
+            self._rotate_bloom()
+        self._bloom.add(message_id)
+        self._bloom_count += 1
+
+    def seen(self, message_id: Optional[str]) -> bool:
+        """True si ``message_id`` ya se procesó dentro del TTL"""
+        if message_id is None:
+            return False
+        with self._lock:
+            expires_at = self._entries.get(message_id)
+            if expires_at is not None:
+                if expires_at > time.time():
+                    self._entries.move_to_end(message_id)
+                    return True
+                del self._entries[message_id]
+                return False
+            if self._bloom is None:
+                return False
+            self._rotate_bloom()
+            return message_id in self._bloom or (
+                self._previous_bloom is not None and message_id in self._previous_bloom
+            )
+
+    def add(self, message_id: Optional[str]) -> None:
+        """Recordar ``message_id`` como procesado"""
+        if message_id is None:
+            return
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._entries[message_id] = expires_at
+            self._entries.move_to_end(message_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            if self._bloom is not None:
+                self._bloom_add(message_id)
+            if self._db is not None:
+                self._pending.append((message_id, expires_at))
+                if len(self._pending) >= self.flush_batch:
+                    self._flush()
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        self._db.executemany('INSERT OR REPLACE INTO processed VALUES (?, ?)', self._pending)
+        self._db.execute('DELETE FROM processed WHERE expires_at <= ?', (time.time(),))
+        self._db.commit()
+        self._pending = []
+
+    def flush(self) -> None:
+        """Escribir en SQLite los identificadores pendientes"""
+        with self._lock:
+            if self._db is not None:
+                self._flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._flush()
+                self._db.close()
+                self._db = None
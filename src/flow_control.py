@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+"""
+Control de flujo adaptativo para los productores
+
+``FlowController`` limita la tasa de publicación con AIMD (incremento aditivo,
+decremento multiplicativo): la tasa sube poco a poco mientras el broker
+confirma rápido y se reduce a la mitad ante un nack (cola llena con
+``reject-publish``), una notificación ``connection.blocked`` o una latencia de
+confirmación por encima del objetivo.
+
+Cuando no se puede publicar todavía, la política decide qué hacer:
+
+- ``block``: esperar (procesando eventos de la conexión) hasta poder publicar.
+- ``drop``: descartar el mensaje y contarlo.
+- ``spool``: guardarlo en el spool en disco para reenviarlo después.
+"""
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+from metrics import REGISTRY, MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ('block', 'drop', 'spool')
+
+
+class FlowController:
+    def __init__(self, initial_rate: float = 1000.0, min_rate: float = 10.0,
+                 max_rate: float = 50000.0, additive_increase: float = 50.0,
+                 decrease_factor: float = 0.5, latency_target: float = 0.25,
+                 adjust_interval: float = 0.1, burst: int = 10, policy: str = 'block',
+                 max_wait: float = 30.0, name: str = 'producer',
+                 registry: MetricsRegistry = REGISTRY):
+        """
+        Inicializar el controlador
+
+        Args:
+            initial_rate: Tasa inicial en mensajes por segundo
+            min_rate: Tasa mínima tras los decrementos
+            max_rate: Tasa máxima tras los incrementos
+            additive_increase: Mensajes/s que se suman en cada intervalo sin congestión
+            decrease_factor: Factor aplicado a la tasa ante congestión
+            latency_target: Latencia de confirmación (s) a partir de la cual
+                se considera congestión
+            adjust_interval: Segundos mínimos entre dos ajustes de la tasa
+            burst: Mensajes que se pueden adelantar sobre el ritmo de la tasa
+            policy: 'block', 'drop' o 'spool'
+            max_wait: Segundos máximos de espera con la política 'block'
+            name: Etiqueta de las métricas
+        """
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"policy debe ser una de {OVERFLOW_POLICIES}")
+        if not 0 < decrease_factor < 1:
+            raise ValueError("decrease_factor debe estar entre 0 y 1")
+
+        self.rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.additive_increase = additive_increase
+        self.decrease_factor = decrease_factor
+        self.latency_target = latency_target
+        self.adjust_interval = adjust_interval
+        self.burst = burst
+        self.policy = policy
+        self.max_wait = max_wait
+
+        self.blocked = False
+        self._rate_before_block = initial_rate
+        self._next_send = time.monotonic()
+        self._last_adjust = float('-inf')
+        self._lock = threading.Lock()
+
+        registry.gauge('amqp_producer_publish_rate', 'Tasa de publicación permitida (msg/s)',
+                       producer=name).set_function(lambda: self.rate)
+        self.throttled = registry.counter('amqp_producer_throttled_total',
+                                          'Mensajes no publicados por control de flujo',
+                                          producer=name, policy=policy)
+
+    def _adjust(self, increase: bool) -> None:
+        """Aplicar un paso AIMD como máximo una vez por ``adjust_interval``"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_adjust < self.adjust_interval:
+                return
+            self._last_adjust = now
+            previous = self.rate
+            if increase:
+                self.rate = min(self.rate + self.additive_increase, self.max_rate)
+            else:
+                self.rate = max(self.rate * self.decrease_factor, self.min_rate)
+        if not increase and logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Control de flujo: tasa {previous:.0f} -> {self.rate:.0f} msg/s")
+
+    def on_ack(self, latency: float) -> None:
+        """Registrar una confirmación y su latencia desde la publicación"""
+        self._adjust(increase=latency <= self.latency_target)
+
+    def on_nack(self) -> None:
+        """Registrar un rechazo del broker (cola llena)"""
+        self._adjust(increase=False)
+
+    def on_blocked(self, *_) -> None:
+        """Callback de ``connection.blocked``: el broker está sin recursos"""
+        if not self.blocked:
+            logger.warning("Conexión bloqueada por el broker, reduciendo la tasa de publicación")
+            self._rate_before_block = self.rate
+        self.blocked = True
+        self._adjust(increase=False)
+
+    def on_unblocked(self, *_) -> None:
+        """
+        Callback de ``connection.unblocked``
+
+        Recupera la tasa previa al bloqueo: sin confirms que la hagan subir
+        (publicación sin confirmaciones), cada bloqueo la reduciría para siempre.
+        """
+        if self.blocked:
+            logger.info("Conexión desbloqueada por el broker")
+            with self._lock:
+                self.rate = max(self.rate, self._rate_before_block)
+        self.blocked = False
+
+    def acquire(self, sleep: Optional[Callable[[float], None]] = None) -> bool:
+        """
+        Reservar el turno para publicar un mensaje
+
+        Args:
+            sleep: Función de espera; conviene pasar una que procese los
+                eventos de la conexión para recibir confirms y notificaciones
+
+        Returns:
+            bool: True si se puede publicar; False si, según la política, el
+            mensaje debe descartarse o guardarse en el spool
+        """
+        sleep = sleep or time.sleep
+        deadline = time.monotonic() + self.max_wait
+
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                wait = self._next_send - now
+                if not self.blocked and wait <= 0:
+                    # El crédito acumulado sin publicar se limita a ``burst`` mensajes
+                    interval = 1.0 / self.rate
+                    self._next_send = max(self._next_send, now - (self.burst - 1) * interval) + interval
+                    return True
+
+            if self.policy != 'block' or now >= deadline:
+                self.throttled.inc()
+                return False
+            sleep(min(max(wait, 0.001), deadline - now, 0.05))
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+"""
+Registro de handlers por tipo de mensaje
+
+Los handlers se registran con un decorador y se eligen por el tipo del mensaje
+(``properties.type`` o la cabecera ``message_type``) con una búsqueda en un
+diccionario, antes de decodificar el cuerpo::
+
+    handlers = HandlerRegistry()
+
+    @handlers.handler('notification', schema={'title': str}, max_concurrency=2, timeout=5.0)
+    def handle_notification(message):
+        ...
+        return True
+
+Cada tipo puede tener:
+
+- un validador de esquema compilado al registrar el handler: un modelo de
+  pydantic (si está instalado), un diccionario ``campo -> tipo`` o una función
+  que devuelve ``bool``; los mensajes inválidos se rechazan sin reencolar.
+- un límite de handlers en ejecución a la vez, para que un tipo lento no ocupe
+  todos los workers; los mensajes que exceden el límite esperan su turno.
+- un timeout en segundos; con workers, el mensaje que lo supera se reencola
+  (o se reintenta), pero el timeout solo abandona el resultado: un handler en
+  ejecución no se puede interrumpir, sigue ocupando su turno hasta terminar y
+  el mensaje puede procesarse dos veces. En modo 'thread' los tipos con
+  límite de concurrencia tienen su propio pool de hilos. Sin workers solo se
+  registra un aviso.
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple, Type, Union
+
+from config import lazy_import
+from serialization import MessageDecodeError
+
+# Dependencia opcional, cargada solo si se registra un modelo
+pydantic = lazy_import('pydantic')
+
+logger = logging.getLogger(__name__)
+
+MessageHandler = Callable[[Any], bool]
+Schema = Union[Dict[str, Union[type, Tuple[type, ...]]], Callable[[Any], bool], Type]
+
+
+class MessageValidationError(MessageDecodeError):
+    """El mensaje no cumple el esquema de su tipo"""
+
+
+def compile_schema(schema: Optional[Schema]) -> Optional[Callable[[Any], None]]:
+    """
+    Convertir un esquema en una función que lanza ``MessageValidationError``
+
+    El esquema se procesa una sola vez al registrar el handler.
+    """
+    if schema is None:
+        return None
+
+    if pydantic is not None and isinstance(schema, type) and issubclass(schema, pydantic.BaseModel):
+        def validate_model(message: Any) -> None:
+            try:
+                schema.model_validate(message)
+            except pydantic.ValidationError as e:
+                raise MessageValidationError(str(e)) from e
+        return validate_model
+
+    if isinstance(schema, dict):
+        fields = tuple(schema.items())
+
+        def validate_fields(message: Any) -> None:
+            if not isinstance(message, dict):
+                raise MessageValidationError(f"Se esperaba un objeto, no {type(message).__name__}")
+            for name, expected in fields:
+                if not isinstance(message.get(name), expected):
+                    raise MessageValidationError(f"Campo '{name}' ausente o de tipo incorrecto")
+        return validate_fields
+
+    if callable(schema):
+        def validate_callable(message: Any) -> None:
+            if not schema(message):
+                raise MessageValidationError("El mensaje no cumple el esquema")
+        return validate_callable
+
+    raise TypeError(f"Esquema no soportado: {schema!r}")
+
+
+class Handler:
+    """Handler de un tipo de mensaje con su validador y sus límites"""
+
+    def __init__(self, message_type: Optional[str], func: MessageHandler,
+                 schema: Optional[Schema] = None, max_concurrency: Optional[int] = None,
+                 timeout: Optional[float] = None):
+        self.message_type = message_type
+        self.func = func
+        self.validate = compile_schema(schema)
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.active = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        """Reservar un turno de ejecución sin bloquear; False si no hay"""
+        with self._lock:
+            if self.max_concurrency is not None and self.active >= self.max_concurrency:
+                return False
+            self.active += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self.active -= 1
+
+    def __call__(self, message: Any) -> bool:
+        if self.validate is not None:
+            self.validate(message)
+        start = time.perf_counter()
+        result = self.func(message)
+        elapsed = time.perf_counter() - start
+        if self.timeout is not None and elapsed > self.timeout:
+            logger.warning(f"Handler de '{self.message_type}' tardó {elapsed:.3f} s "
+                           f"(timeout {self.timeout} s)")
+        return result
+
+    def __repr__(self) -> str:
+        return f"Handler({self.message_type!r}, {getattr(self.func, '__name__', self.func)!r})"
+
+
+class HandlerRegistry:
+    def __init__(self):
+        self._handlers: Dict[str, Handler] = {}
+        self.default: Optional[Handler] = None
+
+    def register(self, message_type: Optional[str], func: MessageHandler,
+                 schema: Optional[Schema] = None, max_concurrency: Optional[int] = None,
+                 timeout: Optional[float] = None) -> Handler:
+        """
+        Registrar ``func`` para ``message_type``
+
+        Args:
+            message_type: Tipo de mensaje; None registra el handler por defecto
+            func: Función que recibe el mensaje decodificado y devuelve True si
+                lo procesó correctamente
+            schema: Esquema del mensaje (modelo pydantic, ``campo -> tipo`` o función)
+            max_concurrency: Máximo de mensajes de este tipo procesándose a la vez
+            timeout: Segundos máximos de procesamiento por mensaje
+        """
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError("max_concurrency debe ser al menos 1")
+        handler = Handler(message_type, func, schema, max_concurrency, timeout)
+        if message_type is None:
+            self.default = handler
+        else:
+            if message_type in self._handlers:
+                logger.warning(f"Reemplazando el handler de '{message_type}'")
+            self._handlers[message_type] = handler
+        return handler
+
+    def handler(self, message_type: Optional[str] = None, **options) -> Callable[[MessageHandler], MessageHandler]:
+        """Decorador equivalente a ``register``; devuelve la función sin modificar"""
+        def decorator(func: MessageHandler) -> MessageHandler:
+            self.register(message_type, func, **options)
+            return func
+        return decorator
+
+    def get(self, message_type: Optional[str]) -> Optional[Handler]:
+        """Handler del tipo o, si no hay, el handler por defecto"""
+        return self._handlers.get(message_type, self.default)
+
+    def __contains__(self, message_type: str) -> bool:
+        return message_type in self._handlers
+
+    def __len__(self) -> int:
+        return len(self._handlers)
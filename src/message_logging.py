@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+"""
+Logging por mensaje de bajo coste para los consumidores
+
+- ``MessageLog`` escribe una línea estructurada (clave=valor) por mensaje,
+  muestreada 1 de cada N; los errores y avisos se registran siempre.
+- El texto se formatea solo cuando un handler emite el registro.
+- ``start_queue_logging`` mueve la escritura de los handlers a un hilo propio
+  para que el hilo de consumo no se bloquee en disco o consola.
+"""
+import logging
+import queue
+from itertools import count
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+
+class StructuredMessage:
+    """Evento con campos que se formatea como ``evento k=v ...`` al emitirse"""
+
+    __slots__ = ('event', 'fields')
+
+    def __init__(self, event: str, fields: Dict[str, Any]):
+        self.event = event
+        self.fields = fields
+
+    def __str__(self) -> str:
+        return ' '.join([self.event] + [f"{key}={value}" for key, value in self.fields.items()])
+
+
+class MessageLog:
+    def __init__(self, logger: logging.Logger, sample_every: int = 1,
+                 level: int = logging.INFO):
+        """
+        Inicializar el log por mensaje
+
+        Args:
+            logger: Logger de destino
+            sample_every: Registrar 1 de cada N eventos de éxito
+            level: Nivel de los eventos de éxito
+        """
+        if sample_every < 1:
+            raise ValueError("sample_every debe ser mayor que cero")
+        self.logger = logger
+        self.sample_every = sample_every
+        self.level = level
+        self._counter = count()
+
+    def event(self, event: str, **fields: Any) -> None:
+        """Registrar un evento de éxito si le toca según el muestreo"""
+        if next(self._counter) % self.sample_every:
+            return
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, StructuredMessage(event, fields))
+
+    def error(self, event: str, **fields: Any) -> None:
+        """Registrar siempre un evento de error"""
+        self.logger.error(StructuredMessage(event, fields))
+
+    def warning(self, event: str, **fields: Any) -> None:
+        """Registrar siempre un aviso (p. ej. un mensaje reencolado)"""
+        self.logger.warning(StructuredMessage(event, fields))
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler que no formatea en el hilo que registra
+
+    ``QueueHandler.prepare`` formatea el mensaje antes de encolarlo; como la
+    cola es del mismo proceso, basta con pasar el registro tal cual y dejar
+    que el hilo del listener lo formatee.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def start_queue_logging(logger: Optional[logging.Logger] = None) -> QueueListener:
+    """
+    Sustituir los handlers del logger por una cola atendida en otro hilo
+
+    Args:
+        logger: Logger a modificar (por defecto el logger raíz)
+
+    Returns:
+        QueueListener: Listener en marcha; llamar a ``stop()`` al terminar
+        para vaciar la cola
+    """
+    logger = logger or logging.getLogger()
+    handlers = list(logger.handlers)
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+
+    for handler in handlers:
+        logger.removeHandler(handler)
+    logger.addHandler(DeferredQueueHandler(log_queue))
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
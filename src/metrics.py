@@ -0,0 +1,360 @@
+#!/usr/bin/env python
+"""
+Métricas de productores y consumidores en formato de texto de Prometheus
+
+- ``Counter``: contador monotónico.
+- ``Gauge``: valor instantáneo, fijado o calculado en cada lectura.
+- ``LatencyHistogram``: histograma log-lineal al estilo HDR con un error
+  relativo acotado (~6 %) y memoria fija, para obtener p50/p99 por etapa.
+
+``start_metrics_server`` expone el registro en ``/metrics`` por HTTP local.
+``LagMonitor`` mide el retraso de extremo a extremo a partir de la cabecera
+``x-published-at-ns`` que añaden los productores.
+"""
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+# Histogramas: 16 sub-buckets por potencia de dos sobre microsegundos enteros
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+MAX_EXPONENT = 40
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+# Cabecera con el instante de publicación (time.time_ns del productor)
+PUBLISHED_AT_HEADER = 'x-published-at-ns'
+
+
+class Counter:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Gauge:
+    __slots__ = ('value', 'function')
+
+    def __init__(self):
+        self.value = 0.0
+        self.function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Calcular el valor en cada lectura en lugar de mantenerlo"""
+        self.function = function
+
+    def get(self) -> float:
+        return self.function() if self.function is not None else self.value
+
+
+class LatencyHistogram:
+    """Histograma de latencias en segundos con buckets log-lineales"""
+
+    __slots__ = ('counts', 'count', 'total', 'max', '_lock')
+
+    def __init__(self):
+        self.counts = [0] * (SUB_BUCKETS * (MAX_EXPONENT + 1))
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _index(micros: int) -> int:
+        if micros < SUB_BUCKETS:
+            return micros
+        exponent = micros.bit_length() - SUB_BUCKET_BITS - 1
+        if exponent >= MAX_EXPONENT:
+            return SUB_BUCKETS * (MAX_EXPONENT + 1) - 1
+        return SUB_BUCKETS * (exponent + 1) + (micros >> exponent) - SUB_BUCKETS
+
+    @staticmethod
+    def _upper_bound(index: int) -> float:
+        """Límite superior del bucket en segundos"""
+        if index < SUB_BUCKETS:
+            return (index + 1) / 1e6
+        exponent = index // SUB_BUCKETS - 1
+        mantissa = index % SUB_BUCKETS + SUB_BUCKETS
+        return ((mantissa + 1) << exponent) / 1e6
+
+    def record(self, seconds: float) -> None:
+        """Registrar una latencia en segundos"""
+        index = self._index(int(seconds * 1e6)) if seconds > 0 else 0
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """Latencia (límite superior del bucket) bajo la que cae la fracción ``q``"""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            target = q * self.count
+            seen = 0
+            for index, bucket_count in enumerate(self.counts):
+                seen += bucket_count
+                if bucket_count and seen >= target:
+                    return min(self._upper_bound(index), self.max)
+            return self.max
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[Tuple[str, LabelSet], object] = {}
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, kind: str, factory, name: str, documentation: str, labels: Dict[str, str]):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            metric = self._metrics.get(key)
+            if metric is None:
+                metric = self._metrics[key] = factory()
+                self._help.setdefault(name, (kind, documentation))
+            return metric
+
+    def counter(self, name: str, documentation: str = '', **labels: str) -> Counter:
+        return self._get('counter', Counter, name, documentation, labels)
+
+    def gauge(self, name: str, documentation: str = '', **labels: str) -> Gauge:
+        return self._get('gauge', Gauge, name, documentation, labels)
+
+    def histogram(self, name: str, documentation: str = '', **labels: str) -> LatencyHistogram:
+        return self._get('summary', LatencyHistogram, name, documentation, labels)
+
+    def render(self) -> str:
+        """Serializar todas las métricas en formato de texto de Prometheus"""
+        with self._lock:
+            items = sorted(self._metrics.items(), key=lambda item: item[0])
+            helps = dict(self._help)
+
+        lines: List[str] = []
+        current = None
+        for (name, labels), metric in items:
+            if name != current:
+                kind, documentation = helps[name]
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                current = name
+
+            if isinstance(metric, Counter):
+                lines.append(f"{name}{_format_labels(labels)} {metric.value}")
+            elif isinstance(metric, Gauge):
+                lines.append(f"{name}{_format_labels(labels)} {metric.get()}")
+            else:
+                for q in QUANTILES:
+                    quantile_labels = labels + (('quantile', str(q)),)
+                    lines.append(f"{name}{_format_labels(quantile_labels)} {metric.quantile(q):.6f}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {metric.total:.6f}")
+                lines.append(f"{name}_count{_format_labels(labels)} {metric.count}")
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels: LabelSet) -> str:
+    if not labels:
+        return ''
+    escaped = (
+        key + '="' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for key, value in labels
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+# Registro global del proceso
+REGISTRY = MetricsRegistry()
+
+
+def start_metrics_server(port: int = 9100, host: str = '127.0.0.1',
+                         registry: MetricsRegistry = REGISTRY) -> 'ThreadingHTTPServer':
+    """
+    Exponer el registro en ``http://host:port/metrics`` desde un hilo daemon
+
+    Returns:
+        ThreadingHTTPServer: Servidor en marcha; ``shutdown()`` lo detiene
+    """
+    # http.server solo se importa si se exponen las métricas
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(f"metrics: {format % args}")
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    logger.info(f"Métricas disponibles en http://{host}:{port}/metrics")
+    return server
+
+
+class ConsumerMetrics:
+    """Métricas de un consumidor etiquetadas por cola"""
+
+    def __init__(self, queue: str, registry: MetricsRegistry = REGISTRY):
+        self.acked = registry.counter('amqp_consumer_acked_total',
+                                      'Mensajes confirmados con ack', queue=queue)
+        self.nacked = registry.counter('amqp_consumer_nacked_total',
+                                       'Mensajes rechazados con nack y reencolados', queue=queue)
+        self.rejected = registry.counter('amqp_consumer_rejected_total',
+                                         'Mensajes rechazados sin reencolar', queue=queue)
+        self.duplicates = registry.counter('amqp_consumer_duplicates_total',
+                                           'Mensajes ya procesados confirmados sin procesar',
+                                           queue=queue)
+        self.retried = registry.counter('amqp_consumer_retried_total',
+                                        'Mensajes fallidos enviados a una cola de espera', queue=queue)
+        self.dead_lettered = registry.counter('amqp_consumer_dead_lettered_total',
+                                              'Mensajes enviados a la cola de mensajes muertos',
+                                              queue=queue)
+        self.decode = registry.histogram('amqp_consumer_stage_seconds',
+                                         'Latencia por etapa del consumidor', queue=queue, stage='decode')
+        self.process = registry.histogram('amqp_consumer_stage_seconds',
+                                          'Latencia por etapa del consumidor', queue=queue, stage='process')
+        self.ack = registry.histogram('amqp_consumer_stage_seconds',
+                                      'Latencia por etapa del consumidor', queue=queue, stage='ack')
+        self.sink = registry.histogram('amqp_consumer_stage_seconds',
+                                       'Latencia por etapa del consumidor', queue=queue, stage='sink')
+        self.in_flight = registry.gauge('amqp_consumer_in_flight',
+                                        'Mensajes entregados y sin resolver', queue=queue)
+        self.prefetch = registry.gauge('amqp_consumer_prefetch',
+                                       'Ventana de prefetch configurada', queue=queue)
+
+
+class ProducerMetrics:
+    """Métricas de un productor etiquetadas por exchange"""
+
+    def __init__(self, exchange: str, registry: MetricsRegistry = REGISTRY):
+        self.published = registry.counter('amqp_producer_published_total',
+                                          'Mensajes publicados', exchange=exchange)
+        self.confirmed = registry.counter('amqp_producer_confirmed_total',
+                                          'Mensajes confirmados por el broker', exchange=exchange)
+        self.nacked = registry.counter('amqp_producer_nacked_total',
+                                       'Mensajes rechazados por el broker', exchange=exchange)
+        self.publish = registry.histogram('amqp_producer_stage_seconds',
+                                          'Latencia por etapa del productor', exchange=exchange,
+                                          stage='publish')
+
+
+def publish_timestamp_headers(headers: Optional[Dict[str, object]] = None) -> Dict[str, object]:
+    """Añadir a las cabeceras el instante de publicación en nanosegundos"""
+    headers = dict(headers) if headers else {}
+    headers[PUBLISHED_AT_HEADER] = time.time_ns()
+    return headers
+
+
+def message_type_of(properties) -> str:
+    """Tipo del mensaje según la propiedad ``type`` o la cabecera ``message_type``"""
+    message_type = getattr(properties, 'type', None)
+    if not message_type:
+        headers = getattr(properties, 'headers', None) or {}
+        message_type = headers.get('message_type')
+    return str(message_type) if message_type else 'default'
+
+
+# Hook de alarma: (etapa, retraso en segundos, tipo de mensaje, routing key)
+LagAlarmHook = Callable[[str, float, str, str], None]
+
+
+def log_lag_alarm(stage: str, lag: float, message_type: str, routing_key: str) -> None:
+    logger.warning(
+        f"Retraso de cola por encima del SLO: etapa={stage} lag={lag * 1000:.1f}ms "
+        f"type={message_type} routing_key={routing_key}"
+    )
+
+
+class LagMonitor:
+    """Retraso publicación→entrega y publicación→ack por tipo y routing key"""
+
+    def __init__(self, queue: str, slo_seconds: Optional[float] = None,
+                 on_breach: Optional[LagAlarmHook] = None, alarm_interval: float = 10.0,
+                 registry: MetricsRegistry = REGISTRY):
+        """
+        Inicializar el monitor de retraso
+
+        Args:
+            queue: Cola consumida, usada como etiqueta
+            slo_seconds: Retraso máximo aceptable; None desactiva la alarma
+            on_breach: Hook llamado al superar el SLO (por defecto un warning)
+            alarm_interval: Segundos mínimos entre dos llamadas al hook; las
+                infracciones se cuentan siempre
+        """
+        self.queue = queue
+        self.slo_seconds = slo_seconds
+        self.on_breach = on_breach or log_lag_alarm
+        self.alarm_interval = alarm_interval
+        self.registry = registry
+        self.breaches = registry.counter('amqp_consumer_lag_slo_breaches_total',
+                                         'Mensajes con retraso por encima del SLO', queue=queue)
+        self._histograms: Dict[Tuple[str, str, str], LatencyHistogram] = {}
+        self._last_alarm = float('-inf')
+
+    @staticmethod
+    def published_at(properties) -> Optional[int]:
+        """Instante de publicación del mensaje o None si no lleva la cabecera"""
+        headers = getattr(properties, 'headers', None)
+        if not headers:
+            return None
+        value = headers.get(PUBLISHED_AT_HEADER)
+        return value if isinstance(value, int) else None
+
+    def _histogram(self, stage: str, message_type: str, routing_key: str) -> LatencyHistogram:
+        key = (stage, message_type, routing_key)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = self.registry.histogram(
+                'amqp_consumer_lag_seconds', 'Retraso desde la publicación por etapa',
+                queue=self.queue, stage=stage, type=message_type, routing_key=routing_key
+            )
+        return histogram
+
+    def record(self, stage: str, published_ns: Optional[int], message_type: str,
+               routing_key: str) -> Optional[float]:
+        """
+        Registrar el retraso de una etapa ('dequeue' o 'ack')
+
+        Returns:
+            Optional[float]: Retraso en segundos, o None sin cabecera de publicación
+        """
+        if published_ns is None:
+            return None
+        # Relojes de distintos hosts: un retraso negativo se trata como cero
+        lag = max(time.time_ns() - published_ns, 0) / 1e9
+        self._histogram(stage, message_type, routing_key).record(lag)
+
+        if self.slo_seconds is not None and lag > self.slo_seconds:
+            self.breaches.inc()
+            now = time.monotonic()
+            if now - self._last_alarm >= self.alarm_interval:
+                self._last_alarm = now
+                try:
+                    self.on_breach(stage, lag, message_type, routing_key)
+                except Exception as e:
+                    logger.error(f"Error en el hook de alarma de retraso: {str(e)}")
+        return lag
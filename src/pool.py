@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+"""
+Pool de conexiones y canales compartido entre productores
+
+``pika.BlockingConnection`` no es segura entre hilos, así que cada conexión
+del pool se presta en exclusiva: el hilo que la toma publica por su canal y
+la devuelve al terminar. Las conexiones se abren de forma perezosa, se
+comprueban al prestarse y se reemplazan si están caídas; los canales cerrados
+por el broker se reabren en el siguiente préstamo.
+"""
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+from config import get_settings, lazy_import
+
+pika = lazy_import('pika')
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    """No hubo una conexión libre dentro del tiempo de espera"""
+
+
+class PooledConnection:
+    """Conexión del pool con su canal reutilizable"""
+
+    def __init__(self, amqp_url: str):
+        self.amqp_url = amqp_url
+        self.connection: Optional[pika.BlockingConnection] = None
+        self._channel = None
+
+    def open(self) -> None:
+        """Abrir (o reabrir) la conexión con RabbitMQ"""
+        self.close()
+        logger.debug("Abriendo conexión del pool...")
+        self.connection = pika.BlockingConnection(pika.URLParameters(self.amqp_url))
+
+    def is_healthy(self) -> bool:
+        """Comprobar que la conexión sigue abierta y atender heartbeats pendientes"""
+        if self.connection is None or not self.connection.is_open:
+            return False
+        try:
+            self.connection.process_data_events(time_limit=0)
+        except pika.exceptions.AMQPError as e:
+            logger.warning(f"Conexión del pool caída: {str(e)}")
+            return False
+        return self.connection.is_open
+
+    def channel(self) -> pika.adapters.blocking_connection.BlockingChannel:
+        """Obtener el canal de la conexión, reemplazándolo si está cerrado"""
+        if self._channel is None or not self._channel.is_open:
+            self._channel = self.connection.channel()
+        return self._channel
+
+    def close(self) -> None:
+        """Cerrar la conexión si está abierta"""
+        self._channel = None
+        if self.connection is not None and self.connection.is_open:
+            try:
+                self.connection.close()
+            except pika.exceptions.AMQPError:
+                pass
+        self.connection = None
+
+
+class ConnectionPool:
+    def __init__(self, amqp_url: Optional[str] = None, size: int = 4,
+                 acquire_timeout: float = 30.0):
+        """
+        Inicializar el pool
+
+        Args:
+            amqp_url: URL del broker (por defecto ``RABBITMQ_URL``)
+            size: Número fijo de conexiones
+            acquire_timeout: Segundos máximos de espera por una conexión libre
+        """
+        if size < 1:
+            raise ValueError("size debe ser mayor que cero")
+
+        self.amqp_url = amqp_url or get_settings().rabbitmq_url
+        self.size = size
+        self.acquire_timeout = acquire_timeout
+        self._connections: List[PooledConnection] = [
+            PooledConnection(self.amqp_url) for _ in range(size)
+        ]
+        # LIFO: se reutilizan primero las conexiones usadas más recientemente
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        for pooled in self._connections:
+            self._idle.put(pooled)
+        self._closed = threading.Event()
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None) -> Iterator[PooledConnection]:
+        """
+        Prestar una conexión sana en exclusiva al hilo actual
+
+        Raises:
+            PoolTimeoutError: Si no hay conexión libre a tiempo
+        """
+        if self._closed.is_set():
+            raise RuntimeError("El pool de conexiones está cerrado")
+
+        try:
+            pooled = self._idle.get(timeout=self.acquire_timeout if timeout is None else timeout)
+        except queue.Empty:
+            raise PoolTimeoutError(f"Sin conexiones libres en el pool ({self.size})") from None
+
+        try:
+            if not pooled.is_healthy():
+                pooled.open()
+            yield pooled
+        finally:
+            self._idle.put(pooled)
+
+    def close(self) -> None:
+        """Cerrar todas las conexiones del pool"""
+        self._closed.set()
+        for pooled in self._connections:
+            pooled.close()
+        logger.info("Pool de conexiones cerrado")
+
+
+class ChannelPool:
+    def __init__(self, connection_pool: Optional[ConnectionPool] = None, **pool_options):
+        """
+        Inicializar el pool de canales
+
+        Args:
+            connection_pool: Pool de conexiones subyacente; si no se indica se
+                crea uno con ``pool_options``
+        """
+        self.connection_pool = connection_pool or ConnectionPool(**pool_options)
+
+    @contextmanager
+    def channel(self, timeout: Optional[float] = None) -> Iterator[pika.adapters.blocking_connection.BlockingChannel]:
+        """Prestar un canal abierto en exclusiva al hilo actual"""
+        with self.connection_pool.connection(timeout) as pooled:
+            yield pooled.channel()
+
+    def close(self) -> None:
+        self.connection_pool.close()
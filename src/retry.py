@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+"""
+Reintentos diferidos con espera exponencial y cola de mensajes muertos
+
+En lugar de reencolar al instante con ``basic_nack(requeue=True)``, el
+consumidor republica el mensaje fallido en una cola de espera y confirma el
+original. Cada nivel de espera es un exchange fanout con una cola del mismo
+nombre (``<exchange>.retry.<ms>ms``) declarada con ``x-message-ttl``; al
+caducar, RabbitMQ devuelve el mensaje al exchange original
+(``x-dead-letter-exchange``) con su routing key, así que vuelve a la misma
+cola. Las esperas crecen de forma exponencial: ``base_delay``,
+``base_delay * multiplier``, ... hasta ``levels`` niveles.
+
+La cabecera ``x-retry-count`` lleva los intentos fallidos. Cuando un mensaje
+agota ``max_attempts`` intentos, o no se puede decodificar, se publica en la
+cola de mensajes muertos (``<exchange>.dead``) con el último error y su
+exchange y routing key originales. Esta misma herramienta permite
+inspeccionarlos y reenviarlos en bloque::
+
+    python retry.py inspect --limit 20
+    python retry.py replay --type notification
+"""
+from __future__ import annotations
+
+import argparse
+import copy
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+from config import configure_logging, get_settings, lazy_import
+from metrics import message_type_of
+from topology import BindingSpec, ExchangeSpec, QueueSpec, Topology, ensure_topology
+from transport import get_transport
+
+pika = lazy_import('pika')
+logger = logging.getLogger(__name__)
+
+RETRY_COUNT_HEADER = 'x-retry-count'
+LAST_ERROR_HEADER = 'x-last-error'
+ORIGINAL_EXCHANGE_HEADER = 'x-original-exchange'
+ORIGINAL_ROUTING_KEY_HEADER = 'x-original-routing-key'
+RETRY_HEADERS = (RETRY_COUNT_HEADER, LAST_ERROR_HEADER,
+                 ORIGINAL_EXCHANGE_HEADER, ORIGINAL_ROUTING_KEY_HEADER)
+
+# Longitud máxima del error guardado en las cabeceras
+MAX_ERROR_LENGTH = 256
+
+
+def retry_count(properties: Optional[pika.spec.BasicProperties]) -> int:
+    """Intentos fallidos registrados en las cabeceras del mensaje"""
+    headers = getattr(properties, 'headers', None) or {}
+    try:
+        return int(headers.get(RETRY_COUNT_HEADER, 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def with_headers(properties: Optional[pika.spec.BasicProperties],
+                 headers: Dict[str, Any]) -> pika.spec.BasicProperties:
+    """Copia de las propiedades con las cabeceras indicadas"""
+    properties = copy.copy(properties) if properties is not None else pika.BasicProperties()
+    properties.headers = headers
+    return properties
+
+
+class RetryPolicy:
+    def __init__(self, exchange: str = 'mi_exchange', base_delay: float = 1.0,
+                 multiplier: float = 5.0, levels: int = 4, max_attempts: int = 5,
+                 dead_letter_queue: Optional[str] = None):
+        """
+        Definir los niveles de espera y la cola de mensajes muertos
+
+        Args:
+            exchange: Exchange al que vuelven los mensajes tras la espera
+            base_delay: Segundos de espera del primer reintento
+            multiplier: Factor entre niveles de espera consecutivos
+            levels: Número de niveles; los reintentos posteriores usan el último
+            max_attempts: Intentos de procesamiento antes de enviar el mensaje
+                a la cola de mensajes muertos
+            dead_letter_queue: Nombre de esa cola (por defecto ``<exchange>.dead``)
+        """
+        if base_delay <= 0 or multiplier < 1 or levels < 1 or max_attempts < 1:
+            raise ValueError("base_delay, multiplier, levels y max_attempts no válidos")
+
+        self.exchange = exchange
+        self.max_attempts = max_attempts
+        self.delays_ms = [int(base_delay * 1000 * multiplier ** level) for level in range(levels)]
+        self.delay_exchanges = [f"{exchange}.retry.{delay}ms" for delay in self.delays_ms]
+        self.dead_letter_queue = dead_letter_queue or f"{exchange}.dead"
+
+        queues = [QueueSpec(name, arguments={'x-message-ttl': delay,
+                                             'x-dead-letter-exchange': exchange})
+                  for name, delay in zip(self.delay_exchanges, self.delays_ms)]
+        self.topology = Topology(
+            exchanges=[ExchangeSpec(name, 'fanout') for name in self.delay_exchanges],
+            queues=queues + [QueueSpec(self.dead_letter_queue)],
+            bindings=[BindingSpec(name, name, '') for name in self.delay_exchanges]
+        )
+
+    def delay_exchange_for(self, attempts: int) -> str:
+        """Exchange de espera tras ``attempts`` intentos fallidos"""
+        return self.delay_exchanges[min(attempts, len(self.delay_exchanges)) - 1]
+
+    def retry(self, channel, method: pika.spec.Basic.Deliver,
+              properties: pika.spec.BasicProperties, body: Any, error: str) -> str:
+        """
+        Republicar un mensaje fallido para reintentarlo más tarde
+
+        El llamador confirma el original después. Devuelve el destino: el
+        exchange de espera o la cola de mensajes muertos si se agotaron los
+        intentos.
+        """
+        attempts = retry_count(properties) + 1
+        if attempts >= self.max_attempts:
+            return self.dead_letter(channel, method, properties, body, error, attempts)
+
+        exchange = self.delay_exchange_for(attempts)
+        headers = dict(getattr(properties, 'headers', None) or {},
+                       **{RETRY_COUNT_HEADER: attempts, LAST_ERROR_HEADER: error[:MAX_ERROR_LENGTH]})
+        channel.basic_publish(exchange=exchange, routing_key=method.routing_key, body=body,
+                              properties=with_headers(properties, headers))
+        return exchange
+
+    def dead_letter(self, channel, method: pika.spec.Basic.Deliver,
+                    properties: pika.spec.BasicProperties, body: Any, error: str,
+                    attempts: Optional[int] = None) -> str:
+        """Publicar un mensaje en la cola de mensajes muertos con su origen"""
+        headers = dict(getattr(properties, 'headers', None) or {}, **{
+            RETRY_COUNT_HEADER: retry_count(properties) + 1 if attempts is None else attempts,
+            LAST_ERROR_HEADER: error[:MAX_ERROR_LENGTH],
+            ORIGINAL_EXCHANGE_HEADER: method.exchange,
+            ORIGINAL_ROUTING_KEY_HEADER: method.routing_key,
+        })
+        channel.basic_publish(exchange='', routing_key=self.dead_letter_queue, body=body,
+                              properties=with_headers(properties, headers))
+        return self.dead_letter_queue
+
+
+def describe(method: pika.spec.Basic.GetOk, properties: pika.spec.BasicProperties) -> Dict[str, Any]:
+    """Resumen de un mensaje muerto para inspeccionarlo"""
+    headers = properties.headers or {}
+    return {
+        'message_id': properties.message_id,
+        'type': message_type_of(properties),
+        'attempts': retry_count(properties),
+        'error': headers.get(LAST_ERROR_HEADER),
+        'exchange': headers.get(ORIGINAL_EXCHANGE_HEADER),
+        'routing_key': headers.get(ORIGINAL_ROUTING_KEY_HEADER),
+    }
+
+
+def inspect_dead_letters(channel, policy: RetryPolicy, limit: int = 20) -> List[Dict[str, Any]]:
+    """Leer hasta ``limit`` mensajes muertos sin retirarlos de la cola"""
+    entries = []
+    last_tag = None
+    while len(entries) < limit:
+        method, properties, _ = channel.basic_get(policy.dead_letter_queue)
+        if method is None:
+            break
+        last_tag = method.delivery_tag
+        entries.append(describe(method, properties))
+    if last_tag is not None:
+        channel.basic_nack(delivery_tag=last_tag, multiple=True, requeue=True)
+    return entries
+
+
+def replay_dead_letters(channel, policy: RetryPolicy, limit: Optional[int] = None,
+                        message_type: Optional[str] = None) -> int:
+    """
+    Reenviar mensajes muertos a su exchange y routing key originales
+
+    Los mensajes reenviados empiezan de cero sus intentos; los de otro tipo se
+    devuelven a la cola de mensajes muertos.
+
+    Returns:
+        int: Mensajes reenviados
+    """
+    channel.confirm_delivery()
+    replayed = 0
+    skipped = []
+    while limit is None or replayed < limit:
+        method, properties, body = channel.basic_get(policy.dead_letter_queue)
+        if method is None:
+            break
+        if message_type is not None and message_type_of(properties) != message_type:
+            skipped.append(method.delivery_tag)
+            continue
+
+        headers = properties.headers or {}
+        exchange = headers.get(ORIGINAL_EXCHANGE_HEADER, policy.exchange)
+        routing_key = headers.get(ORIGINAL_ROUTING_KEY_HEADER, '')
+        clean = {name: value for name, value in headers.items() if name not in RETRY_HEADERS}
+        channel.basic_publish(exchange=exchange, routing_key=routing_key, body=body,
+                              properties=with_headers(properties, clean))
+        channel.basic_ack(delivery_tag=method.delivery_tag)
+        replayed += 1
+
+    for delivery_tag in skipped:
+        channel.basic_nack(delivery_tag=delivery_tag, requeue=True)
+    return replayed
+
+
+def retry_from_env(exchange: str) -> Optional[RetryPolicy]:
+    """Política de reintentos según ``RETRY_MAX_ATTEMPTS`` (None si no está definida)"""
+    max_attempts = os.getenv('RETRY_MAX_ATTEMPTS')
+    if not max_attempts:
+        return None
+    return RetryPolicy(exchange, base_delay=int(os.getenv('RETRY_BASE_DELAY_MS', '1000')) / 1000,
+                       levels=int(os.getenv('RETRY_LEVELS', '4')),
+                       max_attempts=int(max_attempts))
+
+
+def main():
+    settings = get_settings()
+    configure_logging(settings)
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('action', choices=('inspect', 'replay'))
+    parser.add_argument('--exchange', default='mi_exchange',
+                        help='Exchange cuyos mensajes muertos se leen')
+    parser.add_argument('--limit', type=int, default=None)
+    parser.add_argument('--type', dest='message_type', default=None,
+                        help='Reenviar solo los mensajes de este tipo')
+    args = parser.parse_args()
+
+    policy = retry_from_env(args.exchange) or RetryPolicy(args.exchange)
+    transport = get_transport(settings.transport, settings.rabbitmq_url)
+    connection = transport.connect()
+    try:
+        channel = ensure_topology(connection.channel(), policy.topology, transport.url)
+        if args.action == 'inspect':
+            for entry in inspect_dead_letters(channel, policy, args.limit or 20):
+                logger.info(' '.join(f"{name}={value}" for name, value in entry.items()))
+        else:
+            replayed = replay_dead_letters(channel, policy, args.limit, args.message_type)
+            logger.info(f"{replayed} mensajes reenviados desde {policy.dead_letter_queue}")
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+"""
+Registro de codecs de serialización seleccionados por ``content_type``
+
+El productor elige un codec por nombre y publica con su ``content_type``; el
+consumidor decodifica según la propiedad ``content_type`` del mensaje. JSON
+usa orjson si está instalado y la librería estándar en caso contrario; msgpack
+y CBOR solo se registran si sus librerías están disponibles.
+"""
+import json
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+
+from compression import DecompressionError, decompress_body
+from config import lazy_import
+
+# Dependencias opcionales, cargadas en el primer uso de su codec
+orjson = lazy_import('orjson')
+msgpack = lazy_import('msgpack')
+cbor2 = lazy_import('cbor2')
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONTENT_TYPE = 'application/json'
+
+
+class MessageDecodeError(ValueError):
+    """El cuerpo del mensaje no se puede decodificar con su content_type"""
+
+
+class Codec(ABC):
+    """Codec base: convierte objetos Python a bytes y viceversa"""
+
+    name = ''
+    content_type = ''
+
+    @abstractmethod
+    def encode(self, obj: Any) -> bytes:
+        """Serializar un objeto"""
+
+    @abstractmethod
+    def decode(self, data: bytes) -> Any:
+        """Deserializar un cuerpo; lanza una excepción si no es válido"""
+
+
+class JsonCodec(Codec):
+    """JSON compacto con la librería estándar"""
+
+    name = 'json'
+    content_type = DEFAULT_CONTENT_TYPE
+
+    def encode(self, obj: Any) -> bytes:
+        return json.dumps(obj, separators=(',', ':')).encode()
+
+    def decode(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec(JsonCodec):
+    """JSON con orjson, mismo content_type que JsonCodec"""
+
+    def encode(self, obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+    def decode(self, data: bytes) -> Any:
+        return orjson.loads(data)
+
+
+class MsgpackCodec(Codec):
+    name = 'msgpack'
+    content_type = 'application/msgpack'
+
+    def encode(self, obj: Any) -> bytes:
+        return msgpack.packb(obj, use_bin_type=True)
+
+    def decode(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False)
+
+
+class CborCodec(Codec):
+    name = 'cbor'
+    content_type = 'application/cbor'
+
+    def encode(self, obj: Any) -> bytes:
+        return cbor2.dumps(obj)
+
+    def decode(self, data: bytes) -> Any:
+        return cbor2.loads(data)
+
+
+_codecs_by_name: Dict[str, Codec] = {}
+_codecs_by_content_type: Dict[str, Codec] = {}
+
+
+def register_codec(codec: Codec, *aliases: str) -> None:
+    """
+    Registrar un codec por nombre y content_type
+
+    Args:
+        codec: Instancia del codec
+        aliases: content_types adicionales que se decodifican con este codec
+    """
+    _codecs_by_name[codec.name] = codec
+    for content_type in (codec.content_type,) + aliases:
+        _codecs_by_content_type[content_type] = codec
+
+
+def get_codec(name: str = 'json') -> Codec:
+    """
+    Obtener el codec para publicar
+
+    Si el codec pedido no está disponible se usa JSON como respaldo.
+    """
+    codec = _codecs_by_name.get(name)
+    if codec is None:
+        logger.warning(f"Codec '{name}' no disponible, usando JSON")
+        codec = _codecs_by_name['json']
+    return codec
+
+
+def codec_for_content_type(content_type: Optional[str]) -> Codec:
+    """Obtener el codec que corresponde al content_type de un mensaje"""
+    if not content_type:
+        return _codecs_by_content_type[DEFAULT_CONTENT_TYPE]
+    codec = _codecs_by_content_type.get(content_type.split(';', 1)[0].strip())
+    if codec is None:
+        raise MessageDecodeError(f"content_type no soportado: {content_type}")
+    return codec
+
+
+def decode_body(content_type: Optional[str], body: bytes,
+                content_encoding: Optional[str] = None) -> Any:
+    """
+    Descomprimir y decodificar el cuerpo de un mensaje según sus propiedades
+
+    Raises:
+        MessageDecodeError: Si el content_type o el content_encoding no están
+            registrados o el cuerpo no es válido para el codec
+    """
+    codec = codec_for_content_type(content_type)
+    try:
+        body = decompress_body(content_encoding, body)
+    except DecompressionError as e:
+        raise MessageDecodeError(str(e)) from e
+
+    try:
+        return codec.decode(body)
+    except Exception as e:
+        raise MessageDecodeError(f"Error decodificando {codec.content_type}: {str(e)}") from e
+
+
+register_codec(OrjsonCodec() if orjson is not None else JsonCodec(), 'text/json')
+if msgpack is not None:
+    register_codec(MsgpackCodec(), 'application/x-msgpack')
+if cbor2 is not None:
+    register_codec(CborCodec())
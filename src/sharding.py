@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Reparto de mensajes en N colas por clave de dispositivo
+
+``Sharding`` describe una topología de N colas (``<prefijo>.0`` ...
+``<prefijo>.N-1``) a las que el productor envía cada mensaje según el hash de
+su clave de dispositivo, de modo que los mensajes de un mismo dispositivo
+llegan siempre a la misma cola y se consumen en orden mientras el throughput
+crece con el número de colas. Hay dos modos:
+
+- ``ring``: el productor elige la cola con un anillo de hash consistente
+  (``HashRing``) y publica en un exchange direct con la cola como routing key.
+  No requiere plugins y funciona también con el transporte loopback.
+- ``exchange``: se usa el exchange ``x-consistent-hash`` de RabbitMQ (plugin
+  ``rabbitmq_consistent_hash_exchange``); la clave viaja como routing key y el
+  broker elige la cola.
+
+Cada consumidor reclama un subconjunto de las colas (``claim``). Las colas se
+declaran con ``x-single-active-consumer``: si dos consumidores reclaman la
+misma cola, el broker entrega solo a uno y el otro queda de reserva, así que
+el orden por dispositivo se mantiene también durante un relevo.
+"""
+import hashlib
+from bisect import bisect
+from typing import Any, Dict, List, Optional, Sequence
+
+from topology import BindingSpec, ExchangeSpec, QueueSpec, Topology
+
+SHARD_MODES = ('ring', 'exchange')
+CONSISTENT_HASH_EXCHANGE = 'x-consistent-hash'
+
+
+def hash64(key: str) -> int:
+    """Hash estable entre procesos y versiones de Python (a diferencia de ``hash``)"""
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """Anillo de hash consistente con nodos virtuales"""
+
+    def __init__(self, nodes: Sequence[str], virtual_nodes: int = 128):
+        if not nodes:
+            raise ValueError("El anillo necesita al menos un nodo")
+        points = sorted((hash64(f"{node}#{i}"), node)
+                        for node in nodes for i in range(virtual_nodes))
+        self.nodes = tuple(nodes)
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key: str) -> str:
+        """Nodo responsable de ``key``: el primer punto del anillo a partir de su hash"""
+        index = bisect(self._hashes, hash64(key))
+        return self._nodes[index % len(self._nodes)]
+
+
+class Sharding:
+    def __init__(self, exchange: str = 'mi_exchange_shards', queue_prefix: str = 'mi_cola',
+                 shards: int = 4, queue_arguments: Optional[Dict[str, Any]] = None,
+                 mode: str = 'ring', virtual_nodes: int = 128):
+        """
+        Definir la topología particionada
+
+        Args:
+            exchange: Exchange donde publican los productores
+            queue_prefix: Prefijo de las colas; la cola i se llama ``<prefijo>.i``
+            shards: Número de colas
+            queue_arguments: Argumentos comunes a todas las colas
+            mode: 'ring' (anillo en el cliente) o 'exchange' (x-consistent-hash)
+            virtual_nodes: Puntos por cola en el anillo del modo 'ring'
+        """
+        if mode not in SHARD_MODES:
+            raise ValueError(f"mode debe ser uno de {SHARD_MODES}")
+        if shards < 1:
+            raise ValueError("shards debe ser al menos 1")
+
+        self.exchange = exchange
+        self.mode = mode
+        self.queues = [f"{queue_prefix}.{i}" for i in range(shards)]
+        self.ring = HashRing(self.queues, virtual_nodes) if mode == 'ring' else None
+
+        arguments = dict(queue_arguments or {}, **{'x-single-active-consumer': True})
+        if mode == 'ring':
+            exchange_spec = ExchangeSpec(exchange)
+            bindings = [BindingSpec(exchange, queue, queue) for queue in self.queues]
+        else:
+            exchange_spec = ExchangeSpec(exchange, CONSISTENT_HASH_EXCHANGE)
+            # En x-consistent-hash la routing key del binding es el peso de la cola
+            bindings = [BindingSpec(exchange, queue, '1') for queue in self.queues]
+        self.topology = Topology(
+            exchanges=[exchange_spec],
+            queues=[QueueSpec(queue, arguments=arguments) for queue in self.queues],
+            bindings=bindings
+        )
+
+    def __len__(self) -> int:
+        return len(self.queues)
+
+    def routing_key_for(self, key: str) -> str:
+        """Routing key con la que publicar un mensaje de la clave ``key``"""
+        if self.ring is None:
+            return key
+        return self.ring.node_for(key)
+
+    def claim(self, index: int = 0, count: int = 1,
+              shards: Optional[Sequence[int]] = None) -> List[str]:
+        """
+        Colas que consume un consumidor
+
+        Args:
+            index: Posición del consumidor entre ``count`` consumidores; recibe
+                las colas ``index``, ``index + count``, ...
+            count: Número total de consumidores
+            shards: Índices de cola explícitos; tienen prioridad sobre ``index``
+        """
+        if shards is not None:
+            return [self.queues[shard] for shard in shards]
+        if not 0 <= index < count:
+            raise ValueError("index debe estar entre 0 y count - 1")
+        return self.queues[index::count]
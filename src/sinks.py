@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+"""
+Destinos de persistencia de los mensajes procesados
+
+Un ``Sink`` escribe un lote de registros en una sola transacción.
+``SinkBuffer`` acumula los mensajes procesados con su delivery tag hasta
+``batch_size`` mensajes o ``max_latency`` segundos; el consumidor escribe
+entonces el lote completo y, solo cuando la transacción se ha confirmado,
+envía un único ``basic_ack(multiple=True)`` hasta el último delivery tag del
+lote. Si la escritura falla, los mensajes del lote se reencolan.
+
+``SQLiteSink`` es la implementación de referencia: un ``executemany`` por
+lote en modo WAL.
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from typing import Any, List, NamedTuple, Optional, Sequence
+
+from config import lazy_import
+from telemetry import TelemetryFrame
+
+pika = lazy_import('pika')
+
+
+class SinkRecord(NamedTuple):
+    message_id: Optional[str]
+    routing_key: str
+    message_type: str
+    received_at: float
+    payload: Any
+
+
+class PendingWrite(NamedTuple):
+    delivery_tag: int
+    record: SinkRecord
+    properties: pika.spec.BasicProperties
+
+
+def to_json(payload: Any) -> str:
+    """Serializar el payload de un registro; las tramas de telemetría como objeto"""
+    if isinstance(payload, TelemetryFrame):
+        payload = {'device_id': payload.device_id, 'timestamp_ns': payload.timestamp_ns,
+                   'readings': list(payload.readings)}
+    return json.dumps(payload, separators=(',', ':'), default=str)
+
+
+class Sink(ABC):
+    """Destino de persistencia: escribe lotes de registros de forma atómica"""
+
+    @abstractmethod
+    def write(self, records: Sequence[SinkRecord]) -> None:
+        """Escribir todos los registros o ninguno; lanza una excepción si falla"""
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteSink(Sink):
+    def __init__(self, path: str, table: str = 'messages'):
+        """
+        Abrir (o crear) la base de datos
+
+        Args:
+            path: Fichero SQLite
+            table: Tabla donde insertar los mensajes
+        """
+        if not table.isidentifier():
+            raise ValueError(f"Nombre de tabla no válido: {table!r}")
+        self.path = path
+        self.table = table
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            f'CREATE TABLE IF NOT EXISTS {table} ('
+            'id INTEGER PRIMARY KEY, message_id TEXT, routing_key TEXT, '
+            'message_type TEXT, received_at REAL NOT NULL, payload TEXT)'
+        )
+        self._db.commit()
+        self._insert = (f'INSERT INTO {table} (message_id, routing_key, message_type, '
+                        'received_at, payload) VALUES (?, ?, ?, ?, ?)')
+
+    def write(self, records: Sequence[SinkRecord]) -> None:
+        rows = [(record.message_id, record.routing_key, record.message_type,
+                 record.received_at, to_json(record.payload)) for record in records]
+        # El contexto de la conexión confirma la transacción o la deshace si falla
+        with self._db:
+            self._db.executemany(self._insert, rows)
+
+    def close(self) -> None:
+        self._db.close()
+
+
+class SinkBuffer:
+    """Mensajes procesados pendientes de escribir, con límites de tamaño y de tiempo"""
+
+    def __init__(self, sink: Sink, batch_size: int = 500, max_latency: float = 1.0):
+        """
+        Args:
+            sink: Destino de los lotes
+            batch_size: Mensajes por transacción
+            max_latency: Segundos máximos que un mensaje espera a ser escrito
+        """
+        if batch_size < 1 or max_latency <= 0:
+            raise ValueError("batch_size y max_latency deben ser positivos")
+        self.sink = sink
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self._pending: List[PendingWrite] = []
+        self._oldest = 0.0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, delivery_tag: int, record: SinkRecord,
+            properties: pika.spec.BasicProperties) -> bool:
+        """Añadir un mensaje; True si el lote está lleno y hay que escribirlo"""
+        if not self._pending:
+            self._oldest = time.monotonic()
+        self._pending.append(PendingWrite(delivery_tag, record, properties))
+        return len(self._pending) >= self.batch_size
+
+    def due(self) -> bool:
+        """True si el mensaje más antiguo superó ``max_latency``"""
+        return bool(self._pending) and time.monotonic() - self._oldest >= self.max_latency
+
+    def drain(self) -> List[PendingWrite]:
+        """Retirar el lote pendiente para escribirlo"""
+        pending, self._pending = self._pending, []
+        return pending
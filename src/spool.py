@@ -0,0 +1,340 @@
+#!/usr/bin/env python
+"""
+Spool local en disco para publicar con almacenamiento y reenvío
+
+``MessageSpool`` es un anillo de registros de solo anexado sobre un fichero
+mapeado en memoria. Cuando el broker no está disponible o rechaza mensajes,
+los productores los anexan al spool en lugar de perderlos o bloquearse; un
+``SpoolDrainer`` en segundo plano los reenvía del más antiguo al más reciente,
+en lotes con publisher confirms, y libera el espacio solo de los confirmados.
+
+Los ``mmap.flush`` (msync) se agrupan cada ``fsync_batch`` registros o
+``fsync_interval`` segundos: un fallo del proceso no pierde datos porque las
+páginas ya están en la caché del sistema, y un corte de energía pierde como
+mucho la última ventana sin sincronizar.
+
+Formato del fichero::
+
+    cabecera  magic(8) capacidad(8) cabeza(8) secuencia_cabeza(8)
+    registro  longitud(4) crc32(4) secuencia(8) meta_len(2) meta(json) cuerpo
+
+La entrega es al menos una vez: un lote confirmado a medias se reenvía desde
+el primer mensaje no confirmado.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional
+
+from config import lazy_import
+
+pika = lazy_import('pika')
+logger = logging.getLogger(__name__)
+
+SPOOL_MAGIC = b'IOTSPL01'
+HEADER = struct.Struct('<8sQQQ')
+DATA_OFFSET = 64
+RECORD = struct.Struct('<IIQ')
+META_LENGTH = struct.Struct('<H')
+WRAP_MARKER = 0xFFFFFFFF
+
+# Propiedades AMQP que se conservan al guardar un mensaje
+SPOOLED_PROPERTIES = ('content_type', 'content_encoding', 'headers', 'delivery_mode',
+                      'priority', 'correlation_id', 'reply_to', 'expiration',
+                      'message_id', 'timestamp', 'type', 'user_id', 'app_id')
+
+
+class SpoolFullError(Exception):
+    """El mensaje no cabe en el espacio libre del spool"""
+
+
+class SpooledMessage:
+    """Mensaje leído del spool junto con su posición en el anillo"""
+
+    __slots__ = ('exchange', 'routing_key', 'body', 'properties', 'sequence', 'end', 'released')
+
+    def __init__(self, exchange: str, routing_key: str, body: bytes,
+                 properties: pika.BasicProperties, sequence: int, end: int, released: int):
+        self.exchange = exchange
+        self.routing_key = routing_key
+        self.body = body
+        self.properties = properties
+        self.sequence = sequence
+        self.end = end
+        self.released = released
+
+
+class MessageSpool:
+    def __init__(self, path: str, capacity: int = 64 * 1024 * 1024,
+                 fsync_batch: int = 64, fsync_interval: float = 0.5):
+        """
+        Abrir o crear el spool
+
+        Args:
+            path: Fichero del spool; si existe se recuperan sus mensajes pendientes
+            capacity: Bytes de datos del anillo (sin la cabecera)
+            fsync_batch: Registros anexados entre dos sincronizaciones a disco
+            fsync_interval: Segundos máximos entre dos sincronizaciones a disco
+        """
+        self.path = path
+        self.fsync_batch = fsync_batch
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+        exists = os.path.exists(path) and os.path.getsize(path) > DATA_OFFSET
+        self._file = open(path, 'r+b' if exists else 'w+b')
+        if not exists:
+            self._file.truncate(DATA_OFFSET + capacity)
+        self._map = mmap.mmap(self._file.fileno(), 0)
+
+        magic, stored_capacity, head, head_sequence = HEADER.unpack_from(self._map, 0)
+        if magic != SPOOL_MAGIC:
+            if exists:
+                raise ValueError(f"{path} no es un fichero de spool")
+            stored_capacity, head, head_sequence = capacity, DATA_OFFSET, 1
+            HEADER.pack_into(self._map, 0, SPOOL_MAGIC, capacity, head, head_sequence)
+
+        self.capacity = stored_capacity
+        self._end = DATA_OFFSET + stored_capacity
+        self._head = head
+        self._head_sequence = head_sequence
+        self._recover()
+
+    def _recover(self) -> None:
+        """Recorrer los registros válidos desde la cabeza para reconstruir la cola"""
+        self._tail, self._used, self._count = self._head, 0, 0
+        sequence = self._head_sequence
+        for message in self._scan(self._head, sequence, limit=None, validate=True):
+            self._tail, self._used = message.end, message.released
+            self._count += 1
+            sequence = message.sequence + 1
+        self._next_sequence = sequence
+        if self._count:
+            logger.info(f"Spool recuperado: {self._count} mensajes pendientes en {self.path}")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _scan(self, position: int, sequence: int, limit: Optional[int],
+              validate: bool = False) -> List[SpooledMessage]:
+        """
+        Leer hasta ``limit`` registros consecutivos desde ``position``
+
+        El recorrido se acota por número de registros y no por la posición de
+        la cola: con el anillo justo lleno la cola coincide con la cabeza.
+        Con ``validate`` se comprueba el CRC de cada registro (recuperación
+        tras reinicio); el recorrido termina en el primero con CRC o
+        secuencia incorrectos.
+        """
+        messages: List[SpooledMessage] = []
+        released = 0
+        while limit is None or len(messages) < limit:
+            if self._end - position < RECORD.size or \
+                    struct.unpack_from('<I', self._map, position)[0] == WRAP_MARKER:
+                released += self._end - position
+                position = DATA_OFFSET
+
+            length, crc, record_sequence = RECORD.unpack_from(self._map, position)
+            start = position + RECORD.size
+            if record_sequence != sequence or length > self._end - start:
+                break
+            payload = self._map[start:start + length]
+            if validate and zlib.crc32(payload) != crc:
+                logger.warning(f"Registro corrupto en el spool (secuencia {sequence}), se descarta el resto")
+                break
+
+            position = start + length
+            released += RECORD.size + length
+            messages.append(self._decode(payload, sequence, position, released))
+            sequence += 1
+        return messages
+
+    @staticmethod
+    def _encode(exchange: str, routing_key: str, body: bytes,
+                properties: Optional[pika.BasicProperties]) -> bytes:
+        fields: Dict[str, Any] = {}
+        if properties is not None:
+            for name in SPOOLED_PROPERTIES:
+                value = getattr(properties, name, None)
+                if value is not None:
+                    fields[name] = value
+        meta = json.dumps({'e': exchange, 'r': routing_key, 'p': fields},
+                          separators=(',', ':'), default=str).encode()
+        return META_LENGTH.pack(len(meta)) + meta + body
+
+    @staticmethod
+    def _decode(payload: bytes, sequence: int, end: int, released: int) -> SpooledMessage:
+        meta_length, = META_LENGTH.unpack_from(payload, 0)
+        meta = json.loads(payload[META_LENGTH.size:META_LENGTH.size + meta_length])
+        body = payload[META_LENGTH.size + meta_length:]
+        return SpooledMessage(meta['e'], meta['r'], body, pika.BasicProperties(**meta['p']),
+                              sequence, end, released)
+
+    def append(self, exchange: str, routing_key: str, body: bytes,
+               properties: Optional[pika.BasicProperties] = None) -> None:
+        """
+        Anexar un mensaje al final del anillo
+
+        Raises:
+            SpoolFullError: Si el mensaje no cabe en el espacio libre
+        """
+        if not isinstance(body, (bytes, bytearray, memoryview)):
+            raise TypeError("Solo se pueden guardar en el spool cuerpos en bytes")
+        payload = self._encode(exchange, routing_key, bytes(body), properties)
+        size = RECORD.size + len(payload)
+
+        with self._lock:
+            wrap = self._tail + size > self._end
+            padding = self._end - self._tail if wrap else 0
+            if self._used + padding + size > self.capacity:
+                raise SpoolFullError(
+                    f"Spool lleno: {self._count} mensajes, {self._used}/{self.capacity} bytes"
+                )
+            if wrap:
+                if padding >= 4:
+                    struct.pack_into('<I', self._map, self._tail, WRAP_MARKER)
+                self._tail = DATA_OFFSET
+                self._used += padding
+
+            RECORD.pack_into(self._map, self._tail, len(payload), zlib.crc32(payload),
+                             self._next_sequence)
+            start = self._tail + RECORD.size
+            self._map[start:start + len(payload)] = payload
+            self._tail = start + len(payload)
+            self._used += size
+            self._count += 1
+            self._next_sequence += 1
+            self._unsynced += 1
+            self._sync_if_due()
+
+    def peek(self, limit: int) -> List[SpooledMessage]:
+        """Leer sin consumir hasta ``limit`` mensajes, del más antiguo al más reciente"""
+        with self._lock:
+            if not self._count:
+                return []
+            return self._scan(self._head, self._head_sequence, min(limit, self._count))
+
+    def commit(self, message: SpooledMessage) -> None:
+        """Liberar ``message`` y todos los anteriores, ya publicados"""
+        with self._lock:
+            if message.sequence < self._head_sequence:
+                return
+            self._used -= message.released
+            self._count -= message.sequence - self._head_sequence + 1
+            self._head = message.end
+            self._head_sequence = message.sequence + 1
+            HEADER.pack_into(self._map, 0, SPOOL_MAGIC, self.capacity, self._head,
+                             self._head_sequence)
+            self._unsynced += 1
+            self._sync_if_due()
+
+    def _sync_if_due(self) -> None:
+        if self._unsynced and (self._unsynced >= self.fsync_batch or
+                               time.monotonic() - self._last_sync >= self.fsync_interval):
+            self._sync()
+
+    def _sync(self) -> None:
+        self._map.flush()
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def sync(self, force: bool = True) -> None:
+        """Sincronizar con disco (o solo si toca según el lote y el intervalo)"""
+        with self._lock:
+            if force:
+                self._sync()
+            else:
+                self._sync_if_due()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._map.closed:
+                return
+            self._sync()
+            self._map.close()
+            self._file.close()
+
+
+class SpoolDrainer:
+    """Hilo que reenvía el contenido del spool cuando el broker vuelve a aceptar mensajes"""
+
+    def __init__(self, spool: MessageSpool,
+                 publish: Callable[[List[SpooledMessage]], List[bool]],
+                 batch_size: int = 256, retry_interval: float = 1.0,
+                 max_retry_interval: float = 30.0):
+        """
+        Inicializar el drenador
+
+        Args:
+            spool: Spool a vaciar
+            publish: Publica un lote con confirms y devuelve, por mensaje, si
+                el broker lo confirmó; se llama siempre desde el hilo drenador
+            batch_size: Mensajes por lote
+            retry_interval: Espera inicial tras un fallo; se duplica en cada
+                fallo consecutivo hasta ``max_retry_interval``
+        """
+        self.spool = spool
+        self.publish = publish
+        self.batch_size = batch_size
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='spool-drainer', daemon=True)
+
+    def start(self) -> 'SpoolDrainer':
+        self._thread.start()
+        return self
+
+    def notify(self) -> None:
+        """Avisar de que hay mensajes nuevos en el spool"""
+        self._wakeup.set()
+
+    def stop(self, timeout: Optional[float] = 10.0) -> None:
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def _wait(self, seconds: float) -> None:
+        self._wakeup.wait(seconds)
+        self._wakeup.clear()
+
+    def _run(self) -> None:
+        delay = self.retry_interval
+        while not self._stopped.is_set():
+            self.spool.sync(force=False)
+            batch = self.spool.peek(self.batch_size)
+            if not batch:
+                self._wait(self.spool.fsync_interval)
+                continue
+
+            try:
+                results = self.publish(batch)
+            except Exception as e:
+                logger.warning(f"Broker no disponible para vaciar el spool: {str(e)}")
+                results = []
+
+            confirmed = 0
+            for result in results:
+                if not result:
+                    break
+                confirmed += 1
+            if confirmed:
+                self.spool.commit(batch[confirmed - 1])
+                logger.info(f"Spool: {confirmed} mensajes reenviados, {len(self.spool)} pendientes")
+
+            if confirmed < len(batch):
+                self._wait(delay)
+                delay = min(delay * 2, self.max_retry_interval)
+            else:
+                delay = self.retry_interval
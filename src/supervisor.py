@@ -0,0 +1,354 @@
+#!/usr/bin/env python
+"""
+Supervisor de consumidores en varios procesos
+
+Arranca entre ``min_workers`` y ``max_workers`` procesos, cada uno con su
+propio consumidor y su propia conexión al broker, y:
+
+- reinicia los workers que terminan inesperadamente, con espera exponencial
+  si vuelven a fallar antes de ``stable_after`` segundos;
+- cada ``check_interval`` segundos consulta la profundidad de las colas con
+  ``queue_declare`` pasivo y la tasa de mensajes procesados por los workers;
+  añade un worker si la cola supera ``scale_up_depth`` y al ritmo actual
+  tardaría más de ``target_drain_seconds`` en vaciarse, y retira uno si la
+  cola se mantiene por debajo de ``scale_down_depth`` durante
+  ``scale_down_checks`` comprobaciones seguidas.
+
+Con una topología particionada (``SHARDS``) cada worker reclama una parte
+distinta de las colas según su posición y el número de workers, así que
+nunca hay más workers que colas y, al escalar, los workers se reinician con
+el nuevo reparto.
+
+Los workers se detienen con SIGINT, de modo que el consumidor confirma sus
+acks pendientes y cierra la conexión limpiamente. Uso::
+
+    python supervisor.py --min-workers 1 --max-workers 8
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from importlib import import_module
+from typing import Any, Callable, List, Optional
+
+from config import configure_logging, get_settings
+from topology import MAIN_TOPOLOGY, TEST_TOPOLOGY
+from transport import AmqpTransport, Transport
+
+logger = logging.getLogger(__name__)
+
+# Fábricas de consumidores que se pueden supervisar: módulo y función
+TARGETS = {
+    'consumer': ('consumer', 'consumer_from_env'),
+    'test': ('tests.test_consumer', 'consumer_from_env'),
+}
+
+
+def processed_count(consumer: Any) -> int:
+    """Mensajes confirmados (o procesados, si el consumidor no tiene métricas)"""
+    metrics = getattr(consumer, 'metrics', None)
+    if metrics is not None:
+        return metrics.acked.value
+    return consumer.message_count
+
+
+def run_worker(factory: Callable[[int, int], Any], processed, worker_index: int = 0,
+               worker_count: int = 1, report_interval: float = 1.0) -> None:
+    """
+    Punto de entrada de cada proceso worker
+
+    La fábrica recibe la posición del worker y el número de workers para
+    repartir las colas particionadas. Un hilo suma periódicamente al contador
+    compartido ``processed`` los mensajes procesados desde el último informe.
+    """
+    # Con spawn el proceso hijo empieza sin configuración de logging
+    configure_logging()
+    consumer = factory(worker_index, worker_count)
+
+    def report():
+        reported = 0
+        while True:
+            time.sleep(report_interval)
+            current = processed_count(consumer)
+            with processed.get_lock():
+                processed.value += current - reported
+            reported = current
+
+    threading.Thread(target=report, name='supervisor-report', daemon=True).start()
+    consumer.start_consuming()
+
+
+class WorkerProcess:
+    """Proceso worker con su historial de fallos"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.process: Optional[multiprocessing.Process] = None
+        self.started_at = 0.0
+        self.failures = 0
+        self.restart_at: Optional[float] = None
+
+
+class ConsumerSupervisor:
+    def __init__(self, factory: Callable[[int, int], Any], queues: List[str], min_workers: int = 1,
+                 max_workers: Optional[int] = None, transport: Optional[Transport] = None,
+                 partitioned: bool = False,
+                 check_interval: float = 5.0, scale_up_depth: int = 1000,
+                 target_drain_seconds: float = 60.0, scale_down_depth: int = 0,
+                 scale_down_checks: int = 3, cooldown: float = 30.0,
+                 restart_backoff: float = 1.0, max_restart_backoff: float = 60.0,
+                 stable_after: float = 30.0, stop_timeout: float = 15.0):
+        """
+        Inicializar el supervisor
+
+        Args:
+            factory: Función de nivel de módulo ``(worker_index, worker_count)``
+                que crea un consumidor con ``start_consuming()``; se ejecuta en
+                cada proceso worker
+            queues: Colas cuya profundidad decide el escalado
+            min_workers: Workers mínimos
+            max_workers: Workers máximos (por defecto, número de CPUs)
+            transport: Transporte para consultar la profundidad (AMQP por defecto)
+            partitioned: Las colas son particiones con ``x-single-active-consumer``
+                y cada worker reclama ``queues[index::count]``; los workers se
+                limitan al número de colas y se reinician al cambiar su número
+            check_interval: Segundos entre dos decisiones de escalado
+            scale_up_depth: Mensajes en cola a partir de los que se puede escalar
+            target_drain_seconds: Tiempo máximo aceptable para vaciar la cola al
+                ritmo actual antes de añadir un worker
+            scale_down_depth: Mensajes en cola por debajo de los que se retira un worker
+            scale_down_checks: Comprobaciones seguidas por debajo antes de retirarlo
+            cooldown: Segundos mínimos entre dos cambios del número de workers
+            restart_backoff: Espera inicial antes de reiniciar un worker caído
+            max_restart_backoff: Espera máxima entre reinicios
+            stable_after: Segundos de vida tras los que un worker se considera
+                estable y se olvidan sus fallos anteriores
+            stop_timeout: Segundos de espera a que un worker termine limpiamente
+        """
+        max_workers = max_workers or os.cpu_count() or 1
+        if partitioned:
+            # Un worker sin colas propias consumiría la cola por defecto
+            max_workers = min(max_workers, len(queues))
+            min_workers = min(min_workers, max_workers)
+        if not 1 <= min_workers <= max_workers:
+            raise ValueError("Se requiere 1 <= min_workers <= max_workers")
+
+        self.factory = factory
+        self.queues = list(queues)
+        self.partitioned = partitioned
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.transport = transport or AmqpTransport()
+        self.check_interval = check_interval
+        self.scale_up_depth = scale_up_depth
+        self.target_drain_seconds = target_drain_seconds
+        self.scale_down_depth = scale_down_depth
+        self.scale_down_checks = scale_down_checks
+        self.cooldown = cooldown
+        self.restart_backoff = restart_backoff
+        self.max_restart_backoff = max_restart_backoff
+        self.stable_after = stable_after
+        self.stop_timeout = stop_timeout
+
+        # spawn: los workers no heredan sockets ni hilos del supervisor
+        self._context = multiprocessing.get_context('spawn')
+        self._processed = self._context.Value('q', 0)
+        self._workers: List[WorkerProcess] = []
+        self._worker_count = 0
+        self._stopping = threading.Event()
+        self._connection = None
+        self._channel = None
+        self._idle_checks = 0
+        self._last_scale = float('-inf')
+        self._last_processed = 0
+        self._last_sample = time.monotonic()
+
+    # Workers
+    def _start(self, worker: WorkerProcess) -> None:
+        index, count = (worker.index, self._worker_count) if self.partitioned else (0, 1)
+        worker.process = self._context.Process(
+            target=run_worker, args=(self.factory, self._processed, index, count),
+            name=f"consumer-worker-{worker.index}", daemon=False
+        )
+        worker.process.start()
+        worker.started_at = time.monotonic()
+        worker.restart_at = None
+        logger.info(f"Worker {worker.index} iniciado (pid {worker.process.pid})")
+
+    def _stop(self, worker: WorkerProcess) -> None:
+        """Detener un worker con SIGINT y, si no termina a tiempo, forzarlo"""
+        process = worker.process
+        if process is None or not process.is_alive():
+            return
+        if os.name == 'posix':
+            os.kill(process.pid, signal.SIGINT)
+        else:
+            process.terminate()
+        process.join(self.stop_timeout)
+        if process.is_alive():
+            logger.warning(f"Worker {worker.index} no terminó a tiempo, forzando")
+            process.terminate()
+            process.join()
+        logger.info(f"Worker {worker.index} detenido")
+
+    def _reap(self) -> None:
+        """Programar el reinicio de los workers caídos y reiniciar los que toque"""
+        now = time.monotonic()
+        for worker in self._workers:
+            process = worker.process
+            if worker.restart_at is None and process is not None and not process.is_alive():
+                lived = now - worker.started_at
+                worker.failures = 1 if lived >= self.stable_after else worker.failures + 1
+                delay = min(self.restart_backoff * 2 ** (worker.failures - 1),
+                            self.max_restart_backoff)
+                worker.restart_at = now + delay
+                logger.warning(f"Worker {worker.index} terminó (código {process.exitcode}) "
+                               f"tras {lived:.1f} s, reinicio en {delay:.1f} s")
+            if worker.restart_at is not None and now >= worker.restart_at:
+                self._start(worker)
+
+    def scale_to(self, count: int) -> None:
+        """Ajustar el número de workers a ``count`` dentro de los límites"""
+        count = max(self.min_workers, min(count, self.max_workers))
+        if self.partitioned and self._workers and count != len(self._workers):
+            # El reparto de las colas depende del número de workers
+            logger.info(f"Repartiendo {len(self.queues)} colas entre {count} workers")
+            while self._workers:
+                self._stop(self._workers.pop())
+        self._worker_count = count
+        while len(self._workers) < count:
+            worker = WorkerProcess(len(self._workers))
+            self._workers.append(worker)
+            self._start(worker)
+        while len(self._workers) > count:
+            self._stop(self._workers.pop())
+
+    def __len__(self) -> int:
+        return len(self._workers)
+
+    # Métricas de escalado
+    def queue_depth(self) -> Optional[int]:
+        """Mensajes listos en las colas supervisadas (None si el broker no responde)"""
+        try:
+            if self._connection is None or not self._connection.is_open:
+                self._connection = self.transport.connect()
+                self._channel = None
+            if self._channel is None or not self._channel.is_open:
+                self._channel = self._connection.channel()
+            return sum(self._channel.queue_declare(queue=queue, passive=True).method.message_count
+                       for queue in self.queues)
+        except Exception as e:
+            logger.warning(f"No se pudo consultar la profundidad de las colas: {str(e)}")
+            self._channel = None
+            return None
+
+    def processed_rate(self) -> float:
+        """Mensajes por segundo procesados por todos los workers desde la última muestra"""
+        now = time.monotonic()
+        processed = self._processed.value
+        elapsed = now - self._last_sample
+        rate = (processed - self._last_processed) / elapsed if elapsed > 0 else 0.0
+        self._last_processed, self._last_sample = processed, now
+        return rate
+
+    def desired_workers(self, depth: int, rate: float, current: int) -> int:
+        """Número de workers deseado según la profundidad de la cola y la tasa de proceso"""
+        if depth > self.scale_up_depth and (rate <= 0 or depth / rate > self.target_drain_seconds):
+            self._idle_checks = 0
+            return current + 1
+        if depth <= self.scale_down_depth:
+            self._idle_checks += 1
+            if self._idle_checks >= self.scale_down_checks:
+                self._idle_checks = 0
+                return current - 1
+        else:
+            self._idle_checks = 0
+        return current
+
+    def autoscale(self) -> None:
+        depth = self.queue_depth()
+        rate = self.processed_rate()
+        if depth is None:
+            return
+        current = len(self._workers)
+        desired = max(self.min_workers, min(self.desired_workers(depth, rate, current),
+                                            self.max_workers))
+        logger.debug(f"Cola: {depth} mensajes, {rate:.1f} msg/s, {current} workers")
+        if desired != current and time.monotonic() - self._last_scale >= self.cooldown:
+            logger.info(f"Escalando de {current} a {desired} workers "
+                        f"(cola: {depth} mensajes, {rate:.1f} msg/s)")
+            self.scale_to(desired)
+            self._last_scale = time.monotonic()
+
+    # Ciclo principal
+    def run(self) -> None:
+        """Supervisar los workers hasta que se llame a ``stop``"""
+        self.scale_to(self.min_workers)
+        next_check = time.monotonic() + self.check_interval
+        try:
+            while not self._stopping.wait(0.5):
+                self._reap()
+                if time.monotonic() >= next_check:
+                    self.autoscale()
+                    next_check = time.monotonic() + self.check_interval
+        except KeyboardInterrupt:
+            logger.info("Deteniendo el supervisor...")
+        finally:
+            self.shutdown()
+
+    def stop(self, *_) -> None:
+        self._stopping.set()
+
+    def shutdown(self) -> None:
+        """Detener todos los workers y cerrar la conexión de monitorización"""
+        while self._workers:
+            self._stop(self._workers.pop())
+        if self._connection is not None and self._connection.is_open:
+            self._connection.close()
+        logger.info("Supervisor detenido")
+
+
+def queues_from_env(target: str) -> List[str]:
+    """Colas que consumen los workers de ``target`` según las variables de entorno"""
+    if target == 'test':
+        return [queue.name for queue in TEST_TOPOLOGY.queues]
+    settings = get_settings()
+    sharding = settings.sharding()
+    if sharding is not None:
+        return sharding.claim(settings.shard_index, settings.shard_count)
+    return [queue.name for queue in MAIN_TOPOLOGY.queues]
+
+
+def main():
+    configure_logging(get_settings())
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--target', choices=tuple(TARGETS), default='consumer',
+                        help='Consumidor que ejecuta cada worker')
+    parser.add_argument('--min-workers', type=int, default=int(os.getenv('SUPERVISOR_MIN_WORKERS', '1')))
+    parser.add_argument('--max-workers', type=int, default=int(os.getenv('SUPERVISOR_MAX_WORKERS', '0')) or None)
+    parser.add_argument('--check-interval', type=float, default=5.0)
+    parser.add_argument('--scale-up-depth', type=int, default=1000)
+    parser.add_argument('--target-drain-seconds', type=float, default=60.0)
+    parser.add_argument('--cooldown', type=float, default=30.0)
+    args = parser.parse_args()
+
+    module, function = TARGETS[args.target]
+    factory = getattr(import_module(module), function)
+    partitioned = args.target != 'test' and get_settings().sharding() is not None
+    supervisor = ConsumerSupervisor(factory, queues_from_env(args.target),
+                                    min_workers=args.min_workers, max_workers=args.max_workers,
+                                    partitioned=partitioned,
+                                    check_interval=args.check_interval,
+                                    scale_up_depth=args.scale_up_depth,
+                                    target_drain_seconds=args.target_drain_seconds,
+                                    cooldown=args.cooldown)
+    signal.signal(signal.SIGTERM, supervisor.stop)
+    supervisor.run()
+
+
+if __name__ == "__main__":
+    main()
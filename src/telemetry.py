@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+"""
+Tramas binarias de telemetría IoT
+
+Formato (little-endian), con las lecturas alineadas a 8 bytes:
+
+    magic 'IOTF' | versión u8 | tipo 'f'/'h' | n.º de canales u32 |
+    timestamp monotónico ns u64 | longitud del device id u8 | device id |
+    relleno | lecturas (float32 o int16)
+
+Las lecturas se decodifican sin copia como ``memoryview`` o, si se pide,
+como vista de NumPy sobre el mismo buffer.
+"""
+import struct
+import sys
+import time
+from array import array
+from typing import Any, Iterable, Union
+
+from config import lazy_import
+from serialization import Codec, MessageDecodeError, register_codec
+
+# Dependencia opcional, cargada solo al decodificar con ``as_numpy``
+numpy = lazy_import('numpy')
+
+TELEMETRY_CONTENT_TYPE = 'application/vnd.iot.telemetry'
+
+FRAME_MAGIC = b'IOTF'
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct('<4sBcIQB')
+READING_TYPES = {'f': '<f4', 'h': '<i2'}
+
+_NATIVE_LITTLE_ENDIAN = sys.byteorder == 'little'
+
+
+class TelemetryFrame:
+    """Lecturas numéricas de un dispositivo en un instante"""
+
+    __slots__ = ('device_id', 'timestamp_ns', 'readings')
+
+    def __init__(self, device_id: str, readings: Union[array, memoryview, Any],
+                 timestamp_ns: int = None):
+        self.device_id = device_id
+        self.readings = readings
+        self.timestamp_ns = time.monotonic_ns() if timestamp_ns is None else timestamp_ns
+
+    @property
+    def typecode(self) -> str:
+        """Tipo de las lecturas ('f' float32 o 'h' int16)"""
+        if isinstance(self.readings, array):
+            return self.readings.typecode
+        if isinstance(self.readings, memoryview):
+            return self.readings.format
+        return self.readings.dtype.char
+
+    def __repr__(self) -> str:
+        return (f"TelemetryFrame(device_id={self.device_id!r}, "
+                f"timestamp_ns={self.timestamp_ns}, channels={len(self.readings)})")
+
+
+def _payload_offset(device_id_length: int) -> int:
+    unpadded = FRAME_HEADER.size + device_id_length
+    return (unpadded + 7) & ~7
+
+
+def encode_frame(device_id: str, readings: Union[array, Iterable[float]],
+                 timestamp_ns: int = None, typecode: str = 'f') -> bytes:
+    """
+    Codificar una trama de telemetría
+
+    Args:
+        device_id: Identificador del dispositivo (máximo 255 bytes UTF-8)
+        readings: ``array`` con typecode 'f' o 'h', o un iterable de números
+        timestamp_ns: Timestamp monotónico en nanosegundos (por defecto ahora)
+        typecode: Tipo de las lecturas cuando ``readings`` no es un ``array``
+    """
+    if not isinstance(readings, array):
+        readings = array(typecode, readings)
+    if readings.typecode not in READING_TYPES:
+        raise ValueError(f"Tipo de lectura no soportado: {readings.typecode}")
+    if not _NATIVE_LITTLE_ENDIAN:
+        readings = array(readings.typecode, readings)
+        readings.byteswap()
+
+    device = device_id.encode()
+    if len(device) > 255:
+        raise ValueError("device_id demasiado largo")
+    if timestamp_ns is None:
+        timestamp_ns = time.monotonic_ns()
+
+    offset = _payload_offset(len(device))
+    payload = memoryview(readings).cast('B')
+    frame = bytearray(offset + len(payload))
+    FRAME_HEADER.pack_into(frame, 0, FRAME_MAGIC, FRAME_VERSION,
+                           readings.typecode.encode(), len(readings),
+                           timestamp_ns, len(device))
+    frame[FRAME_HEADER.size:FRAME_HEADER.size + len(device)] = device
+    frame[offset:] = payload
+    return bytes(frame)
+
+
+def decode_frame(body: Union[bytes, memoryview], as_numpy: bool = False) -> TelemetryFrame:
+    """
+    Decodificar una trama de telemetría sin copiar las lecturas
+
+    Args:
+        body: Cuerpo del mensaje
+        as_numpy: Devolver las lecturas como vista de NumPy en lugar de memoryview
+
+    Raises:
+        MessageDecodeError: Si la trama no es válida
+    """
+    try:
+        magic, version, typecode, count, timestamp_ns, device_length = \
+            FRAME_HEADER.unpack_from(body, 0)
+    except struct.error as e:
+        raise MessageDecodeError(f"Trama de telemetría truncada: {str(e)}") from e
+
+    typecode = typecode.decode()
+    if magic != FRAME_MAGIC or version != FRAME_VERSION or typecode not in READING_TYPES:
+        raise MessageDecodeError("Cabecera de trama de telemetría no válida")
+
+    view = memoryview(body)
+    device_id = bytes(view[FRAME_HEADER.size:FRAME_HEADER.size + device_length]).decode()
+    offset = _payload_offset(device_length)
+    size = count * struct.calcsize(typecode)
+    if len(view) < offset + size:
+        raise MessageDecodeError("Trama de telemetría truncada")
+
+    if as_numpy and numpy is not None:
+        readings = numpy.frombuffer(body, dtype=READING_TYPES[typecode],
+                                    count=count, offset=offset)
+    elif _NATIVE_LITTLE_ENDIAN:
+        readings = view[offset:offset + size].cast(typecode)
+    else:
+        readings = array(typecode, bytes(view[offset:offset + size]))
+        readings.byteswap()
+
+    return TelemetryFrame(device_id, readings, timestamp_ns)
+
+
+class TelemetryCodec(Codec):
+    """Codec de tramas binarias para el registro de serialización"""
+
+    name = 'telemetry'
+    content_type = TELEMETRY_CONTENT_TYPE
+
+    def encode(self, obj: TelemetryFrame) -> bytes:
+        return encode_frame(obj.device_id, obj.readings, obj.timestamp_ns, obj.typecode)
+
+    def decode(self, data: bytes) -> TelemetryFrame:
+        return decode_frame(data)
+
+
+register_codec(TelemetryCodec())
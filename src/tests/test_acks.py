@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""Pruebas de las confirmaciones por lotes del consumidor (pytest)"""
+import os
+import sys
+
+# Permitir importar los módulos de src/ al ejecutar el script directamente
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from consumer import MessageConsumer  # noqa: E402
+
+
+class AckChannel:
+    """Canal que solo registra los ``basic_ack`` recibidos"""
+
+    is_open = True
+
+    def __init__(self):
+        self.acks = []
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        self.acks.append((delivery_tag, multiple))
+
+
+def test_sin_lotes_confirma_uno_a_uno():
+    consumer = MessageConsumer()
+    channel = AckChannel()
+    for tag in (1, 2):
+        consumer.ack_message(channel, tag)
+    assert channel.acks == [(1, False), (2, False)]
+
+
+def test_lote_confirma_hasta_el_ultimo_tag_con_multiple():
+    consumer = MessageConsumer(ack_batch_size=3, ack_interval_ms=60000)
+    channel = AckChannel()
+    for tag in range(1, 8):
+        consumer.ack_message(channel, tag)
+    assert channel.acks == [(3, True), (6, True)]
+
+    # El resto del lote se envía al vaciar (al detenerse o por temporizador)
+    consumer.flush_acks(channel)
+    consumer.flush_acks(channel)
+    assert channel.acks == [(3, True), (6, True), (7, True)]
+
+
+def test_prefetch_cubre_al_menos_un_lote():
+    assert MessageConsumer(prefetch_count=1, ack_batch_size=50).prefetch_count == 50
+    assert MessageConsumer(prefetch_count=100, ack_batch_size=50).prefetch_count == 100
+
+
+def test_lote_no_confirma_mas_alla_del_mensaje_en_vuelo_mas_antiguo():
+    consumer = MessageConsumer(ack_batch_size=2, ack_interval_ms=60000)
+    channel = AckChannel()
+    # Con workers el mensaje 2 sigue procesándose mientras 1 y 3 terminan
+    consumer._in_flight = {2: None}
+    consumer.ack_message(channel, 1)
+    consumer.ack_message(channel, 3)
+    assert channel.acks == [(1, True)]
+
+    consumer._in_flight.pop(2)
+    consumer.ack_message(channel, 2)
+    consumer.flush_acks(channel)
+    assert channel.acks == [(1, True), (3, True)]
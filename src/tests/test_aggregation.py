@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+"""Pruebas de la agregación por ventanas (pytest)"""
+import os
+import sys
+
+import pytest
+
+# Permitir importar los módulos de src/ al ejecutar el script directamente
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip('numpy')
+
+from aggregation import WindowedAggregator  # noqa: E402
+
+
+def test_dispositivos_inactivos_se_olvidan():
+    aggregator = WindowedAggregator(interval=10.0, sliding_window=60.0, capacity=8,
+                                    on_summary=lambda summary: None)
+    aggregator._last_flush = 0.0
+    aggregator.add('dev1', {'temp': 20.0}, timestamp=5.0)
+    aggregator.add('dev2', {'temp': 21.0}, timestamp=5.0)
+
+    summaries = aggregator.flush(now=10.0)
+    assert sorted(summary['device_id'] for summary in summaries) == ['dev1', 'dev2']
+
+    # dev2 sigue enviando; la última lectura de dev1 sale de la ventana deslizante
+    aggregator.add('dev2', {'temp': 22.0}, timestamp=60.0)
+    summaries = aggregator.flush(now=70.0)
+    assert [summary['device_id'] for summary in summaries] == ['dev2']
+    assert summaries[0]['sliding']['temp']['count'] == 1
+    assert len(aggregator) == 1
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+"""Pruebas del productor y el consumidor asyncio con un canal simulado (pytest)"""
+import asyncio
+import json
+import os
+import sys
+
+import pika
+
+# Permitir importar los módulos de src/ al ejecutar el script directamente
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import async_client  # noqa: E402
+from async_client import AsyncDelivery, AsyncMessageConsumer, AsyncMessageProducer  # noqa: E402
+
+
+class FakeConnection:
+    is_closed = False
+    is_closing = False
+
+
+class FakeChannel:
+    """Canal de pika asíncrono: responde al instante y guarda lo publicado"""
+
+    channel_number = 1
+    is_open = True
+
+    def __init__(self):
+        self.published = []
+        self.acked = []
+        self.nacked = []
+        self.rejected = []
+        self.close_callbacks = []
+        self.on_confirmation = None
+        self.on_message = None
+
+    def add_on_close_callback(self, callback):
+        self.close_callbacks.append(callback)
+
+    def confirm_delivery(self, ack_nack_callback, callback=None):
+        self.on_confirmation = ack_nack_callback
+        callback(pika.frame.Method(self.channel_number, pika.spec.Confirm.SelectOk()))
+
+    def exchange_declare(self, callback=None, **_):
+        callback(None)
+
+    def queue_declare(self, callback=None, **_):
+        callback(None)
+
+    def queue_bind(self, callback=None, **_):
+        callback(None)
+
+    def basic_qos(self, callback=None, **_):
+        callback(None)
+
+    def basic_consume(self, queue, on_message_callback, callback=None):
+        self.on_message = on_message_callback
+        callback(pika.frame.Method(self.channel_number, pika.spec.Basic.ConsumeOk('ctag')))
+
+    def basic_publish(self, exchange, routing_key, body, properties):
+        self.published.append(body)
+
+    def confirm(self, method):
+        self.on_confirmation(pika.frame.Method(self.channel_number, method))
+
+    def deliver(self, delivery_tag, body):
+        self.on_message(self, pika.spec.Basic.Deliver(delivery_tag=delivery_tag),
+                        pika.BasicProperties(content_type='application/json'), body)
+
+    def close(self, reason='cerrado'):
+        for callback in self.close_callbacks:
+            callback(self, reason)
+
+    def basic_ack(self, delivery_tag):
+        self.acked.append(delivery_tag)
+
+    def basic_nack(self, delivery_tag, requeue=True):
+        self.nacked.append(delivery_tag)
+
+    def basic_reject(self, delivery_tag, requeue=False):
+        self.rejected.append(delivery_tag)
+
+
+def fake_broker(monkeypatch) -> FakeChannel:
+    """Sustituir la conexión y los canales del módulo por uno simulado"""
+    channel = FakeChannel()
+
+    async def open_connection(amqp_url):
+        return FakeConnection()
+
+    async def open_channel(connection):
+        return channel
+
+    monkeypatch.setattr(async_client, 'open_connection', open_connection)
+    monkeypatch.setattr(async_client, 'open_channel', open_channel)
+    return channel
+
+
+def test_confirms_resuelven_los_futuros_de_cada_publicacion(monkeypatch):
+    channel = fake_broker(monkeypatch)
+
+    async def scenario():
+        producer = AsyncMessageProducer()
+        await producer.connect()
+        publishing = [asyncio.ensure_future(producer.publish_message({'n': n}))
+                      for n in range(3)]
+        await asyncio.sleep(0)
+        # Un ack múltiple confirma las dos primeras entregas; la tercera se rechaza
+        channel.confirm(pika.spec.Basic.Ack(2, multiple=True))
+        channel.confirm(pika.spec.Basic.Nack(3))
+        return await asyncio.gather(*publishing)
+
+    assert asyncio.run(scenario()) == [True, True, False]
+    assert [json.loads(body)['content'] for body in channel.published] == [
+        {'n': 0}, {'n': 1}, {'n': 2}
+    ]
+
+
+def test_cierre_del_canal_falla_las_publicaciones_pendientes(monkeypatch):
+    channel = fake_broker(monkeypatch)
+
+    async def scenario():
+        producer = AsyncMessageProducer()
+        await producer.connect()
+        publishing = asyncio.ensure_future(producer.publish_message({'n': 0}))
+        await asyncio.sleep(0)
+        channel.close()
+        return await publishing
+
+    assert asyncio.run(scenario()) is False
+
+
+def test_flujo_entrega_hasta_el_cierre_del_canal(monkeypatch):
+    channel = fake_broker(monkeypatch)
+
+    async def scenario():
+        consumer = AsyncMessageConsumer()
+        await consumer.connect()
+        stream = await consumer.open_stream()
+        channel.deliver(1, b'{"id": "a"}')
+        channel.deliver(2, b'{"id": "b"}')
+        channel.close()
+        return [delivery.method.delivery_tag async for delivery in stream]
+
+    assert asyncio.run(scenario()) == [1, 2]
+
+
+def test_entrega_invalida_se_rechaza_sin_reencolar():
+    channel = FakeChannel()
+    consumer = AsyncMessageConsumer()
+    properties = pika.BasicProperties(content_type='application/json')
+
+    async def scenario():
+        await consumer.handle_delivery(AsyncDelivery(
+            channel, pika.spec.Basic.Deliver(delivery_tag=1), properties, b'{"id": "a"}'))
+        await consumer.handle_delivery(AsyncDelivery(
+            channel, pika.spec.Basic.Deliver(delivery_tag=2), properties, b'no es json'))
+
+    asyncio.run(scenario())
+    assert channel.acked == [1]
+    assert channel.rejected == [2]
+    assert consumer.message_count == 1
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""Pruebas de la compresión por content_encoding (pytest)"""
+import os
+import sys
+
+import pytest
+
+# Permitir importar los módulos de src/ al ejecutar el script directamente
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compression import (DEFAULT_THRESHOLD, DecompressionError,  # noqa: E402
+                         available_encodings, compress_body, decompress_body,
+                         resolve_encoding)
+from serialization import MessageDecodeError, decode_body  # noqa: E402
+
+BODY = b'[' + b','.join([b'{"temperatura":21.5,"humedad":45}'] * 100) + b']'
+ENCODINGS = [('zlib', None), ('lz4', 'lz4.frame'), ('zstd', 'zstandard')]
+
+
+@pytest.mark.parametrize('encoding,module', ENCODINGS, ids=[e for e, _ in ENCODINGS])
+def test_ida_y_vuelta_por_encoding(encoding, module):
+    if module is not None:
+        pytest.importorskip(module)
+    compressed, content_encoding = compress_body(BODY, encoding)
+    assert content_encoding == encoding
+    assert len(compressed) < len(BODY)
+    assert decompress_body(content_encoding, compressed) == BODY
+    assert decode_body('application/json', compressed, content_encoding)[0]['humedad'] == 45
+
+
+def test_por_debajo_del_umbral_no_se_comprime():
+    body = BODY[:DEFAULT_THRESHOLD - 1]
+    assert compress_body(body, 'zlib') == (body, None)
+    assert compress_body(body, 'zlib', threshold=len(body))[1] == 'zlib'
+    assert compress_body(BODY, None) == (BODY, None)
+
+
+def test_no_se_comprime_si_no_reduce():
+    body = os.urandom(4096)
+    assert compress_body(body, 'zlib', threshold=0) == (body, None)
+
+
+@pytest.mark.parametrize('encoding', [None, '', 'identity'])
+def test_encodings_identidad(encoding):
+    assert decompress_body(encoding, BODY) == BODY
+    assert resolve_encoding(encoding) is None
+
+
+def test_encoding_no_disponible_usa_zlib():
+    assert 'zlib' in available_encodings()
+    assert resolve_encoding('brotli') == 'zlib'
+
+
+def test_encoding_desconocido_o_corrupto():
+    with pytest.raises(DecompressionError, match='no soportado'):
+        decompress_body('brotli', BODY)
+    with pytest.raises(DecompressionError):
+        decompress_body('zlib', b'no es zlib')
+    with pytest.raises(MessageDecodeError):
+        decode_body('application/json', b'no es zlib', 'zlib')
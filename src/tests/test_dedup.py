@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""Pruebas de la supresión de duplicados (pytest)"""
+import os
+import sys
+
+# Permitir importar los módulos de src/ al ejecutar el script directamente
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedup import BloomFilter, DedupCache  # noqa: E402
+
+
+def test_lru_recuerda_y_expulsa():
+    cache = DedupCache(max_entries=2)
+    for message_id in ('a', 'b', 'c'):
+        cache.add(message_id)
+    assert len(cache) == 2
+    assert not cache.seen('a')
+    assert cache.seen('b') and cache.seen('c')
+    assert not cache.seen(None)
+
+
+def test_bloom_recuerda_los_expulsados_del_lru():
+    cache = DedupCache(max_entries=10, bloom_capacity=1000)
+    ids = [f"msg-{i}" for i in range(100)]
+    for message_id in ids:
+        cache.add(message_id)
+    assert all(cache.seen(message_id) for message_id in ids)
+
+
+def test_bloom_saturado_rota_y_no_descarta_mensajes_nuevos():
+    # Diez veces la capacidad dentro de un mismo TTL
+    cache = DedupCache(max_entries=100, ttl=3600.0, bloom_capacity=10000)
+    for i in range(100000):
+        cache.add(f"visto-{i}")
+
+    new_ids = [f"nuevo-{i}" for i in range(10000)]
+    false_positives = sum(cache.seen(message_id) for message_id in new_ids)
+    # Dos generaciones consultadas: como mucho ~2 × bloom_error_rate
+    assert false_positives / len(new_ids) < 0.01
+
+    # Los identificadores de la generación actual y la anterior se recuerdan
+    assert cache.seen('visto-99999')
+    assert cache.seen('visto-85000')
+
+
+def test_bloom_filter_sin_falsos_negativos():
+    bloom = BloomFilter(capacity=500, error_rate=0.01)
+    for i in range(500):
+        bloom.add(str(i))
+    assert all(str(i) in bloom for i in range(500))
+
+
+def test_persistencia_sqlite(tmp_path):
+    path = str(tmp_path / 'dedup.db')
+    cache = DedupCache(path=path, flush_batch=2)
+    cache.add('persistido')
+    cache.close()
+
+    reopened = DedupCache(path=path)
+    assert reopened.seen('persistido')
+    reopened.close()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""Pruebas del sobre de mensaje y las plantillas de propiedades (pytest)"""
+import os
+import sys
+
+import pytest
+
+# Permitir importar los módulos de src/ al ejecutar el script directamente
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from envelope import (IdGenerator, MessageEnvelope, PropertyTemplates,  # noqa: E402
+                      next_id, stamp_properties)
+from metrics import PUBLISHED_AT_HEADER  # noqa: E402
+
+
+def test_ids_unicos_y_crecientes():
+    ids = [next_id() for _ in range(10000)]
+    assert len(set(ids)) == len(ids)
+    assert ids == sorted(ids)
+    assert all(len(message_id) == 32 for message_id in ids)
+
+
+def test_reseed_cambia_el_prefijo():
+    generator = IdGenerator()
+    before = [generator() for _ in range(100)]
+    generator.reseed()
+    after = [generator() for _ in range(100)]
+    assert before[0][:20] != after[0][:20]
+    assert not set(before) & set(after)
+    assert after == sorted(after)
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="requiere os.fork")
+def test_ids_distintos_tras_fork():
+    parent = [next_id() for _ in range(100)]
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        os.write(write_fd, ' '.join(next_id() for _ in range(100)).encode())
+        os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as pipe:
+        child = pipe.read().split()
+    os.waitpid(pid, 0)
+
+    assert len(child) == 100 and child == sorted(child)
+    assert not set(child) & set(parent)
+    assert child[0][:20] != parent[0][:20]
+
+
+def test_sobre_con_slots():
+    message = MessageEnvelope({'temperatura': 21.5}, 'productor', timestamp_ns=1_700_000_000_123)
+    assert not hasattr(message, '__dict__')
+    with pytest.raises(AttributeError):
+        message.extra = 1
+    assert message.to_dict() == {'id': message.id, 'timestamp': 1700,
+                                 'content': {'temperatura': 21.5}, 'producer_id': 'productor'}
+
+
+def test_stamp_properties_no_modifica_la_plantilla():
+    templates = PropertyTemplates()
+    template = templates.get('application/json', 'zlib', priority=5)
+    snapshot = dict(template)
+    assert templates.get('application/json', 'zlib', priority=5) is template
+    assert len(templates) == 1
+
+    headers = {'origen': 'sensor'}
+    first = stamp_properties(template, 'id-1', 1_000_000_000, headers)
+    second = stamp_properties(template, 'id-2', 2_000_000_000)
+
+    assert dict(template) == snapshot
+    assert headers == {'origen': 'sensor'}
+    assert (first.message_id, first.timestamp, first.priority) == ('id-1', 1, 5)
+    assert first.headers == {'origen': 'sensor', PUBLISHED_AT_HEADER: 1_000_000_000}
+    assert second.headers == {PUBLISHED_AT_HEADER: 2_000_000_000}
+    assert first.headers is not second.headers
+    assert second.content_encoding == 'zlib' and second.delivery_mode == 2
+    with pytest.raises(TypeError):
+        template['priority'] = 0
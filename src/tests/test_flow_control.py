@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""Pruebas del control de flujo AIMD (pytest)"""
+import os
+import sys
+
+# Permitir importar los módulos de src/ al ejecutar el script directamente
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flow_control import FlowController  # noqa: E402
+from metrics import MetricsRegistry  # noqa: E402
+from producer import MessageProducer  # noqa: E402
+from spool import MessageSpool  # noqa: E402
+from topology import Topology  # noqa: E402
+from transport import LoopbackBroker, LoopbackTransport  # noqa: E402
+
+
+def controller(**kwargs) -> FlowController:
+    return FlowController(adjust_interval=0, registry=MetricsRegistry(), **kwargs)
+
+
+def test_desbloqueo_recupera_la_tasa():
+    flow = controller(initial_rate=1000.0, min_rate=10.0)
+    for _ in range(3):
+        flow.on_blocked()
+        flow.on_blocked()
+        flow.on_unblocked()
+    assert flow.rate == 1000.0 and not flow.blocked
+
+
+def test_publicacion_suelta_alimenta_el_aimd(caplog):
+    flow = controller(initial_rate=100.0, additive_increase=10.0)
+    producer = MessageProducer(transport=LoopbackTransport(by_reference=False),
+                               flow_control=flow)
+    producer.connect()
+    try:
+        with caplog.at_level('INFO', logger='producer'):
+            assert all(producer.publish_message({'n': i}) for i in range(5))
+            assert producer.publish_telemetry('dev1', [1.0, 2.0])
+    finally:
+        producer.close()
+    assert flow.rate == 160.0
+    assert producer.message_count == 6
+    assert not producer.confirms.pending
+    # Los mensajes sueltos no se publican como lotes de uno
+    assert not [r for r in caplog.records if r.getMessage().startswith('Lote publicado')]
+
+
+def test_suelto_rechazado_va_al_spool(tmp_path):
+    spool = MessageSpool(str(tmp_path / 'spool.bin'))
+    producer = MessageProducer(transport=LoopbackTransport(LoopbackBroker(), by_reference=False),
+                               spool=spool, flow_control=controller())
+    producer.topology = Topology.direct('mi_exchange', 'mi_cola', 'mi_routing_key',
+                                        {'x-max-length': 2})
+    producer.connect()
+    try:
+        assert all(producer.publish_message({'n': i}) for i in range(3))
+        assert not producer.confirms.singles
+        assert len(spool) == 1
+    finally:
+        producer.close()
+        spool.close()
+
+
+def test_descartados_por_drop_no_van_al_spool(tmp_path):
+    flow = controller(policy='drop')
+    flow.on_blocked()
+    spool = MessageSpool(str(tmp_path / 'spool.bin'))
+    producer = MessageProducer(transport=LoopbackTransport(by_reference=False),
+                               spool=spool, flow_control=flow)
+    producer.connect()
+    try:
+        assert producer.publish_batch([{'n': i} for i in range(3)]) == [False] * 3
+        assert len(spool) == 0
+    finally:
+        producer.close()
+        spool.close()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""Pruebas de los límites de concurrencia y timeout por tipo con workers (pytest)"""
+import os
+import queue
+import sys
+import threading
+from types import SimpleNamespace
+
+# Permitir importar los módulos de src/ al ejecutar el script directamente
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from consumer import MessageConsumer  # noqa: E402
+from handlers import HandlerRegistry  # noqa: E402
+
+
+class RecordingChannel:
+    is_open = True
+
+    def __init__(self):
+        self.calls = []
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        self.calls.append(('ack', delivery_tag))
+
+    def basic_nack(self, delivery_tag, multiple=False, requeue=True):
+        self.calls.append(('nack', delivery_tag))
+
+
+class ManualConnection:
+    """Conexión falsa: los callbacks se ejecutan cuando la prueba lo decide"""
+
+    is_open = True
+
+    def __init__(self):
+        self.callbacks = queue.Queue()
+        self.timers = []
+
+    def add_callback_threadsafe(self, callback):
+        self.callbacks.put(callback)
+
+    def call_later(self, delay, callback):
+        self.timers.append(callback)
+
+    def run_next(self, timeout=5.0):
+        self.callbacks.get(timeout=timeout)()
+
+
+def deliver(tag):
+    return SimpleNamespace(delivery_tag=tag, routing_key='mi_routing_key', exchange='mi_exchange')
+
+
+def properties():
+    return SimpleNamespace(message_id=None, type='notification', headers={},
+                           content_type='application/json', content_encoding=None)
+
+
+def test_handler_colgado_conserva_su_turno_y_no_ocupa_el_pool_compartido():
+    release = threading.Event()
+    started = threading.Event()
+    registry = HandlerRegistry()
+
+    @registry.handler('notification', max_concurrency=1, timeout=5.0)
+    def slow(message):
+        started.set()
+        release.wait(5.0)
+        return True
+
+    consumer = MessageConsumer(worker_mode='thread', max_workers=2, handlers=registry,
+                               transport='loopback')
+    consumer.connection = connection = ManualConnection()
+    channel = RecordingChannel()
+    consumer.start_workers()
+    handler = registry.get('notification')
+    try:
+        consumer.dispatch_to_worker(channel, deliver(1), properties(), b'{"id":"1"}')
+        consumer.dispatch_to_worker(channel, deliver(2), properties(), b'{"id":"2"}')
+        assert started.wait(5.0)
+        assert consumer.executor_for(handler) is not consumer.executor
+
+        # Vence el timeout del primero: se reencola, pero su turno sigue ocupado
+        connection.timers[0]()
+        assert channel.calls == [('nack', 1)]
+        assert handler.active == 1
+        assert len(consumer._type_backlog['notification']) == 1
+
+        # Al terminar de verdad libera el turno y entra el siguiente
+        release.set()
+        connection.run_next()
+        assert not consumer._type_backlog['notification']
+        connection.run_next()
+        assert channel.calls == [('nack', 1), ('ack', 2)]
+        assert handler.active == 0
+    finally:
+        release.set()
+        consumer.executor.shutdown(wait=True)
+        for executor in consumer._type_executors.values():
+            executor.shutdown(wait=True)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""Pruebas del logging estructurado por mensaje (pytest)"""
+import logging
+import os
+import sys
+from types import SimpleNamespace
+
+# Permitir importar los módulos de src/ al ejecutar el script directamente
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from consumer import MessageConsumer  # noqa: E402
+
+
+class RecordingChannel:
+    is_open = True
+
+    def __init__(self):
+        self.calls = []
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        self.calls.append(('ack', delivery_tag))
+
+    def basic_nack(self, delivery_tag, multiple=False, requeue=True):
+        self.calls.append(('nack', delivery_tag, requeue))
+
+    def basic_reject(self, delivery_tag, requeue=True):
+        self.calls.append(('reject', delivery_tag, requeue))
+
+
+def deliver(tag):
+    return SimpleNamespace(delivery_tag=tag, routing_key='mi_routing_key', exchange='mi_exchange')
+
+
+def properties():
+    return SimpleNamespace(message_id=None, type=None, headers={}, priority=0,
+                           content_type='application/json', content_encoding=None)
+
+
+def test_errores_por_mensaje_en_modo_estructurado(caplog):
+    consumer = MessageConsumer(structured_logging=True, transport='loopback')
+    channel = RecordingChannel()
+    with caplog.at_level(logging.INFO, logger='consumer'):
+        consumer.handle_message(channel, deliver(7), properties(), b'{no es json')
+
+    errors = [r.getMessage() for r in caplog.records if r.levelno >= logging.ERROR]
+    assert errors and errors[0].startswith('error_decodificando delivery_tag=7 '
+                                           'routing_key=mi_routing_key')
+    assert not any(r.getMessage().startswith('Error decodificando') for r in caplog.records)
+
+
+def test_errores_por_mensaje_en_modo_detallado(caplog):
+    consumer = MessageConsumer(transport='loopback')
+    with caplog.at_level(logging.INFO, logger='consumer'):
+        consumer.handle_message(RecordingChannel(), deliver(7), properties(), b'{no es json')
+
+    assert any(r.getMessage().startswith('Error decodificando mensaje')
+               for r in caplog.records if r.levelno >= logging.ERROR)
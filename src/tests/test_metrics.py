@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+"""Pruebas del histograma de latencias (pytest)"""
+import os
+import sys
+
+# Permitir importar los módulos de src/ al ejecutar el script directamente
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import SUB_BUCKETS, LatencyHistogram, MetricsRegistry  # noqa: E402
+
+
+def test_buckets_acotan_el_error_relativo():
+    for micros in list(range(1, 5000)) + [10 ** 6, 1234567, 10 ** 9]:
+        index = LatencyHistogram._index(micros)
+        upper = LatencyHistogram._upper_bound(index)
+        lower = LatencyHistogram._upper_bound(index - 1) if index else 0.0
+        assert lower <= micros / 1e6 < upper
+        assert upper - lower <= max(micros / 1e6 / SUB_BUCKETS, 1e-6) + 1e-12
+
+
+def test_buckets_crecientes():
+    bounds = [LatencyHistogram._upper_bound(index) for index in range(SUB_BUCKETS * 12)]
+    assert bounds == sorted(bounds) and len(set(bounds)) == len(bounds)
+
+
+def test_cuantiles():
+    histogram = LatencyHistogram()
+    for ms in range(1, 101):
+        histogram.record(ms / 1000)
+    assert histogram.count == 100
+    assert 0.050 <= histogram.quantile(0.5) <= 0.050 * (1 + 1 / SUB_BUCKETS)
+    assert 0.099 <= histogram.quantile(0.99) <= 0.100
+    assert histogram.quantile(1.0) == histogram.max == 0.1
+
+
+def test_latencias_fuera_de_rango():
+    histogram = LatencyHistogram()
+    histogram.record(0.0)
+    histogram.record(-1.0)
+    histogram.record(10 ** 9)
+    assert histogram.counts[0] == 2 and histogram.counts[-1] == 1
+
+
+def test_exposicion_prometheus():
+    registry = MetricsRegistry()
+    registry.histogram('latencia_seconds', 'Latencia', queue='mi_cola').record(0.002)
+    text = registry.render()
+    assert '# TYPE latencia_seconds summary' in text
+    assert 'latencia_seconds_count{queue="mi_cola"} 1' in text
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""Pruebas de los reintentos diferidos y la cola de mensajes muertos (pytest)"""
+import os
+import sys
+import time
+
+import pika
+import pytest
+
+# Permitir importar los módulos de src/ al ejecutar el script directamente
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retry import (LAST_ERROR_HEADER, ORIGINAL_EXCHANGE_HEADER,  # noqa: E402
+                   ORIGINAL_ROUTING_KEY_HEADER, RETRY_COUNT_HEADER, RetryPolicy,
+                   inspect_dead_letters, replay_dead_letters, retry_count)
+from topology import Topology, ensure_topology  # noqa: E402
+from transport import LoopbackBroker, LoopbackTransport  # noqa: E402
+
+MAIN = Topology.direct('ex', 'cola', 'clave')
+
+
+@pytest.fixture
+def channel():
+    broker = LoopbackBroker()
+    connection = LoopbackTransport(broker=broker, by_reference=False).connect()
+    channel = ensure_topology(connection.channel(), MAIN, broker.url)
+    yield channel
+    connection.close()
+
+
+def make_policy(channel, **kwargs):
+    policy = RetryPolicy('ex', **kwargs)
+    ensure_topology(channel, policy.topology, channel.connection.broker.url)
+    return policy
+
+
+def publish(channel, body=b'{}', message_type='notification', headers=None):
+    channel.basic_publish(exchange='ex', routing_key='clave', body=body,
+                          properties=pika.BasicProperties(type=message_type, headers=headers))
+
+
+def get(channel, queue):
+    method, properties, body = channel.basic_get(queue)
+    assert method is not None, f"cola {queue} vacía"
+    channel.basic_ack(method.delivery_tag)
+    return method, properties, body
+
+
+def test_niveles_de_espera_exponenciales():
+    policy = RetryPolicy('ex', base_delay=1.0, multiplier=5.0, levels=3)
+    assert policy.delays_ms == [1000, 5000, 25000]
+    assert [policy.delay_exchange_for(n) for n in (1, 2, 3, 4, 9)] == [
+        'ex.retry.1000ms', 'ex.retry.5000ms', 'ex.retry.25000ms',
+        'ex.retry.25000ms', 'ex.retry.25000ms']
+
+
+def test_reintento_incrementa_el_contador_y_vuelve_a_la_cola(channel):
+    policy = make_policy(channel, base_delay=0.05, levels=2, max_attempts=5)
+    publish(channel, headers={'origen': 'sensor'})
+
+    method, properties, body = get(channel, 'cola')
+    assert policy.retry(channel, method, properties, body, 'fallo 1') == 'ex.retry.50ms'
+    waiting = channel.connection.broker.queues['ex.retry.50ms']
+    assert len(waiting) == 1
+
+    # Al caducar la espera vuelve a la cola original con la misma routing key
+    deadline = time.monotonic() + 5.0
+    while not len(channel.connection.broker.queues['cola']) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    method, properties, body = get(channel, 'cola')
+    assert method.routing_key == 'clave'
+    assert properties.headers == {'origen': 'sensor', RETRY_COUNT_HEADER: 1,
+                                  LAST_ERROR_HEADER: 'fallo 1'}
+
+    # El segundo fallo pasa al siguiente nivel
+    assert policy.retry(channel, method, properties, body, 'fallo 2') == 'ex.retry.250ms'
+    _, properties, _ = get(channel, 'ex.retry.250ms')
+    assert retry_count(properties) == 2
+
+
+def test_intentos_agotados_van_a_la_cola_de_muertos(channel):
+    policy = make_policy(channel, max_attempts=3)
+    publish(channel, headers={RETRY_COUNT_HEADER: 2})
+
+    method, properties, body = get(channel, 'cola')
+    assert policy.retry(channel, method, properties, body, 'x' * 1000) == 'ex.dead'
+    _, properties, _ = get(channel, 'ex.dead')
+    assert properties.headers[RETRY_COUNT_HEADER] == 3
+    assert properties.headers[ORIGINAL_EXCHANGE_HEADER] == 'ex'
+    assert properties.headers[ORIGINAL_ROUTING_KEY_HEADER] == 'clave'
+    assert len(properties.headers[LAST_ERROR_HEADER]) == 256
+
+
+def test_inspeccionar_no_retira_y_reenviar_limpia_las_cabeceras(channel):
+    policy = make_policy(channel)
+    for message_type in ('notification', 'alert', 'notification'):
+        publish(channel, message_type=message_type)
+        method, properties, body = get(channel, 'cola')
+        policy.dead_letter(channel, method, properties, body, 'roto')
+
+    entries = inspect_dead_letters(channel, policy, limit=10)
+    assert [entry['type'] for entry in entries] == ['notification', 'alert', 'notification']
+    assert entries[0]['exchange'] == 'ex' and entries[0]['error'] == 'roto'
+    assert len(channel.connection.broker.queues['ex.dead']) == 3
+
+    assert replay_dead_letters(channel, policy, message_type='notification') == 2
+    assert len(channel.connection.broker.queues['ex.dead']) == 1
+    for _ in range(2):
+        _, properties, _ = get(channel, 'cola')
+        assert properties.headers == {}
+        assert retry_count(properties) == 0
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""Pruebas de los codecs de serialización (pytest)"""
+import json
+import os
+import sys
+
+import pytest
+
+# Permitir importar los módulos de src/ al ejecutar el script directamente
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from serialization import (DEFAULT_CONTENT_TYPE, Codec, CborCodec, JsonCodec,  # noqa: E402
+                           MessageDecodeError, MsgpackCodec, OrjsonCodec,
+                           codec_for_content_type, decode_body, get_codec)
+
+MESSAGE = {'id': '01a1', 'timestamp': 1700000000, 'producer_id': 'productor',
+           'content': {'temperatura': 21.5, 'humedad': '45%', 'activo': True,
+                       'lecturas': [1, 2, 3], 'nota': 'año ñandú'}}
+
+
+def codec_or_skip(codec_class, module):
+    pytest.importorskip(module)
+    return codec_class()
+
+
+@pytest.mark.parametrize('make_codec', [
+    JsonCodec,
+    lambda: codec_or_skip(OrjsonCodec, 'orjson'),
+    lambda: codec_or_skip(MsgpackCodec, 'msgpack'),
+    lambda: codec_or_skip(CborCodec, 'cbor2'),
+], ids=['json', 'orjson', 'msgpack', 'cbor'])
+def test_ida_y_vuelta_por_codec(make_codec):
+    codec = make_codec()
+    body = codec.encode(MESSAGE)
+    assert isinstance(body, bytes)
+    assert codec.decode(body) == MESSAGE
+    assert decode_body(codec.content_type, body) == MESSAGE
+
+
+def test_orjson_y_json_son_intercambiables():
+    pytest.importorskip('orjson')
+    assert OrjsonCodec().decode(json.dumps(MESSAGE).encode()) == MESSAGE
+    assert json.loads(OrjsonCodec().encode(MESSAGE)) == MESSAGE
+
+
+def test_codec_no_disponible_usa_json():
+    assert get_codec('no-existe').content_type == DEFAULT_CONTENT_TYPE
+
+
+def test_content_type_con_parametros_y_por_defecto():
+    body = get_codec('json').encode(MESSAGE)
+    assert decode_body('application/json; charset=utf-8', body) == MESSAGE
+    assert decode_body(None, body) == MESSAGE
+    assert codec_for_content_type('text/json') is codec_for_content_type(DEFAULT_CONTENT_TYPE)
+
+
+def test_content_type_desconocido():
+    with pytest.raises(MessageDecodeError, match='content_type no soportado'):
+        decode_body('application/x-desconocido', b'{}')
+
+
+def test_cuerpo_invalido():
+    with pytest.raises(MessageDecodeError):
+        decode_body(DEFAULT_CONTENT_TYPE, b'{no es json')
+
+
+def test_codec_base_abstracto():
+    with pytest.raises(TypeError):
+        Codec()
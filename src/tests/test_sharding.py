@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+"""Pruebas del anillo de hash consistente (pytest)"""
+import os
+import sys
+from collections import Counter
+
+# Permitir importar los módulos de src/ al ejecutar el script directamente
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sharding import HashRing, Sharding  # noqa: E402
+
+KEYS = [f"device-{i}" for i in range(10000)]
+
+
+def test_misma_clave_misma_cola():
+    first = HashRing([f"q.{i}" for i in range(4)])
+    second = HashRing([f"q.{i}" for i in range(4)])
+    assert all(first.node_for(key) == second.node_for(key) for key in KEYS)
+
+
+def test_anadir_una_cola_mueve_solo_su_parte():
+    before = HashRing([f"q.{i}" for i in range(4)])
+    after = HashRing([f"q.{i}" for i in range(5)])
+    moved = [key for key in KEYS if before.node_for(key) != after.node_for(key)]
+
+    # Solo se mueven claves hacia la cola nueva, aproximadamente 1/5 del total
+    assert all(after.node_for(key) == 'q.4' for key in moved)
+    assert 0.12 < len(moved) / len(KEYS) < 0.28
+
+
+def test_reparto_equilibrado_entre_colas():
+    sharding = Sharding(shards=4)
+    counts = Counter(sharding.routing_key_for(key) for key in KEYS)
+    assert set(counts) == set(sharding.queues)
+    assert max(counts.values()) < 1.3 * len(KEYS) / 4
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""Pruebas de la persistencia por lotes con acks por lotes (pytest)"""
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+# Permitir importar los módulos de src/ al ejecutar el script directamente
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from consumer import MessageConsumer  # noqa: E402
+from metrics import PUBLISHED_AT_HEADER, LagMonitor, MetricsRegistry  # noqa: E402
+from sinks import Sink, SinkBuffer, SQLiteSink  # noqa: E402
+
+
+class RecordingChannel:
+    """Canal falso que registra los acks y nacks enviados"""
+
+    is_open = True
+
+    def __init__(self):
+        self.calls = []
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        self.calls.append(('ack', delivery_tag, multiple))
+
+    def basic_nack(self, delivery_tag, multiple=False, requeue=True):
+        self.calls.append(('nack', delivery_tag, multiple))
+
+
+class FailingSink(Sink):
+    def write(self, records):
+        raise OSError("disco lleno")
+
+
+def deliver(tag):
+    return SimpleNamespace(delivery_tag=tag, routing_key='mi_routing_key', exchange='mi_exchange')
+
+
+def properties():
+    return SimpleNamespace(message_id=None, type=None, headers={})
+
+
+def make_consumer(sink):
+    return MessageConsumer(ack_batch_size=2, ack_interval_ms=60000, transport='loopback',
+                           sink=SinkBuffer(sink, batch_size=10, max_latency=60.0))
+
+
+def test_ack_de_duplicados_no_confirma_mensajes_sin_escribir(tmp_path):
+    consumer = make_consumer(SQLiteSink(str(tmp_path / 'mensajes.db')))
+    channel = RecordingChannel()
+    for tag in (1, 2):
+        consumer.buffer_for_sink(channel, deliver(tag), properties(), {'id': str(tag)})
+    for tag in (3, 4):
+        consumer.skip_duplicate(channel, tag, str(tag))
+
+    # Los tags 1-2 siguen en el lote: nada se puede confirmar todavía
+    assert channel.calls == []
+
+    consumer.flush_sink(channel)
+    assert channel.calls == [('ack', 4, True)]
+
+
+def test_fallo_de_escritura_reencola_sin_ack_previo():
+    consumer = make_consumer(FailingSink())
+    channel = RecordingChannel()
+    for tag in (1, 2):
+        consumer.buffer_for_sink(channel, deliver(tag), properties(), {'id': str(tag)})
+    for tag in (3, 4):
+        consumer.skip_duplicate(channel, tag, str(tag))
+    consumer.flush_sink(channel)
+
+    assert channel.calls == [('nack', 1, False), ('nack', 2, False)]
+    consumer.flush_acks(channel)
+    assert channel.calls[-1] == ('ack', 4, True)
+
+
+def test_lote_lleno_se_escribe_y_confirma_con_un_ack(tmp_path):
+    sink = SQLiteSink(str(tmp_path / 'mensajes.db'))
+    consumer = make_consumer(sink)
+    channel = RecordingChannel()
+    for tag in range(1, 11):
+        consumer.buffer_for_sink(channel, deliver(tag), properties(), {'id': str(tag)})
+
+    assert channel.calls == [('ack', 10, True)]
+    assert sink._db.execute('SELECT COUNT(*) FROM messages').fetchone()[0] == 10
+
+
+def test_retraso_de_ack_se_mide_al_enviar_el_ack():
+    consumer = MessageConsumer(ack_batch_size=3, ack_interval_ms=60000, transport='loopback')
+    consumer.lag_monitor = LagMonitor('mi_cola', registry=MetricsRegistry())
+    channel = RecordingChannel()
+    published = SimpleNamespace(message_id=None, type='notification',
+                                headers={PUBLISHED_AT_HEADER: time.time_ns()})
+    for tag in (1, 2):
+        consumer.ack_message(channel, tag, (LagMonitor.published_at(published),
+                                            'notification', 'mi_routing_key'))
+
+    # Encolados pero sin enviar: todavía no hay retraso de ack
+    assert consumer.lag_monitor._histograms == {}
+
+    consumer.flush_acks(channel)
+    assert channel.calls == [('ack', 2, True)]
+    histogram = consumer.lag_monitor._histograms[('ack', 'notification', 'mi_routing_key')]
+    assert histogram.count == 2 and not consumer._ack_lags
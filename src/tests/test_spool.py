@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""Pruebas del spool en disco (pytest)"""
+import os
+import sys
+
+import pytest
+
+# Permitir importar los módulos de src/ al ejecutar el script directamente
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spool import RECORD, MessageSpool, SpoolFullError  # noqa: E402
+
+RECORD_SIZE = 52
+
+
+def body(n: int) -> bytes:
+    """Cuerpo que ocupa con su registro exactamente ``RECORD_SIZE`` bytes"""
+    overhead = len(MessageSpool._encode('x', 'k', b'', None)) + RECORD.size
+    return f"{n}".encode().rjust(RECORD_SIZE - overhead, b'0')
+
+
+def append(spool: MessageSpool, n: int) -> None:
+    spool.append('x', 'k', body(n))
+
+
+def test_anillo_justo_lleno_sigue_drenando(tmp_path):
+    spool = MessageSpool(str(tmp_path / 'spool.bin'), capacity=4 * RECORD_SIZE)
+    for n in range(4):
+        append(spool, n)
+    assert [m.body for m in spool.peek(10)] == [body(n) for n in range(4)]
+    with pytest.raises(SpoolFullError):
+        append(spool, 4)
+
+    # Liberar uno y anexar otro: el anillo da la vuelta y vuelve a estar lleno
+    spool.commit(spool.peek(1)[0])
+    append(spool, 4)
+    assert len(spool) == 4
+    assert [m.body for m in spool.peek(10)] == [body(n) for n in range(1, 5)]
+
+    # Drenar todo libera el espacio completo
+    spool.commit(spool.peek(10)[-1])
+    assert len(spool) == 0 and spool.peek(10) == []
+    for n in range(5, 9):
+        append(spool, n)
+    assert [m.body for m in spool.peek(10)] == [body(n) for n in range(5, 9)]
+    spool.close()
+
+
+def test_vuelta_con_relleno_y_recuperacion(tmp_path):
+    path = str(tmp_path / 'spool.bin')
+    spool = MessageSpool(path, capacity=4 * RECORD_SIZE + 20)
+    for n in range(4):
+        append(spool, n)
+    spool.commit(spool.peek(2)[1])
+
+    # No cabe al final: se salta el relleno y se escribe al principio
+    append(spool, 4)
+    append(spool, 5)
+    assert [m.body for m in spool.peek(10)] == [body(n) for n in (2, 3, 4, 5)]
+    spool.close()
+
+    reopened = MessageSpool(path)
+    assert len(reopened) == 4
+    assert [m.body for m in reopened.peek(10)] == [body(n) for n in (2, 3, 4, 5)]
+    reopened.close()
+
+
+def test_anillo_lleno_se_recupera_tras_reinicio(tmp_path):
+    path = str(tmp_path / 'spool.bin')
+    spool = MessageSpool(path, capacity=4 * RECORD_SIZE)
+    for n in range(4):
+        append(spool, n)
+    spool.commit(spool.peek(1)[0])
+    append(spool, 4)
+    spool.close()
+
+    reopened = MessageSpool(path)
+    assert len(reopened) == 4
+    assert [m.body for m in reopened.peek(10)] == [body(n) for n in range(1, 5)]
+    reopened.close()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""Pruebas del reparto de colas particionadas entre workers (pytest)"""
+import os
+import sys
+
+import pika
+import pytest
+
+# Permitir importar los módulos de src/ al ejecutar el script directamente
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import consumer  # noqa: E402
+from config import Settings  # noqa: E402
+from supervisor import ConsumerSupervisor  # noqa: E402
+from transport import Transport  # noqa: E402
+
+
+def test_workers_reclaman_colas_disjuntas(monkeypatch):
+    monkeypatch.setattr(consumer, 'get_settings',
+                        lambda: Settings(shards=8, shard_index=1, shard_count=2))
+    claimed = [consumer.consumer_from_env(index, 2).shard_queues for index in range(2)]
+
+    # Este consumidor (1 de 2) tiene las colas impares; cada worker, la mitad
+    assert not set(claimed[0]) & set(claimed[1])
+    assert sorted(claimed[0] + claimed[1]) == sorted(
+        Settings(shards=8).sharding().claim(1, 2))
+
+
+class RecordingSupervisor(ConsumerSupervisor):
+    """Supervisor que registra los workers en lugar de lanzar procesos"""
+
+    def _start(self, worker):
+        self.started.append((worker.index, self._worker_count))
+
+    def _stop(self, worker):
+        self.stopped.append(worker.index)
+
+
+def make_supervisor(**kwargs):
+    supervisor = RecordingSupervisor(lambda index, count: None, [f"q{i}" for i in range(4)],
+                                     transport=object(), **kwargs)
+    supervisor.started, supervisor.stopped = [], []
+    return supervisor
+
+
+def test_particionado_limita_los_workers_al_numero_de_colas():
+    supervisor = make_supervisor(min_workers=1, max_workers=16, partitioned=True)
+    assert supervisor.max_workers == 4
+    supervisor.scale_to(10)
+    assert len(supervisor) == 4
+
+
+def test_particionado_reparte_de_nuevo_al_escalar():
+    supervisor = make_supervisor(min_workers=1, max_workers=4, partitioned=True)
+    supervisor.scale_to(2)
+    assert supervisor.started == [(0, 2), (1, 2)]
+
+    supervisor.scale_to(3)
+    assert supervisor.stopped == [1, 0]
+    assert supervisor.started[2:] == [(0, 3), (1, 3), (2, 3)]
+
+
+def test_sin_particionar_se_anaden_workers_sin_reiniciar():
+    supervisor = make_supervisor(min_workers=1, max_workers=8)
+    supervisor.scale_to(2)
+    supervisor.scale_to(3)
+    assert supervisor.stopped == []
+    assert len(supervisor) == 3
+
+
+class UnreachableTransport(Transport):
+    name = 'amqp'
+
+    def __init__(self):
+        super().__init__('amqp://caido:5672/')
+
+    def connect(self):
+        raise pika.exceptions.AMQPConnectionError("broker caído")
+
+
+def test_error_de_conexion_llega_al_worker_como_excepcion():
+    worker = consumer.MessageConsumer(transport=UnreachableTransport())
+    with pytest.raises(pika.exceptions.AMQPConnectionError):
+        worker.start_consuming()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""Pruebas de la declaración de topología con caché (pytest)"""
+import os
+import sys
+
+import pytest
+
+# Permitir importar los módulos de src/ al ejecutar el script directamente
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from topology import (ExchangeSpec, QueueSpec, Topology,  # noqa: E402
+                      TopologyMismatchError, ensure_topology, is_declared)
+from transport import LoopbackBroker, LoopbackTransport  # noqa: E402
+
+TOPOLOGY = Topology.direct('ex', 'cola', 'clave', {'x-max-length': 10})
+
+
+class RecordingChannel:
+    """Canal que registra las declaraciones antes de delegarlas"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._channel = connection.channel()
+        self.calls = []
+
+    def __getattr__(self, name):
+        method = getattr(self._channel, name)
+
+        def record(*args, **kwargs):
+            self.calls.append((name, kwargs.get('passive', False)))
+            return method(*args, **kwargs)
+        return record
+
+
+def open_channel(broker):
+    return RecordingChannel(LoopbackTransport(broker=broker, by_reference=False).connect())
+
+
+def test_primera_conexion_declara_y_las_siguientes_verifican():
+    broker = LoopbackBroker()
+    first = open_channel(broker)
+    assert ensure_topology(first, TOPOLOGY, broker.url) is first
+    assert first.calls == [('exchange_declare', False), ('queue_declare', False),
+                           ('queue_bind', False)]
+    assert is_declared(broker.url, TOPOLOGY)
+
+    # Reconexión: solo comprobación pasiva
+    second = open_channel(broker)
+    ensure_topology(second, TOPOLOGY, broker.url)
+    assert second.calls == [('exchange_declare', True), ('queue_declare', True)]
+
+    # Sin verificación (canales del pool) no se habla con el broker
+    third = open_channel(broker)
+    ensure_topology(third, TOPOLOGY, broker.url, verify=False)
+    assert third.calls == []
+
+
+def test_la_cache_distingue_broker_y_topologia():
+    broker, other = LoopbackBroker(), LoopbackBroker()
+    ensure_topology(open_channel(broker), TOPOLOGY, broker.url)
+    assert not is_declared(other.url, TOPOLOGY)
+    changed = Topology.direct('ex', 'cola', 'clave', {'x-max-length': 20})
+    assert changed.fingerprint != TOPOLOGY.fingerprint
+    assert not is_declared(broker.url, changed)
+
+
+def test_entidad_borrada_se_redeclara_en_un_canal_nuevo():
+    broker = LoopbackBroker()
+    ensure_topology(open_channel(broker), TOPOLOGY, broker.url)
+    del broker.queues['cola']
+
+    channel = open_channel(broker)
+    result = ensure_topology(channel, TOPOLOGY, broker.url)
+    assert result is not channel
+    assert 'cola' in broker.queues
+    assert is_declared(broker.url, TOPOLOGY)
+
+
+def test_argumentos_distintos_lanzan_topology_mismatch():
+    broker = LoopbackBroker()
+    ensure_topology(open_channel(broker), TOPOLOGY, broker.url)
+    changed = Topology.direct('ex', 'cola', 'clave', {'x-max-length': 20})
+    with pytest.raises(TopologyMismatchError, match='PRECONDITION_FAILED'):
+        ensure_topology(open_channel(broker), changed, broker.url)
+    assert not is_declared(broker.url, changed)
+
+
+def test_argumentos_por_defecto_no_compartidos_mutables():
+    with pytest.raises(TypeError):
+        QueueSpec('cola').arguments['x-max-length'] = 1
+    assert ExchangeSpec('ex').arguments == {}
+    assert Topology([ExchangeSpec('ex')], [QueueSpec('cola')]).fingerprint == \
+        Topology([ExchangeSpec('ex', arguments={})], [QueueSpec('cola', arguments={})]).fingerprint
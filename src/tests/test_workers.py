@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+"""Pruebas del procesamiento en workers (pytest)"""
+import os
+import pickle
+import sys
+from functools import partial
+
+# Permitir importar los módulos de src/ al ejecutar el script directamente
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from consumer import (process_message_worker, process_telemetry_worker,  # noqa: E402
+                      route_in_worker, run_in_worker)
+from serialization import DEFAULT_CONTENT_TYPE  # noqa: E402
+from telemetry import TELEMETRY_CONTENT_TYPE, encode_frame  # noqa: E402
+
+DEFAULT_ROUTE = partial(route_in_worker, process_message_worker, process_telemetry_worker)
+
+
+def test_telemetria_en_worker_de_procesos():
+    result, _, _ = run_in_worker(DEFAULT_ROUTE, TELEMETRY_CONTENT_TYPE, None,
+                                 encode_frame('dev1', [1.0, 2.0]))
+    assert result is True
+
+
+def test_sobre_json_en_worker_de_procesos():
+    result, _, _ = run_in_worker(DEFAULT_ROUTE, DEFAULT_CONTENT_TYPE, None, b'{"id":"1"}')
+    assert result is True
+
+
+def test_ruta_por_defecto_se_puede_enviar_a_otro_proceso():
+    assert pickle.loads(pickle.dumps(DEFAULT_ROUTE))({'id': '1'}) is True
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+"""
+Topología declarativa de RabbitMQ con caché por proceso y broker
+
+Exchanges, colas y bindings se definen una vez. La primera conexión del
+proceso a un broker los declara; las reconexiones posteriores solo comprueban
+en modo pasivo que siguen existiendo. Si el broker tiene una entidad con
+argumentos distintos, la declaración falla de inmediato con
+``TopologyMismatchError``.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import threading
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, NamedTuple, Sequence, Set, Tuple
+
+from config import lazy_import
+
+pika = lazy_import('pika')
+logger = logging.getLogger(__name__)
+
+# Códigos AMQP con los que el broker cierra el canal
+NOT_FOUND = 404
+PRECONDITION_FAILED = 406
+
+# Argumentos por defecto de las specs: inmutables, compartidos sin riesgo
+NO_ARGUMENTS: Mapping[str, Any] = MappingProxyType({})
+
+
+class TopologyMismatchError(Exception):
+    """La entidad ya existe en el broker con otra configuración"""
+
+
+class ExchangeSpec(NamedTuple):
+    name: str
+    type: str = 'direct'
+    durable: bool = True
+    arguments: Mapping[str, Any] = NO_ARGUMENTS
+
+
+class QueueSpec(NamedTuple):
+    name: str
+    durable: bool = True
+    arguments: Mapping[str, Any] = NO_ARGUMENTS
+
+
+class BindingSpec(NamedTuple):
+    exchange: str
+    queue: str
+    routing_key: str
+
+
+class Topology:
+    """Conjunto inmutable de exchanges, colas y bindings"""
+
+    def __init__(self, exchanges: Sequence[ExchangeSpec] = (),
+                 queues: Sequence[QueueSpec] = (),
+                 bindings: Sequence[BindingSpec] = ()):
+        self.exchanges = tuple(exchanges)
+        self.queues = tuple(queues)
+        self.bindings = tuple(bindings)
+        self.fingerprint = json.dumps(
+            [self.exchanges, self.queues, self.bindings], sort_keys=True, default=_jsonable
+        )
+
+    @classmethod
+    def direct(cls, exchange: str, queue: str, routing_key: str,
+               queue_arguments: Dict[str, Any] = None) -> 'Topology':
+        """Topología de un exchange direct con una cola enlazada por routing key"""
+        return cls(
+            exchanges=[ExchangeSpec(exchange)],
+            queues=[QueueSpec(queue, arguments=queue_arguments or NO_ARGUMENTS)],
+            bindings=[BindingSpec(exchange, queue, routing_key)]
+        )
+
+
+def _jsonable(value: Any) -> Any:
+    """Argumentos no JSON de la huella: los mappings como dict, el resto como texto"""
+    return dict(value) if isinstance(value, Mapping) else str(value)
+
+
+_declared: Set[Tuple[str, str]] = set()
+_declared_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def broker_key(amqp_url: str) -> str:
+    """Identificar el broker por host, puerto y vhost (sin credenciales)"""
+    parameters = pika.URLParameters(amqp_url)
+    return f"{parameters.host}:{parameters.port}{parameters.virtual_host}"
+
+
+def is_declared(amqp_url: str, topology: Topology) -> bool:
+    """Indicar si la topología ya se declaró en este proceso para el broker"""
+    with _declared_lock:
+        return (broker_key(amqp_url), topology.fingerprint) in _declared
+
+
+def mark_declared(amqp_url: str, topology: Topology) -> None:
+    with _declared_lock:
+        _declared.add((broker_key(amqp_url), topology.fingerprint))
+
+
+def forget_declared(amqp_url: str, topology: Topology) -> None:
+    with _declared_lock:
+        _declared.discard((broker_key(amqp_url), topology.fingerprint))
+
+
+def declare_topology(channel, topology: Topology) -> None:
+    """
+    Declarar activamente todas las entidades de la topología
+
+    Raises:
+        TopologyMismatchError: Si alguna entidad existe con otros argumentos
+    """
+    try:
+        for exchange in topology.exchanges:
+            logger.debug(f"Declarando exchange: {exchange.name}")
+            channel.exchange_declare(
+                exchange=exchange.name,
+                exchange_type=exchange.type,
+                durable=exchange.durable,
+                arguments=exchange.arguments or None
+            )
+        for queue in topology.queues:
+            logger.debug(f"Declarando cola: {queue.name}")
+            channel.queue_declare(
+                queue=queue.name,
+                durable=queue.durable,
+                arguments=queue.arguments or None
+            )
+        for binding in topology.bindings:
+            logger.debug(f"Creando binding entre {binding.exchange} y {binding.queue}")
+            channel.queue_bind(
+                exchange=binding.exchange,
+                queue=binding.queue,
+                routing_key=binding.routing_key
+            )
+    except pika.exceptions.ChannelClosedByBroker as e:
+        if e.reply_code == PRECONDITION_FAILED:
+            raise TopologyMismatchError(e.reply_text) from e
+        raise
+
+
+def verify_topology(channel, topology: Topology) -> None:
+    """
+    Comprobar en modo pasivo que exchanges y colas siguen existiendo
+
+    Raises:
+        pika.exceptions.ChannelClosedByBroker: 404 si alguna entidad no existe
+    """
+    for exchange in topology.exchanges:
+        channel.exchange_declare(exchange=exchange.name, passive=True)
+    for queue in topology.queues:
+        channel.queue_declare(queue=queue.name, passive=True)
+
+
+def ensure_topology(channel, topology: Topology, amqp_url: str, verify: bool = True):
+    """
+    Aplicar la topología una sola vez por proceso y broker
+
+    Args:
+        channel: ``BlockingChannel`` sobre el que declarar
+        topology: Topología a aplicar
+        amqp_url: URL del broker, usada como clave de la caché
+        verify: Si la topología ya estaba declarada, comprobarla en modo pasivo
+
+    Returns:
+        El canal a seguir usando: si la comprobación pasiva falla el broker
+        cierra el canal y se abre uno nuevo para redeclarar
+
+    Raises:
+        TopologyMismatchError: Si alguna entidad existe con otros argumentos
+    """
+    if is_declared(amqp_url, topology):
+        if not verify:
+            return channel
+        try:
+            verify_topology(channel, topology)
+            logger.debug("Topología verificada en modo pasivo")
+            return channel
+        except pika.exceptions.ChannelClosedByBroker as e:
+            if e.reply_code != NOT_FOUND:
+                raise
+            logger.warning(f"Topología incompleta en el broker, redeclarando: {e.reply_text}")
+            forget_declared(amqp_url, topology)
+            channel = channel.connection.channel()
+
+    declare_topology(channel, topology)
+    mark_declared(amqp_url, topology)
+    logger.debug("Topología declarada")
+    return channel
+
+
+# Topologías de la aplicación
+MAIN_QUEUE_ARGUMENTS = {
+    'x-message-ttl': 86400000,  # TTL: 24 horas
+    'x-max-length': 10000  # Máximo 10000 mensajes
+}
+MAIN_TOPOLOGY = Topology.direct('mi_exchange', 'mi_cola', 'mi_routing_key',
+                                MAIN_QUEUE_ARGUMENTS)
+
+TEST_QUEUE_ARGUMENTS = {
+    'x-max-length': 1000,  # Máximo número de mensajes
+    'x-overflow': 'reject-publish'  # Rechazar mensajes nuevos si la cola está llena
+}
+TEST_TOPOLOGY = Topology.direct('test_exchange', 'test_queue', 'test_routing',
+                                TEST_QUEUE_ARGUMENTS)
@@ -0,0 +1,579 @@
+#!/usr/bin/env python
+"""
+Transportes de mensajería: RabbitMQ (AMQP) o loopback en el propio proceso
+
+``MessageProducer`` y ``MessageConsumer`` obtienen sus conexiones de un
+``Transport``. ``AmqpTransport`` abre una ``pika.BlockingConnection``;
+``LoopbackTransport`` ofrece la misma API de conexión y canal sobre colas
+acotadas en memoria, con las mismas semánticas de ack/nack/reject, prefetch y
+publisher confirms, de modo que el código de los clientes no cambia.
+
+En modo loopback los mensajes se pasan por referencia (sin serializar ni
+comprimir) con el content_type ``application/x-python-object``. El transporte
+se elige por configuración con ``AMQP_TRANSPORT=amqp|loopback``.
+
+Las colas con ``x-message-ttl`` y ``x-dead-letter-exchange`` reenvían al
+exchange indicado los mensajes que caducan sin consumirse, como las colas de
+espera de los reintentos.
+"""
+from __future__ import annotations
+
+import heapq
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from itertools import count
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple, Union
+
+from config import get_settings, lazy_import
+from serialization import Codec, register_codec
+from sharding import CONSISTENT_HASH_EXCHANGE, HashRing
+
+pika = lazy_import('pika')
+logger = logging.getLogger(__name__)
+
+TRANSPORTS = ('amqp', 'loopback')
+REFERENCE_CONTENT_TYPE = 'application/x-python-object'
+
+# Códigos AMQP emulados por el broker loopback
+NOT_FOUND = 404
+PRECONDITION_FAILED = 406
+
+
+class ReferenceCodec(Codec):
+    """Codec identidad: el objeto viaja por referencia dentro del proceso"""
+
+    name = 'reference'
+    content_type = REFERENCE_CONTENT_TYPE
+
+    def encode(self, obj: Any) -> Any:
+        return obj
+
+    def decode(self, data: Any) -> Any:
+        return data
+
+
+class LoopbackQueueFullError(Exception):
+    """La cola loopback siguió llena durante todo el tiempo de espera"""
+
+
+class LoopbackQueue:
+    """Cola FIFO acotada; los mensajes reencolados no cuentan para el límite"""
+
+    def __init__(self, name: str, max_length: int, arguments: Dict[str, Any]):
+        self.name = name
+        self.max_length = max_length
+        self.arguments = arguments
+        self._items: Deque[tuple] = deque()
+        self._not_empty = threading.Condition()
+        self._not_full = threading.Condition(self._not_empty)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def put(self, item: tuple, timeout: Optional[float]) -> bool:
+        """Encolar esperando hasta ``timeout`` segundos si está llena (0 = sin esperar)"""
+        with self._not_full:
+            if len(self._items) >= self.max_length:
+                if not timeout or not self._not_full.wait_for(
+                        lambda: len(self._items) < self.max_length, timeout):
+                    return False
+            self._items.append(item)
+            self._not_empty.notify()
+            return True
+
+    def remove(self, item: tuple) -> bool:
+        """Retirar un mensaje concreto; False si ya no está en la cola"""
+        with self._not_empty:
+            for index, queued in enumerate(self._items):
+                if queued is item:
+                    del self._items[index]
+                    self._not_full.notify()
+                    return True
+            return False
+
+    def requeue(self, item: tuple) -> None:
+        """Devolver un mensaje a la cabeza de la cola, como hace RabbitMQ"""
+        with self._not_empty:
+            self._items.appendleft(item)
+            self._not_empty.notify()
+
+    def get(self, timeout: float) -> Optional[tuple]:
+        with self._not_empty:
+            if not self._items and not self._not_empty.wait(timeout):
+                return None
+            if not self._items:
+                return None
+            item = self._items.popleft()
+            self._not_full.notify()
+            return item
+
+    def purge(self) -> int:
+        with self._not_empty:
+            purged = len(self._items)
+            self._items.clear()
+            self._not_full.notify_all()
+            return purged
+
+
+class LoopbackBroker:
+    """Exchanges, colas y bindings en memoria compartidos por el proceso"""
+
+    _ids = count(1)
+
+    def __init__(self, default_max_length: int = 10000):
+        self.default_max_length = default_max_length
+        self.url = f"amqp://loopback/{next(self._ids)}"
+        self.exchanges: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        self.queues: Dict[str, LoopbackQueue] = {}
+        self.bindings: Dict[Tuple[str, str], Set[str]] = {}
+        self._rings: Dict[str, HashRing] = {}
+        self._lock = threading.Lock()
+        # Mensajes con caducidad pendientes: (vencimiento, id, cola, mensaje)
+        self._expiring: List[Tuple[float, int, LoopbackQueue, tuple]] = []
+        self._expiry_ids = count()
+        self._expiry_ready = threading.Condition()
+        self._expiry_thread: Optional[threading.Thread] = None
+
+    def declare_exchange(self, name: str, exchange_type: str,
+                         arguments: Dict[str, Any], passive: bool) -> None:
+        with self._lock:
+            existing = self.exchanges.get(name)
+            if passive:
+                if existing is None:
+                    raise pika.exceptions.ChannelClosedByBroker(
+                        NOT_FOUND, f"NOT_FOUND - no exchange '{name}'")
+                return
+            if existing is not None and existing != (exchange_type, arguments):
+                raise pika.exceptions.ChannelClosedByBroker(
+                    PRECONDITION_FAILED, f"PRECONDITION_FAILED - inequivalent arg for exchange '{name}'")
+            self.exchanges[name] = (exchange_type, arguments)
+
+    def declare_queue(self, name: str, arguments: Dict[str, Any], passive: bool) -> LoopbackQueue:
+        with self._lock:
+            existing = self.queues.get(name)
+            if passive:
+                if existing is None:
+                    raise pika.exceptions.ChannelClosedByBroker(
+                        NOT_FOUND, f"NOT_FOUND - no queue '{name}'")
+                return existing
+            if existing is not None:
+                if existing.arguments != arguments:
+                    raise pika.exceptions.ChannelClosedByBroker(
+                        PRECONDITION_FAILED, f"PRECONDITION_FAILED - inequivalent arg for queue '{name}'")
+                return existing
+            max_length = arguments.get('x-max-length', self.default_max_length)
+            queue = self.queues[name] = LoopbackQueue(name, max_length, arguments)
+            return queue
+
+    def bind(self, exchange: str, queue: str, routing_key: str) -> None:
+        with self._lock:
+            if exchange not in self.exchanges or queue not in self.queues:
+                raise pika.exceptions.ChannelClosedByBroker(
+                    NOT_FOUND, f"NOT_FOUND - no exchange '{exchange}' or queue '{queue}'")
+            self.bindings.setdefault((exchange, routing_key), set()).add(queue)
+            self._rings.pop(exchange, None)
+
+    def _bound_queues(self, exchange: str) -> Set[str]:
+        return set().union(*(queues for (name, _), queues in self.bindings.items()
+                             if name == exchange))
+
+    def _consistent_hash(self, exchange: str, routing_key: str) -> List[str]:
+        """Emular ``x-consistent-hash`` (sin pesos) con el anillo de ``sharding``"""
+        ring = self._rings.get(exchange)
+        if ring is None:
+            queues = sorted(self._bound_queues(exchange))
+            if not queues:
+                return []
+            ring = self._rings[exchange] = HashRing(queues)
+        return [ring.node_for(routing_key)]
+
+    def route(self, exchange: str, routing_key: str) -> List[LoopbackQueue]:
+        """Colas destino de un mensaje (exchange por defecto = nombre de cola)"""
+        if not exchange:
+            queue = self.queues.get(routing_key)
+            return [queue] if queue is not None else []
+        exchange_type = self.exchanges.get(exchange, ('direct', {}))[0]
+        if exchange_type == 'fanout':
+            names = self._bound_queues(exchange)
+        elif exchange_type == CONSISTENT_HASH_EXCHANGE:
+            names = self._consistent_hash(exchange, routing_key)
+        else:
+            names = self.bindings.get((exchange, routing_key), ())
+        return [self.queues[name] for name in names]
+
+    def expire_later(self, queue: LoopbackQueue, item: tuple) -> None:
+        """Programar la caducidad de un mensaje en una cola con TTL y dead-letter"""
+        ttl = queue.arguments.get('x-message-ttl')
+        if ttl is None or 'x-dead-letter-exchange' not in queue.arguments:
+            return
+        with self._expiry_ready:
+            heapq.heappush(self._expiring, (time.monotonic() + ttl / 1000,
+                                            next(self._expiry_ids), queue, item))
+            if self._expiry_thread is None:
+                self._expiry_thread = threading.Thread(target=self._expire_loop,
+                                                       name='loopback-expiry', daemon=True)
+                self._expiry_thread.start()
+            self._expiry_ready.notify()
+
+    def _expire_loop(self) -> None:
+        while True:
+            with self._expiry_ready:
+                while not self._expiring or self._expiring[0][0] > time.monotonic():
+                    timeout = self._expiring[0][0] - time.monotonic() if self._expiring else None
+                    self._expiry_ready.wait(timeout)
+                _, _, queue, item = heapq.heappop(self._expiring)
+            self.dead_letter(queue, item)
+
+    def dead_letter(self, queue: LoopbackQueue, item: tuple) -> None:
+        """Reenviar un mensaje caducado a su exchange de dead-letter"""
+        if not queue.remove(item):
+            # Ya se consumió
+            return
+        exchange = queue.arguments['x-dead-letter-exchange']
+        routing_key = queue.arguments.get('x-dead-letter-routing-key', item[1])
+        dead = (exchange, routing_key) + item[2:4]
+        for target in self.route(exchange, routing_key):
+            if target.put(dead, 0):
+                self.expire_later(target, dead)
+
+
+class LoopbackChannel:
+    """Canal loopback con la API de ``BlockingChannel`` que usan los clientes"""
+
+    def __init__(self, connection: 'LoopbackConnection', channel_number: int):
+        self.connection = connection
+        self.channel_number = channel_number
+        self.is_open = True
+        self.publish_timeout = connection.publish_timeout
+        self._delivery_tags = count(1)
+        self._unacked: Dict[int, Tuple[LoopbackQueue, tuple]] = {}
+        self._prefetch_count = 0
+        self._consumers: List[Tuple[LoopbackQueue, str, Callable]] = []
+        self._consuming = False
+        self._confirm_callback: Optional[Callable] = None
+        self._publish_tags = count(1)
+
+    @property
+    def is_closed(self) -> bool:
+        return not self.is_open
+
+    @property
+    def _impl(self) -> 'LoopbackChannel':
+        # Los productores usan el canal de bajo nivel para los publisher confirms
+        return self
+
+    def _check_open(self) -> None:
+        if not self.is_open:
+            raise pika.exceptions.ChannelWrongStateError("Canal loopback cerrado")
+
+    def _close_by_broker(self, error: pika.exceptions.ChannelClosedByBroker):
+        self.close()
+        raise error
+
+    # Topología
+    def exchange_declare(self, exchange: str, exchange_type: str = 'direct', passive: bool = False,
+                         durable: bool = False, arguments: Optional[Dict[str, Any]] = None, **_):
+        self._check_open()
+        try:
+            self.connection.broker.declare_exchange(exchange, exchange_type, arguments or {}, passive)
+        except pika.exceptions.ChannelClosedByBroker as e:
+            self._close_by_broker(e)
+
+    def queue_declare(self, queue: str, passive: bool = False, durable: bool = False,
+                      arguments: Optional[Dict[str, Any]] = None, **_):
+        self._check_open()
+        try:
+            declared = self.connection.broker.declare_queue(queue, arguments or {}, passive)
+        except pika.exceptions.ChannelClosedByBroker as e:
+            self._close_by_broker(e)
+        consumers = sum(1 for consumed, _, _ in self._consumers if consumed is declared)
+        return pika.frame.Method(self.channel_number,
+                                 pika.spec.Queue.DeclareOk(queue, len(declared), consumers))
+
+    def queue_bind(self, queue: str, exchange: str, routing_key: Optional[str] = None, **_):
+        self._check_open()
+        try:
+            self.connection.broker.bind(exchange, queue, routing_key or queue)
+        except pika.exceptions.ChannelClosedByBroker as e:
+            self._close_by_broker(e)
+
+    def queue_purge(self, queue: str):
+        self._check_open()
+        try:
+            purged = self.connection.broker.declare_queue(queue, {}, passive=True).purge()
+        except pika.exceptions.ChannelClosedByBroker as e:
+            self._close_by_broker(e)
+        return pika.frame.Method(self.channel_number, pika.spec.Queue.PurgeOk(purged))
+
+    # Publicación
+    def confirm_delivery(self, ack_nack_callback: Optional[Callable] = None,
+                         callback: Optional[Callable] = None) -> None:
+        """Activar publisher confirms; cada publicación se confirma de inmediato"""
+        self._confirm_callback = ack_nack_callback
+        if callback is not None:
+            callback(pika.frame.Method(self.channel_number, pika.spec.Confirm.SelectOk()))
+
+    def basic_publish(self, exchange: str, routing_key: str, body: Any,
+                      properties: Optional[pika.BasicProperties] = None,
+                      mandatory: bool = False) -> None:
+        """
+        Encolar el mensaje en las colas enlazadas
+
+        Sin confirms, una cola llena bloquea al productor hasta
+        ``publish_timeout`` segundos y luego lanza ``LoopbackQueueFullError``;
+        con confirms, el mensaje se rechaza al instante con ``Basic.Nack``.
+        """
+        self._check_open()
+        item = (exchange, routing_key, properties or pika.BasicProperties(), body)
+        confirm = self._confirm_callback
+        timeout = 0 if confirm is not None else self.publish_timeout
+
+        broker = self.connection.broker
+        accepted = True
+        for queue in broker.route(exchange, routing_key):
+            if queue.put(item, timeout):
+                broker.expire_later(queue, item)
+            else:
+                accepted = False
+
+        if confirm is not None:
+            tag = next(self._publish_tags)
+            method = pika.spec.Basic.Ack(tag) if accepted else pika.spec.Basic.Nack(tag)
+            confirm(pika.frame.Method(self.channel_number, method))
+        elif not accepted:
+            raise LoopbackQueueFullError(f"Cola llena para routing key '{routing_key}'")
+
+    # Consumo
+    def basic_qos(self, prefetch_count: int = 0, **_) -> None:
+        self._prefetch_count = prefetch_count
+
+    def basic_consume(self, queue: str, on_message_callback: Callable, **_) -> str:
+        self._check_open()
+        try:
+            declared = self.connection.broker.declare_queue(queue, {}, passive=True)
+        except pika.exceptions.ChannelClosedByBroker as e:
+            self._close_by_broker(e)
+        consumer_tag = f"loopback.ctag{self.channel_number}.{len(self._consumers) + 1}"
+        self._consumers.append((declared, consumer_tag, on_message_callback))
+        return consumer_tag
+
+    def basic_get(self, queue: str, auto_ack: bool = False):
+        """Retirar un mensaje de la cola sin suscribirse; (None, None, None) si está vacía"""
+        self._check_open()
+        try:
+            declared = self.connection.broker.declare_queue(queue, {}, passive=True)
+        except pika.exceptions.ChannelClosedByBroker as e:
+            self._close_by_broker(e)
+        item = declared.get(0)
+        if item is None:
+            return None, None, None
+        exchange, routing_key, properties, body, *redelivered = item
+        delivery_tag = next(self._delivery_tags)
+        if not auto_ack:
+            self._unacked[delivery_tag] = (declared, item)
+        method = pika.spec.Basic.GetOk(delivery_tag, bool(redelivered), exchange,
+                                       routing_key, len(declared))
+        return method, properties, body
+
+    def _deliver_one(self, timeout: float) -> bool:
+        """Entregar un mensaje al siguiente consumidor si la ventana de prefetch lo permite"""
+        if self._prefetch_count and len(self._unacked) >= self._prefetch_count:
+            return False
+        for queue, consumer_tag, callback in self._consumers:
+            item = queue.get(timeout / len(self._consumers))
+            if item is None:
+                continue
+            exchange, routing_key, properties, body, *redelivered = item
+            delivery_tag = next(self._delivery_tags)
+            self._unacked[delivery_tag] = (queue, item)
+            method = pika.spec.Basic.Deliver(consumer_tag, delivery_tag, bool(redelivered),
+                                             exchange, routing_key)
+            callback(self, method, properties, body)
+            return True
+        return False
+
+    def start_consuming(self) -> None:
+        """Entregar mensajes y atender callbacks hasta ``stop_consuming``"""
+        self._consuming = True
+        while self._consuming and self.is_open:
+            self.connection.process_data_events(time_limit=0)
+            if not self._deliver_one(timeout=0.01) and self._consuming:
+                self.connection.process_data_events(time_limit=0.001)
+
+    def stop_consuming(self, consumer_tag: Optional[str] = None) -> None:
+        self._consuming = False
+
+    def _settle(self, delivery_tag: int, multiple: bool) -> List[Tuple[LoopbackQueue, tuple]]:
+        if multiple:
+            tags = [tag for tag in self._unacked if tag <= delivery_tag]
+        else:
+            tags = [delivery_tag] if delivery_tag in self._unacked else []
+            if not tags:
+                self._close_by_broker(pika.exceptions.ChannelClosedByBroker(
+                    PRECONDITION_FAILED, f"PRECONDITION_FAILED - unknown delivery tag {delivery_tag}"))
+        return [self._unacked.pop(tag) for tag in tags]
+
+    def basic_ack(self, delivery_tag: int = 0, multiple: bool = False) -> None:
+        self._check_open()
+        self._settle(delivery_tag, multiple)
+
+    def basic_nack(self, delivery_tag: int = 0, multiple: bool = False, requeue: bool = True) -> None:
+        self._check_open()
+        # Reencolar en orden inverso para conservar el orden original en la cabeza
+        for queue, item in reversed(self._settle(delivery_tag, multiple)):
+            if requeue:
+                queue.requeue(item[:4] + (True,))
+
+    def basic_reject(self, delivery_tag: int = 0, requeue: bool = True) -> None:
+        self.basic_nack(delivery_tag, requeue=requeue)
+
+    def close(self) -> None:
+        """Cerrar el canal; los mensajes sin ack vuelven a su cola"""
+        if not self.is_open:
+            return
+        self.is_open = False
+        self._consuming = False
+        for queue, item in reversed(list(self._unacked.values())):
+            queue.requeue(item[:4] + (True,))
+        self._unacked.clear()
+
+
+class LoopbackConnection:
+    """Conexión loopback con la API de ``BlockingConnection`` que usan los clientes"""
+
+    def __init__(self, broker: LoopbackBroker, publish_timeout: float = 30.0):
+        self.broker = broker
+        self.publish_timeout = publish_timeout
+        self.is_open = True
+        self._channels: List[LoopbackChannel] = []
+        self._callbacks: Deque[Callable] = deque()
+        self._timers: List[Tuple[float, int, Callable]] = []
+        self._timer_ids = count()
+        self._wakeup = threading.Event()
+
+    @property
+    def is_closed(self) -> bool:
+        return not self.is_open
+
+    def channel(self) -> LoopbackChannel:
+        channel = LoopbackChannel(self, len(self._channels) + 1)
+        self._channels.append(channel)
+        return channel
+
+    def add_on_connection_blocked_callback(self, callback: Callable) -> None:
+        # El broker loopback nunca bloquea conexiones: el límite son sus colas
+        pass
+
+    def add_on_connection_unblocked_callback(self, callback: Callable) -> None:
+        pass
+
+    def add_callback_threadsafe(self, callback: Callable) -> None:
+        self._callbacks.append(callback)
+        self._wakeup.set()
+
+    def call_later(self, delay: float, callback: Callable) -> int:
+        timer_id = next(self._timer_ids)
+        heapq.heappush(self._timers, (time.monotonic() + delay, timer_id, callback))
+        return timer_id
+
+    def process_data_events(self, time_limit: Optional[float] = 0) -> None:
+        """Ejecutar los callbacks pendientes y los temporizadores vencidos"""
+        deadline = time.monotonic() + (time_limit or 0)
+        while True:
+            while self._callbacks:
+                self._callbacks.popleft()()
+            now = time.monotonic()
+            while self._timers and self._timers[0][0] <= now:
+                heapq.heappop(self._timers)[2]()
+            if now >= deadline:
+                return
+            wait = deadline - now
+            if self._timers:
+                wait = min(wait, max(self._timers[0][0] - now, 0))
+            self._wakeup.wait(wait)
+            self._wakeup.clear()
+
+    def close(self) -> None:
+        if not self.is_open:
+            return
+        for channel in self._channels:
+            channel.close()
+        self.is_open = False
+
+
+class Transport(ABC):
+    """Origen de las conexiones de productores y consumidores"""
+
+    name = ''
+    # True si los mensajes viajan como objetos Python sin serializar
+    by_reference = False
+
+    def __init__(self, url: str):
+        self.url = url
+
+    @abstractmethod
+    def connect(self):
+        """Abrir una conexión nueva"""
+
+
+class AmqpTransport(Transport):
+    name = 'amqp'
+
+    def __init__(self, amqp_url: Optional[str] = None):
+        super().__init__(amqp_url or get_settings().rabbitmq_url)
+
+    def connect(self) -> pika.BlockingConnection:
+        return pika.BlockingConnection(pika.URLParameters(self.url))
+
+
+class LoopbackTransport(Transport):
+    name = 'loopback'
+
+    def __init__(self, broker: Optional[LoopbackBroker] = None, by_reference: bool = True,
+                 publish_timeout: float = 30.0):
+        """
+        Inicializar el transporte loopback
+
+        Args:
+            broker: Broker en memoria (por defecto el compartido del proceso)
+            by_reference: Pasar los mensajes como objetos sin serializar; con
+                False se serializan igual que por AMQP (útil para perfilar)
+            publish_timeout: Segundos máximos de bloqueo con la cola llena
+        """
+        self.broker = broker or DEFAULT_LOOPBACK_BROKER
+        super().__init__(self.broker.url)
+        self.by_reference = by_reference
+        self.publish_timeout = publish_timeout
+
+    def connect(self) -> LoopbackConnection:
+        return LoopbackConnection(self.broker, self.publish_timeout)
+
+
+# Broker loopback compartido por productores y consumidores del proceso
+DEFAULT_LOOPBACK_BROKER = LoopbackBroker()
+
+
+def get_transport(transport: Union[str, Transport, None] = None,
+                  amqp_url: Optional[str] = None) -> Transport:
+    """
+    Resolver el transporte configurado
+
+    Args:
+        transport: Instancia, nombre ('amqp' o 'loopback') o None para usar
+            la variable de entorno ``AMQP_TRANSPORT`` (por defecto 'amqp')
+        amqp_url: URL del broker para el transporte AMQP
+    """
+    if isinstance(transport, Transport):
+        return transport
+    name = transport or get_settings().transport
+    if name == 'amqp':
+        return AmqpTransport(amqp_url)
+    if name == 'loopback':
+        return LoopbackTransport()
+    raise ValueError(f"Transporte '{name}' no soportado; opciones: {TRANSPORTS}")
+
+
+register_codec(ReferenceCodec())